@@ -19,6 +19,7 @@ if (!process.env.MONGODB_URI) {
 const MONGODB_URI = process.env.MONGODB_URI;
 const DB_NAME = 'agentic_ai_db';
 const ARTICLES_COLLECTION = 'articles';
+const ARTICLE_CARDS_COLLECTION = 'article_cards';
 
 // Helper function to safely connect/close client
 // async function withDb(callback) {
@@ -69,6 +70,55 @@ router.get('/', async (req, res) => {
   }
 });
 
+// Article cards (compact projection kept by the scraper), newest first.
+// Keyset pagination: pass the returned nextCursor as ?cursor= for the next page.
+// Optional filters: ?source_id=, ?category=, ?session_id=
+router.get('/cards', async (req, res) => {
+  try {
+    const db = await connectToDatabase();
+    const limit = Math.min(Math.max(parseInt(req.query.limit, 10) || 50, 1), 200);
+    const query = {};
+    for (const key of ['source_id', 'category', 'session_id']) {
+      if (req.query[key]) query[key] = String(req.query[key]);
+    }
+    if (req.query.cursor) {
+      const [createdAt, lastId] = String(req.query.cursor).split('|');
+      query.$or = [
+        { created_at: { $lt: createdAt } },
+        { created_at: createdAt, _id: { $lt: lastId } },
+      ];
+    }
+    const cards = await db.collection(ARTICLE_CARDS_COLLECTION)
+      .find(query)
+      .sort({ created_at: -1, _id: -1 })
+      .limit(limit)
+      .toArray();
+    const last = cards[cards.length - 1];
+    const nextCursor = cards.length === limit ? `${last.created_at}|${last._id}` : null;
+
+    res.json({ success: true, cards, nextCursor });
+  } catch (error) {
+    res.status(500).json({ success: false, error: error.message });
+  }
+});
+
+// Full article behind a card (looked up by its unique session_id + url)
+router.get('/cards/:id/article', async (req, res) => {
+  try {
+    const db = await connectToDatabase();
+    const card = await db.collection(ARTICLE_CARDS_COLLECTION).findOne({ _id: req.params.id });
+    const article = card && await db.collection(ARTICLES_COLLECTION)
+      .findOne({ session_id: card.session_id, url: card.url });
+    if (!article) {
+      return res.status(404).json({ success: false, error: 'Article not found' });
+    }
+
+    res.json({ success: true, article });
+  } catch (error) {
+    res.status(500).json({ success: false, error: error.message });
+  }
+});
+
 // Get all articles
 router.get('/', async (req, res) => {
   console.log('GET /api/articles - Fetching all articles');
@@ -1,15 +1,21 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 
+const PAGE_SIZE = 50;
+
 const ScrapArticles = () => {
+  // the list shows article cards (title, summary, source...); full articles are fetched when opened
   const [articles, setArticles] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
   const [selectedArticle, setSelectedArticle] = useState(null);
   const [summarizing, setSummarizing] = useState(false);
   const [summary, setSummary] = useState('');
   const [searchQuery, setSearchQuery] = useState('');
   const [categoryFilter, setCategoryFilter] = useState('All');
+  const fullArticles = useRef(new Map());
 
   const API_BASE_URL = window.location.hostname === 'localhost' ? 'http://localhost:5000/api' : '/api';
 
@@ -17,20 +23,44 @@ const ScrapArticles = () => {
     fetchArticles();
   }, []);
 
-  const fetchArticles = async () => {
+  const fetchArticles = async (cursor = null) => {
     try {
-      setLoading(true);
-      const response = await axios.get(`${API_BASE_URL}/articles`);
-      setArticles(response.data.articles || []);
+      if (cursor) setLoadingMore(true);
+      else setLoading(true);
+      const response = await axios.get(`${API_BASE_URL}/articles/cards`, {
+        params: { limit: PAGE_SIZE, ...(cursor && { cursor }) }
+      });
+      const cards = response.data.cards || [];
+      setArticles(prev => (cursor ? [...prev, ...cards] : cards));
+      setNextCursor(response.data.nextCursor || null);
       setError(null);
     } catch (err) {
       setError('Failed to fetch articles. Please ensure the backend is running and MongoDB is accessible.');
       console.error('Error fetching articles:', err);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
+    }
+  };
+
+  // Card merged with its full article (body, word count...); the card alone if that fails
+  const loadFullArticle = async (card) => {
+    if (fullArticles.current.has(card._id)) return fullArticles.current.get(card._id);
+    try {
+      const response = await axios.get(`${API_BASE_URL}/articles/cards/${card._id}/article`);
+      const article = { ...card, ...response.data.article, _id: card._id };
+      fullArticles.current.set(card._id, article);
+      return article;
+    } catch (err) {
+      console.error('Error fetching article:', err.response?.data || err);
+      return card;
     }
   };
 
+  const showIfSelected = (article) => {
+    setSelectedArticle(current => (current?._id === article._id ? article : current));
+  };
+
   const handleSummarize = async (article) => {
     if (selectedArticle?._id === article._id && summarizing) return;
 
@@ -43,6 +73,9 @@ const ScrapArticles = () => {
     setSummary('');
 
     try {
+      article = await loadFullArticle(article);
+      showIfSelected(article);
+
       let textToSummarize = '';
       if (article.full_text) textToSummarize = article.full_text;
       else if (article.content_html) {
@@ -74,13 +107,15 @@ const ScrapArticles = () => {
     }
   };
 
-  const handleReadMore = (article) => {
+  const handleReadMore = async (article) => {
     setSelectedArticle(article);
     setSummary('');
+    showIfSelected(await loadFullArticle(article));
   };
 
   const handleGenerateLinkedInPost = async (article) => {
     try {
+      article = await loadFullArticle(article);
       let textToUse = '';
 
       if (article.full_text) textToUse = article.full_text;
@@ -311,7 +346,7 @@ const ScrapArticles = () => {
   };
 
   if (loading) return <LoadingState />;
-  if (error) return <ErrorState error={error} retry={fetchArticles} />;
+  if (error) return <ErrorState error={error} retry={() => fetchArticles()} />;
 
   return (
     <div className="min-h-screen bg-gradient-to-br from-blue-50 via-white to-purple-50 py-12 px-4 sm:px-6 lg:px-8 font-inter">
@@ -370,7 +405,7 @@ const ScrapArticles = () => {
 
           <p className="mt-4 text-sm text-gray-600">
             Showing <span className="font-semibold">{filteredArticles.length}</span> of{' '}
-            <span className="font-semibold">{articles.length}</span> articles
+            <span className="font-semibold">{articles.length}</span> loaded articles
           </p>
         </div>
 
@@ -447,6 +482,20 @@ const ScrapArticles = () => {
           ))}
         </div>
 
+        {/* Load More */}
+        {nextCursor && (
+          <div className="text-center mt-10">
+            <button
+              onClick={() => fetchArticles(nextCursor)}
+              disabled={loadingMore}
+              className="bg-gradient-to-r from-blue-600 to-purple-600 text-white px-6 py-3 rounded-lg font-medium hover:shadow-lg transition-all duration-300 disabled:opacity-50"
+            >
+              <i className={`fas ${loadingMore ? 'fa-spinner fa-spin' : 'fa-chevron-down'} mr-2`}></i>
+              {loadingMore ? 'Loading...' : 'Load More'}
+            </button>
+          </div>
+        )}
+
         {/* Modal */}
         {selectedArticle && (
           <ArticleModal
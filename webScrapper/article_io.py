@@ -0,0 +1,304 @@
+"""
+article_io.py
+
+Streaming article output for scrape_and_save.py, plus a reader for downstream code.
+
+- ndjson (default): one JSON article per line, written as each article finishes,
+  so memory stays flat and a crash keeps everything written so far.
+- json: the original single indented JSON array, still streamed element by element.
+- Either format can be compressed: gzip (stdlib) or zstd (needs `zstandard`).
+- Compact storage (compact_article): text_chunks become {chunk_id, start, end,
+  token_count} offsets into full_text, a large full_text is zstd-compressed
+  (full_text_z: bytes for MongoDB, base64 in JSON files), and content_html moves
+  out of line under content_html_ref (the <output>.bodies.ndjson sidecar file).
+  iter_chunk_texts / expand_article rebuild the classic shape lazily.
+
+    for article in iter_articles("articles_full_sess_x.ndjson.gz"):
+        ...
+    for article in iter_articles("articles_full_sess_x.ndjson", expand=True):  # compact -> classic
+        ...
+"""
+
+from __future__ import annotations
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import textwrap
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Tuple, Union
+
+# optional zstd
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except Exception:
+    ZSTD_AVAILABLE = False
+
+FORMATS = ("ndjson", "json")
+COMPRESSIONS = ("none", "gzip", "zstd")
+_COMPRESSION_SUFFIX = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def output_filename(session_id: str, fmt: str = "ndjson", compression: str = "none") -> str:
+    return f"articles_full_{session_id}.{fmt}{_COMPRESSION_SUFFIX[compression]}"
+
+
+def bodies_filename(output_path: str) -> str:
+    """Sidecar with the out-of-line content_html of a compact output file."""
+    compression = _compression_for(output_path)
+    base = output_path[: -len(_COMPRESSION_SUFFIX[compression])] if compression != "none" else output_path
+    return os.path.splitext(base)[0] + ".bodies.ndjson" + _COMPRESSION_SUFFIX[compression]
+
+
+def _open_text(path: str, mode: str, compression: str):
+    """mode is "r", "w" or "a"; returns a utf-8 text stream (appends add a new gzip member / zstd frame)."""
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard not installed; pip install zstandard or use --compress gzip.")
+        raw = open(path, mode + "b")
+        if mode in ("w", "a"):
+            stream = zstandard.ZstdCompressor(level=6).stream_writer(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True, read_across_frames=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _compression_for(path: str) -> str:
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+
+class ArticleWriter:
+    """
+    Writes articles one at a time; use as a context manager so the file is always closed.
+    `append` (ndjson only) continues an existing file, e.g. a long-running session.
+    """
+
+    def __init__(self, path: str, fmt: str = "ndjson", compression: str = "none", flush_every: int = 20,
+                 append: bool = False):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown output format: {fmt}")
+        if append and fmt != "ndjson":
+            raise ValueError("only ndjson output can be appended to")
+        self.path = path
+        self.fmt = fmt
+        self.count = 0
+        self.flush_every = max(1, flush_every)
+        self._f = _open_text(path, "a" if append else "w", compression)
+        if fmt == "json":
+            self._f.write("[")
+
+    def write(self, article: Dict[str, Any]):
+        if self.fmt == "ndjson":
+            self._f.write(json.dumps(article, ensure_ascii=False))
+            self._f.write("\n")
+        else:
+            self._f.write(",\n" if self.count else "\n")
+            self._f.write(textwrap.indent(json.dumps(article, ensure_ascii=False, indent=2), "  "))
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self._f.flush()
+
+    def flush(self):
+        if self._f is not None:
+            self._f.flush()
+
+    def close(self):
+        if self._f is None:
+            return
+        if self.fmt == "json":
+            self._f.write("\n]" if self.count else "]")
+        self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _iter_json_array(f, buffer_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Incrementally decodes a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        # skip whitespace / separators
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            buf, pos = f.read(buffer_size), 0
+            eof = not buf
+        if pos >= len(buf):
+            return
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = f.read(buffer_size)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield obj
+        pos = end
+
+
+def iter_articles(path: str, compression: Optional[str] = None, expand: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Yields articles from any file ArticleWriter produces (format/compression from the name).
+    With `expand`, compact articles come back in the classic shape (content_html from the sidecar).
+    """
+    compression = compression or _compression_for(path)
+    base = path[: -len(_COMPRESSION_SUFFIX[compression])] if compression != "none" else path
+    bodies = None
+    if expand and os.path.exists(bodies_filename(path)):
+        bodies = load_bodies(bodies_filename(path))
+    with _open_text(path, "r", compression) as f:
+        if base.endswith(".json"):
+            articles = _iter_json_array(f)
+        else:
+            articles = (json.loads(line) for line in f if line.strip())
+        for article in articles:
+            yield expand_article(article, bodies) if expand else article
+
+
+# ----- compact storage -----
+BODY_ENCODINGS = ("plain", "zstd-b64", "zstd-binary")
+
+
+def body_ref(content_html: str) -> str:
+    """Content-addressed key for an out-of-line body (identical HTML is stored once)."""
+    return hashlib.blake2b(content_html.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _compress(text: str, binary: bool) -> Union[bytes, str]:
+    data = zstandard.ZstdCompressor(level=6).compress(text.encode("utf-8"))
+    return data if binary else base64.b64encode(data).decode("ascii")
+
+
+def _decompress(blob: Union[bytes, str]) -> str:
+    if not ZSTD_AVAILABLE:
+        raise RuntimeError("zstandard not installed; it is needed to read compressed article bodies.")
+    data = base64.b64decode(blob) if isinstance(blob, str) else bytes(blob)
+    return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+
+
+def compact_article(article: Dict[str, Any], body_encoding: str = "plain",
+                    min_compress_bytes: int = 2048) -> Tuple[Dict[str, Any], Optional[Dict[str, str]]]:
+    """
+    Returns (compact copy of article, out-of-line body or None). The body is
+    {"_id": content_html_ref, "content_html": ...}; the caller stores it once per ref.
+    body_encoding: "plain", "zstd-b64" (JSON files) or "zstd-binary" (MongoDB);
+    full_text is only compressed from `min_compress_bytes` up. Both full_text and
+    full_text_z are always present (one of them None) so an upsert replaces either form.
+    """
+    if body_encoding not in BODY_ENCODINGS:
+        raise ValueError(f"unknown body encoding: {body_encoding}")
+    if body_encoding != "plain" and not ZSTD_AVAILABLE:
+        body_encoding = "plain"
+    doc = dict(article)
+    full = article_text(article)
+    chunks = []
+    for c in article.get("text_chunks") or []:
+        start, end = c.get("start"), c.get("end")
+        if start is None or end is None or full[start:end] != c.get("text", full[start:end]):
+            # not a slice of full_text (older chunker output): keep the text itself
+            chunks.append(c)
+            continue
+        chunks.append({"chunk_id": c.get("chunk_id"), "start": start, "end": end, "token_count": c.get("token_count")})
+    doc["text_chunks"] = chunks
+    doc["full_text"], doc["full_text_z"] = full or article.get("full_text"), None
+    if full and body_encoding != "plain" and len(full.encode("utf-8")) >= min_compress_bytes:
+        doc["full_text"], doc["full_text_z"] = None, _compress(full, binary=body_encoding == "zstd-binary")
+    body = None
+    html = article.get("content_html")
+    doc["content_html"], doc["content_html_ref"] = None, article.get("content_html_ref")
+    if html:
+        doc["content_html_ref"] = body_ref(html)
+        body = {"_id": doc["content_html_ref"], "content_html": html}
+    doc["storage"] = {"compact": 1, "body": body_encoding if doc["full_text_z"] is not None else "plain"}
+    return doc, body
+
+
+def article_text(article: Mapping[str, Any]) -> str:
+    """full_text of a classic or compact article (decompressed on demand)."""
+    if article.get("full_text_z") is not None:
+        return _decompress(article["full_text_z"])
+    return article.get("full_text") or ""
+
+
+def iter_chunk_texts(article: Mapping[str, Any], text: Optional[str] = None) -> Iterator[str]:
+    """Chunk texts of a classic or compact article; full_text is decoded only if a chunk needs it."""
+    for c in article.get("text_chunks") or []:
+        if "text" in c:
+            yield c["text"]
+            continue
+        if text is None:
+            text = article_text(article)
+        yield text[c["start"]:c["end"]]
+
+
+def expand_article(article: Dict[str, Any],
+                   bodies: Optional[Union[Mapping[str, str], Callable[[str], Optional[str]]]] = None) -> Dict[str, Any]:
+    """
+    Classic shape of a compact article (returned unchanged when it is not compact).
+    `bodies` resolves content_html_ref: a mapping (load_bodies) or a callable (e.g. a MongoDB lookup).
+    """
+    if not article.get("storage", {}).get("compact"):
+        return article
+    doc = {k: v for k, v in article.items() if k not in ("full_text_z", "content_html_ref", "storage")}
+    text = article_text(article)
+    doc["full_text"] = text
+    doc["text_chunks"] = [
+        c if "text" in c else {"chunk_id": c.get("chunk_id"), "text": text[c["start"]:c["end"]],
+                               "token_count": c.get("token_count"), "start": c["start"], "end": c["end"]}
+        for c in article.get("text_chunks") or []
+    ]
+    ref = article.get("content_html_ref")
+    if ref and bodies is not None:
+        doc["content_html"] = bodies(ref) if callable(bodies) else bodies.get(ref)
+    return doc
+
+
+def json_safe(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Binary full_text_z (as read back from MongoDB) in its base64 JSON form."""
+    blob = doc.get("full_text_z")
+    if isinstance(blob, (bytes, bytearray, memoryview)):
+        doc = {**doc, "full_text_z": base64.b64encode(bytes(blob)).decode("ascii"),
+               "storage": {**doc.get("storage", {}), "body": "zstd-b64"}}
+    return doc
+
+
+def body_html(stored: Optional[Mapping[str, Any]]) -> Optional[str]:
+    """content_html of a body document: sidecar form, or (zstd content_html_z) an `article_bodies` doc of older runs."""
+    if not stored:
+        return None
+    if stored.get("content_html_z") is not None:
+        return _decompress(stored["content_html_z"])
+    return stored.get("content_html")
+
+
+def load_bodies(path: str) -> Dict[str, str]:
+    return {b["_id"]: b["content_html"] for b in iter_articles(path)}
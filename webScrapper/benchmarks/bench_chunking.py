@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+bench_chunking.py
+
+Runs chunk_text_by_tokens over every article in a scraped JSON file and reports
+throughput per configuration (tiktoken vs word heuristic, boundary modes).
+Also checks the chunker's invariants: it terminates and every chunk is the
+exact slice full_text[start:end].
+
+    python benchmarks/bench_chunking.py --input articles_full_sess_a24e2072.json --repeat 5
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import scrape_and_save as sas  # noqa: E402
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(HERE), "articles_full_sess_a24e2072.json")
+
+
+def run_config(texts, label: str, use_tiktoken: bool, boundary, repeat: int, max_tokens: int, overlap: int):
+    saved = sas.TIKTOKEN_AVAILABLE
+    sas.TIKTOKEN_AVAILABLE = saved and use_tiktoken
+    sas._load_encoder.cache_clear()
+    try:
+        if use_tiktoken and not sas.TIKTOKEN_AVAILABLE:
+            print(f"{label:<28} skipped (tiktoken not installed)")
+            return
+        chunks = 0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for text in texts:
+                out = sas.chunk_text_by_tokens(text, max_tokens=max_tokens, overlap=overlap, boundary=boundary)
+                for c in out:
+                    assert c["text"] == text[c["start"]:c["end"]], "chunk is not a slice of the source text"
+                chunks += len(out)
+        elapsed = time.perf_counter() - started
+        n = len(texts) * repeat
+        print(f"{label:<28} articles/s={n / elapsed:9.1f} ms/article={elapsed * 1000 / n:7.3f} chunks={chunks // repeat}")
+    finally:
+        sas.TIKTOKEN_AVAILABLE = saved
+        sas._load_encoder.cache_clear()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, default=DEFAULT_INPUT)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=900)
+    parser.add_argument("--overlap", type=int, default=150)
+    args = parser.parse_args(argv)
+
+    with open(args.input, encoding="utf-8") as f:
+        texts = [a["full_text"] for a in json.load(f) if a.get("full_text")]
+    print(f"{len(texts)} articles, {sum(len(t) for t in texts)} chars, repeat={args.repeat}")
+
+    for use_tiktoken in (True, False):
+        for boundary in (None, "sentence", "paragraph"):
+            label = f"{'tiktoken' if use_tiktoken else 'words'} boundary={boundary}"
+            run_config(texts, label, use_tiktoken, boundary, args.repeat, args.max_tokens, args.overlap)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+bench_fetch_concurrency.py
+
+Compares sequential vs concurrent scraping against local stub hosts.
+
+    python benchmarks/bench_fetch_concurrency.py --hosts 5 --items 20 --latency 0.2 --workers 1,8,16
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scrape_and_save as sas  # noqa: E402
+from stub_server import start_hosts  # noqa: E402
+
+
+def run_once(sources, workers: int, per_host: int, delay: float) -> tuple:
+    limiter = sas.DomainRateLimiter(min_interval=delay, max_per_host=per_host)
+    started = time.perf_counter()
+    articles = sas.scrape_sources(sources, "sess_bench", workers=workers, limiter=limiter)
+    return len(articles), time.perf_counter() - started, [a["url"] for a in articles]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=5)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=str, default="1,8,16")
+    parser.add_argument("--per-host", type=int, default=2)
+    parser.add_argument("--domain-delay", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    servers = start_hosts(args.hosts, latency=args.latency, items_per_feed=args.items)
+    sources = [
+        {"_id": f"src_stub{i}", "name": f"Stub {i}", "url": srv.feed_url(i), "category": "Bench", "active": True}
+        for i, srv in enumerate(servers)
+    ]
+    try:
+        baseline_time = None
+        baseline_order = None
+        for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+            count, elapsed, order = run_once(sources, workers, args.per_host, args.domain_delay)
+            baseline_time = baseline_time or elapsed
+            baseline_order = baseline_order or order
+            print(
+                f"workers={workers:<3} articles={count:<4} time={elapsed:7.2f}s "
+                f"rate={count / elapsed:7.1f}/s speedup={baseline_time / elapsed:5.2f}x "
+                f"same_order={order == baseline_order}"
+            )
+    finally:
+        for srv in servers:
+            srv.stop()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
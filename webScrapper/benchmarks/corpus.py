@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+corpus.py
+
+Recorded feed/HTML corpus for offline benchmarks, served by stub_server.py.
+
+Layout (default benchmarks/corpus/, not committed):
+    manifest.json              sources, their feed file and page files
+    feeds/<source_id>.xml      RSS as served by the source
+    pages/<source_id>/<n>.html article HTML, n = position of the link in the feed
+
+Files are stored as templates so a corpus never goes stale:
+    {{BASE}}      the stub host's base URL (article links, canonical URLs)
+    {{AGO:<s>}}   an RFC 822 date <s> seconds before the moment it is served
+
+    python benchmarks/corpus.py --record --max-items 15          # from the live SOURCES
+    python benchmarks/corpus.py --from-articles articles_full_sess_a24e2072.json
+"""
+
+from __future__ import annotations
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+DEFAULT_CORPUS_DIR = os.path.join(HERE, "corpus")
+DEFAULT_SAMPLE = os.path.join(os.path.dirname(HERE), "articles_full_sess_a24e2072.json")
+
+_AGO_RE = re.compile(rb"\{\{AGO:(\d+)\}\}")
+_DATE_TAG_RE = re.compile(r"<(pubDate|published|updated|dc:date)>([^<]+)</\1>")
+
+
+def render(template: bytes, base: str, now: Optional[datetime] = None) -> bytes:
+    """Fills {{BASE}} and {{AGO:<s>}} placeholders for one response."""
+    now = now or datetime.now(timezone.utc)
+    out = template.replace(b"{{BASE}}", base.encode("ascii"))
+    return _AGO_RE.sub(lambda m: format_datetime(now - timedelta(seconds=int(m.group(1)))).encode("ascii"), out)
+
+
+def _templatize_dates(xml: str, reference: datetime) -> str:
+    """Feed dates become offsets from `reference` (the newest entry or recording time)."""
+    from dateutil import parser as dateparser
+
+    def repl(m):
+        try:
+            dt = dateparser.parse(m.group(2))
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            ago = max(0, int((reference - dt).total_seconds()))
+        except (ValueError, OverflowError):
+            return m.group(0)
+        return f"<{m.group(1)}>{{{{AGO:{ago}}}}}</{m.group(1)}>"
+    return _DATE_TAG_RE.sub(repl, xml)
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _page_from_article(article: Dict[str, Any], n: int) -> str:
+    """A page with the usual chrome (scripts, nav, sidebar, comments) around the article text."""
+    title = html.escape(article.get("title") or "")
+    paragraphs = [p.strip() for p in re.split(r"\n+", article.get("full_text") or "") if p.strip()]
+    body = "\n".join(f"<p>{html.escape(p)}</p>" for p in paragraphs)
+    nav = "".join(f'<li><a href="{{{{BASE}}}}/section/{i}">Section {i}</a></li>' for i in range(25))
+    related = "".join(f'<li><a href="{{{{BASE}}}}/page/{(n + i) % 50}">Related story {i}</a></li>' for i in range(1, 9))
+    lang = article.get("language") or "en"
+    return f"""<!DOCTYPE html>
+<html lang="{lang}"><head><meta charset="utf-8"><title>{title}</title>
+<link rel="canonical" href="{{{{BASE}}}}/page/{n}">
+<meta property="og:title" content="{title}"><meta property="og:locale" content="{lang}_US">
+<script>window.dataLayer = window.dataLayer || []; function gtag(){{dataLayer.push(arguments);}}</script>
+<style>body {{ font-family: sans-serif; }} .ad {{ display: none; }}</style>
+</head><body>
+<header><nav><ul>{nav}</ul></nav><div class="ad">Advertisement</div></header>
+<main><article><h1>{title}</h1><div class="byline">By Staff Writer</div>
+{body}
+</article>
+<aside><h3>Related</h3><ul>{related}</ul><div class="newsletter">Sign up for our newsletter</div></aside>
+<section class="comments"><div class="comment">Great read!</div><div class="comment">Thanks for sharing.</div></section>
+</main><footer>&copy; Example Media. All rights reserved. <a href="{{{{BASE}}}}/privacy">Privacy</a></footer>
+<script>console.log("analytics");</script></body></html>
+"""
+
+
+def build_from_articles(articles_path: str, out_dir: str) -> Dict[str, Any]:
+    """Synthesizes a corpus (feed per source + one page per article) from a scrape output file."""
+    from article_io import iter_articles
+
+    by_source: Dict[str, List[Dict[str, Any]]] = {}
+    meta: Dict[str, Dict[str, Any]] = {}
+    for a in iter_articles(articles_path):
+        if not a.get("full_text") or not str(a.get("url", "")).startswith("http"):
+            continue
+        by_source.setdefault(a["source_id"], []).append(a)
+        meta.setdefault(a["source_id"], {"name": a.get("source_name") or a["source_id"], "category": a.get("category")})
+
+    dated = [a["published_at"] for arts in by_source.values() for a in arts if a.get("published_at")]
+    reference = max((datetime.fromisoformat(d) for d in dated), default=datetime.now(timezone.utc))
+    manifest = {"created_at": time.time(), "origin": f"articles:{os.path.basename(articles_path)}", "sources": []}
+    for source_id, arts in by_source.items():
+        items = []
+        pages = []
+        for n, a in enumerate(arts):
+            pub = ""
+            if a.get("published_at"):
+                pub = format_datetime(datetime.fromisoformat(a["published_at"]))
+            items.append(
+                f"<item><title>{html.escape(a.get('title') or '')}</title><link>{{{{BASE}}}}/page/{n}</link>"
+                f"<guid>{{{{BASE}}}}/page/{n}</guid><pubDate>{pub}</pubDate>"
+                f"<description>{html.escape(a.get('summary') or '')}</description></item>"
+            )
+            page_rel = f"pages/{source_id}/{n}.html"
+            _write(os.path.join(out_dir, page_rel), _page_from_article(a, n).encode("utf-8"))
+            pages.append(page_rel)
+        xml = (
+            '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>{html.escape(meta[source_id]['name'])}</title><link>{{{{BASE}}}}/</link>"
+            f"<description>recorded corpus</description><language>en-us</language>{''.join(items)}</channel></rss>"
+        )
+        feed_rel = f"feeds/{source_id}.xml"
+        _write(os.path.join(out_dir, feed_rel), _templatize_dates(xml, reference).encode("utf-8"))
+        manifest["sources"].append({"_id": source_id, **meta[source_id], "feed": feed_rel, "pages": pages})
+    _write(os.path.join(out_dir, "manifest.json"), json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+
+def record_live(out_dir: str, max_items: int = 15, timeout: int = 12) -> Dict[str, Any]:
+    """Downloads the live SOURCES feeds and up to `max_items` article pages per source."""
+    import feedparser
+    import scrape_and_save as sas
+
+    recorded_at = datetime.now(timezone.utc)
+    manifest = {"created_at": time.time(), "origin": "live", "sources": []}
+    for src in [s for s in sas.SOURCES if s.get("active", True)]:
+        try:
+            r = sas.GLOBAL_SESSION.get(src["url"], timeout=timeout)
+            r.raise_for_status()
+        except Exception as e:
+            print(f"skip {src['_id']}: {e}")
+            continue
+        xml = r.content.decode(r.encoding or "utf-8", errors="replace")
+        links = [e.get("link") for e in feedparser.parse(r.content).entries if e.get("link")]
+        pages = []
+        for n, link in enumerate(links[:max_items]):
+            try:
+                page = sas.GLOBAL_SESSION.get(link, timeout=timeout)
+                page.raise_for_status()
+            except Exception as e:
+                print(f"  skip {link}: {e}")
+                continue
+            page_rel = f"pages/{src['_id']}/{n}.html"
+            _write(os.path.join(out_dir, page_rel), page.content)
+            pages.append(page_rel)
+            for form in {link, html.escape(link, quote=False)}:
+                xml = xml.replace(f">{form}<", f">{{{{BASE}}}}/page/{n}<")
+                xml = xml.replace(f'"{form}"', f'"{{{{BASE}}}}/page/{n}"')  # Atom <link href="...">
+        feed_rel = f"feeds/{src['_id']}.xml"
+        _write(os.path.join(out_dir, feed_rel), _templatize_dates(xml, recorded_at).encode("utf-8"))
+        manifest["sources"].append({"_id": src["_id"], "name": src["name"], "category": src.get("category"),
+                                    "feed": feed_rel, "pages": pages})
+        print(f"recorded {src['_id']}: {len(pages)} pages")
+    _write(os.path.join(out_dir, "manifest.json"), json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+
+def load_corpus(corpus_dir: str) -> Dict[str, Any]:
+    """Manifest with the feed and page templates loaded as bytes (feed_bytes, page_bytes)."""
+    with open(os.path.join(corpus_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    for src in manifest["sources"]:
+        with open(os.path.join(corpus_dir, src["feed"]), "rb") as f:
+            src["feed_bytes"] = f.read()
+        src["page_bytes"] = {}
+        for rel in src["pages"]:
+            n = int(os.path.splitext(os.path.basename(rel))[0])
+            with open(os.path.join(corpus_dir, rel), "rb") as f:
+                src["page_bytes"][n] = f.read()
+    return manifest
+
+
+def ensure_corpus(corpus_dir: str = DEFAULT_CORPUS_DIR, sample: str = DEFAULT_SAMPLE) -> Dict[str, Any]:
+    """Loads the corpus, building it from the bundled sample session first if there is none yet."""
+    if not os.path.exists(os.path.join(corpus_dir, "manifest.json")):
+        build_from_articles(sample, corpus_dir)
+    return load_corpus(corpus_dir)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", type=str, default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--record", action="store_true", help="Record the live SOURCES (needs network).")
+    parser.add_argument("--max-items", type=int, default=15)
+    parser.add_argument("--from-articles", type=str, default=None, help="Build from a scrape output file instead.")
+    args = parser.parse_args(argv)
+    if args.record:
+        manifest = record_live(args.out, max_items=args.max_items)
+    else:
+        manifest = build_from_articles(args.from_articles or DEFAULT_SAMPLE, args.out)
+    print(f"{len(manifest['sources'])} sources, {sum(len(s['pages']) for s in manifest['sources'])} pages -> {args.out}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
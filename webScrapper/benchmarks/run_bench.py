@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+run_bench.py
+
+Offline benchmark runner: the recorded corpus (corpus.py) served by local stub
+hosts (stub_server.py), so nothing touches the live SOURCES.
+
+Benchmarks (each runs in a fresh child process, so peak RSS is per benchmark):
+- e2e         scrape_and_save.main() end to end against the stub hosts
+              (articles/s, per-stage p50/p95 from the run's metrics JSON)
+- extraction  extract_from_html (the CPU half of fetch_full_text) over the corpus pages
+- chunking    chunk_text_by_tokens over the extracted texts
+- date_filter entry_published_at + is_within_window over the corpus feed entries
+- output      ArticleWriter ndjson / json / gzip (/ zstd), and BulkArticleWriter
+              when MONGODB_URI is set (into a throwaway database)
+- startup     fresh-interpreter `import scrape_and_save` and `scrape_and_save.py --help`
+              (wall time; the bare interpreter start is measured alongside)
+
+Results are saved to benchmarks/results/<UTC time>_<git sha>.json and compared
+with a baseline (the previous results file, or --baseline); a throughput drop
+beyond --tolerance is reported as a regression (exit code 1 with --fail-on-regression).
+
+    python benchmarks/run_bench.py
+    python benchmarks/run_bench.py --only e2e --latency 0.2 --error-rate 0.05 --workers 16
+"""
+
+from __future__ import annotations
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RESULTS_DIR = os.path.join(HERE, "results")
+BENCHMARKS = ("e2e", "extraction", "chunking", "date_filter", "output", "startup")
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _corpus(params: Dict[str, Any]) -> Dict[str, Any]:
+    from corpus import ensure_corpus
+    return ensure_corpus(params["corpus"])
+
+
+# ----- benchmarks (run inside the child process) -----
+def bench_e2e(params: Dict[str, Any]) -> Dict[str, Any]:
+    import scrape_and_save as sas
+    from article_io import iter_articles
+    from stub_server import source_dicts, start_corpus_hosts
+
+    servers = start_corpus_hosts(_corpus(params), latency=params["latency"], jitter=params["jitter"],
+                                 error_rate=params["error_rate"], seed=params["seed"])
+    sas.SOURCES = source_dicts(servers)
+    sas.PROJECT_FILES = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            argv = ["--no-db", "--no-cache", "--session-id", "sess_bench", "--output-dir", tmp,
+                    "--workers", str(params["workers"]), "--cpu-workers", str(params["cpu_workers"]),
+                    "--per-host", str(params["per_host"]), "--domain-delay", str(params["domain_delay"])]
+            started = time.perf_counter()
+            sas.main(argv)
+            elapsed = time.perf_counter() - started
+            articles = sum(1 for _ in iter_articles(os.path.join(tmp, "articles_full_sess_bench.ndjson")))
+            with open(os.path.join(tmp, "metrics_sess_bench.json"), encoding="utf-8") as f:
+                run_metrics = json.load(f)
+    finally:
+        for srv in servers:
+            srv.stop()
+    return {
+        "articles": articles,
+        "seconds": round(elapsed, 3),
+        "throughput": round(articles / elapsed, 2),
+        "throughput_unit": "articles/s",
+        "requests": sum(s.request_count for s in servers),
+        "injected_errors": sum(s.error_count for s in servers),
+        "stages": {k: {m: v[m] for m in ("count", "total_ms", "p50_ms", "p95_ms")} for k, v in run_metrics["stages"].items()},
+    }
+
+
+def bench_extraction(params: Dict[str, Any]) -> Dict[str, Any]:
+    import scrape_and_save as sas
+    from corpus import render
+
+    base = "http://bench.local"
+    pages = [render(page, base).decode("utf-8", errors="replace")
+             for src in _corpus(params)["sources"] for page in src["page_bytes"].values()]
+    stages: Dict[str, List[float]] = {}
+    methods: Dict[str, int] = {}
+    started = time.perf_counter()
+    for _ in range(params["repeat"]):
+        for page in pages:
+            result = sas.extract_from_html(page, base + "/page/0")
+            methods[result.get("fetch_method") or "none"] = methods.get(result.get("fetch_method") or "none", 0) + 1
+            for k, v in result.get("timings", {}).items():
+                stages.setdefault(k[:-3], []).append(v)
+    elapsed = time.perf_counter() - started
+    n = len(pages) * params["repeat"]
+    return {
+        "pages": n,
+        "seconds": round(elapsed, 3),
+        "throughput": round(n / elapsed, 2),
+        "throughput_unit": "pages/s",
+        "fetch_methods": methods,
+        "stages": {k: _stage(v) for k, v in stages.items()},
+    }
+
+
+def _sample_texts(params: Dict[str, Any]) -> List[str]:
+    from article_io import iter_articles
+    return [a["full_text"] for a in iter_articles(params["sample"]) if a.get("full_text")]
+
+
+def bench_chunking(params: Dict[str, Any]) -> Dict[str, Any]:
+    import scrape_and_save as sas
+
+    texts = _sample_texts(params)
+    chunks = 0
+    samples = []
+    started = time.perf_counter()
+    for _ in range(params["repeat"]):
+        for text in texts:
+            t0 = time.perf_counter()
+            chunks += len(sas.chunk_text_by_tokens(text, max_tokens=900, overlap=150))
+            samples.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+    n = len(texts) * params["repeat"]
+    return {
+        "articles": n,
+        "chunks": chunks,
+        "exact_tokens": sas.get_encoder() is not None,
+        "seconds": round(elapsed, 3),
+        "throughput": round(n / elapsed, 2),
+        "throughput_unit": "articles/s",
+        "mb_per_s": round(sum(len(t) for t in texts) * params["repeat"] / elapsed / 1e6, 2),
+        "stages": {"chunking": _stage(samples)},
+    }
+
+
+def bench_date_filter(params: Dict[str, Any]) -> Dict[str, Any]:
+    from datetime import timedelta
+    import feedparser
+    import scrape_and_save as sas
+    from corpus import render
+
+    entries = [e for src in _corpus(params)["sources"]
+               for e in feedparser.parse(render(src["feed_bytes"], "http://bench.local")).entries]
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
+    kept = 0
+    repeat = params["repeat"] * 20
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for e in entries:
+            kept += sas.is_within_window(sas.entry_published_at(e), cutoff)
+    elapsed = time.perf_counter() - started
+    n = len(entries) * repeat
+    return {
+        "entries": n,
+        "kept_fraction": round(kept / n, 3) if n else 0.0,
+        "seconds": round(elapsed, 3),
+        "throughput": round(n / elapsed, 2),
+        "throughput_unit": "entries/s",
+    }
+
+
+def bench_output(params: Dict[str, Any]) -> Dict[str, Any]:
+    from article_io import ArticleWriter, ZSTD_AVAILABLE, iter_articles
+
+    articles = list(iter_articles(params["sample"]))
+    variants = [("ndjson", "none"), ("json", "none"), ("ndjson", "gzip")]
+    if ZSTD_AVAILABLE:
+        variants.append(("ndjson", "zstd"))
+    out: Dict[str, Any] = {"articles": len(articles) * params["repeat"], "variants": {}}
+    total = 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, compression in variants:
+            path = os.path.join(tmp, f"out.{fmt}.{compression}")
+            started = time.perf_counter()
+            with ArticleWriter(path, fmt=fmt, compression=compression) as writer:
+                for _ in range(params["repeat"]):
+                    for a in articles:
+                        writer.write(a)
+            elapsed = time.perf_counter() - started
+            total += elapsed
+            out["variants"][f"{fmt}+{compression}"] = {
+                "seconds": round(elapsed, 3),
+                "articles_per_s": round(out["articles"] / elapsed, 1),
+                "bytes": os.path.getsize(path),
+            }
+    out["seconds"] = round(total, 3)
+    out["throughput"] = round(out["articles"] * len(variants) / total, 2)
+    out["throughput_unit"] = "articles/s"
+    out["mongo"] = _bench_mongo(articles, params)
+    return out
+
+
+def _bench_mongo(articles: List[Dict[str, Any]], params: Dict[str, Any]) -> Dict[str, Any]:
+    if not os.environ.get("MONGODB_URI", "").strip():
+        return {"skipped": "MONGODB_URI not set"}
+    import scrape_and_save as sas
+
+    client, _ = sas.get_mongo_db()
+    db = client["scraper_bench"]
+    try:
+        sas.ensure_indexes(db)
+        docs = [{**a, "session_id": f"sess_bench_{i}"} for i in range(params["repeat"]) for a in articles]
+        started = time.perf_counter()
+        writer = sas.BulkArticleWriter(db, batch_size=100)
+        for d in docs:
+            writer.add(d)
+        totals = writer.close()
+        elapsed = time.perf_counter() - started
+        return {"articles": len(docs), "seconds": round(elapsed, 3), "articles_per_s": round(len(docs) / elapsed, 1), **totals}
+    finally:
+        client.drop_database("scraper_bench")
+        sas.close_mongo_clients()
+
+
+def bench_startup(params: Dict[str, Any]) -> Dict[str, Any]:
+    script_dir = os.path.dirname(HERE)
+    commands = {
+        "interpreter": [sys.executable, "-c", "pass"],
+        "import": [sys.executable, "-c", "import scrape_and_save"],
+        "help": [sys.executable, os.path.join(script_dir, "scrape_and_save.py"), "--help"],
+    }
+    runs = 5 * params["repeat"]
+    samples: Dict[str, List[float]] = {name: [] for name in commands}
+    started = time.perf_counter()
+    for _ in range(runs):
+        for name, cmd in commands.items():
+            t0 = time.perf_counter()
+            subprocess.run(cmd, cwd=script_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            samples[name].append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+    stages = {name: _stage(values) for name, values in samples.items()}
+    return {
+        "runs": runs,
+        "import_overhead_ms": round(stages["import"]["p50_ms"] - stages["interpreter"]["p50_ms"], 1),
+        "seconds": round(elapsed, 3),
+        "throughput": round(1000 / stages["import"]["p50_ms"], 2),
+        "throughput_unit": "imports/s",
+        "stages": stages,
+    }
+
+
+def _stage(values: List[float]) -> Dict[str, float]:
+    from metrics import _stage_stats
+    st = _stage_stats(values)
+    return {m: st[m] for m in ("count", "total_ms", "p50_ms", "p95_ms")}
+
+
+# ----- parent: run children, save, compare -----
+def _git_rev() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                               capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "nogit"
+
+
+def run_child(name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name, "--params", json.dumps(params)],
+                          capture_output=True, text=True)
+    lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        return {"error": (proc.stderr or proc.stdout).strip().splitlines()[-1:] or ["failed"]}
+    return json.loads(lines[-1])
+
+
+def latest_results(exclude: Optional[str] = None) -> Optional[str]:
+    files = sorted(f for f in glob.glob(os.path.join(RESULTS_DIR, "*.json")) if f != exclude)
+    return files[-1] if files else None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Benchmarks whose throughput dropped by more than `tolerance` (fraction) against the baseline."""
+    regressions = []
+    print(f"\nvs baseline {baseline.get('git_rev')} ({baseline.get('timestamp')}):")
+    for name, result in current["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(name, {})
+        if "throughput" not in result or "throughput" not in old:
+            continue
+        change = (result["throughput"] - old["throughput"]) / old["throughput"] if old["throughput"] else 0.0
+        flag = "REGRESSION" if change < -tolerance else ""
+        if flag:
+            regressions.append(name)
+        print(f"  {name:<12} {old['throughput']:>10.1f} -> {result['throughput']:>10.1f} {result['throughput_unit']:<11} {change:+7.1%} {flag}")
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", type=str, default=",".join(BENCHMARKS), help=f"Comma-separated subset of {', '.join(BENCHMARKS)}")
+    parser.add_argument("--corpus", type=str, default=os.path.join(HERE, "corpus"), help="Corpus directory (built from --sample if missing).")
+    parser.add_argument("--sample", type=str, default=os.path.join(os.path.dirname(HERE), "articles_full_sess_a24e2072.json"))
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions for the micro-benchmarks.")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--cpu-workers", type=int, default=0)
+    parser.add_argument("--per-host", type=int, default=2)
+    parser.add_argument("--domain-delay", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub response delay in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay up to this many seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub requests answered with 503.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=str, default=None, help="Results file to compare with (default: the latest saved one).")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed throughput drop before flagging a regression.")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--child", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--params", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        logging.disable(logging.WARNING)
+        result = globals()[f"bench_{args.child}"](json.loads(args.params))
+        result["peak_rss_mb"] = peak_rss_mb()
+        print(json.dumps(result))
+        return 0
+
+    params = {k: getattr(args, k) for k in ("corpus", "sample", "repeat", "workers", "cpu_workers", "per_host",
+                                            "domain_delay", "latency", "jitter", "error_rate", "seed")}
+    from corpus import ensure_corpus
+    ensure_corpus(args.corpus, args.sample)
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} cpus={os.cpu_count()}",
+        "params": params,
+        "benchmarks": {},
+    }
+    for name in [n.strip() for n in args.only.split(",") if n.strip()]:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+        result = run_child(name, params)
+        report["benchmarks"][name] = result
+        if "error" in result:
+            print(f"{name:<12} FAILED: {result['error']}")
+            continue
+        print(f"{name:<12} {result['throughput']:>10.1f} {result['throughput_unit']:<11} "
+              f"{result['seconds']:>8.2f}s  peak_rss={result['peak_rss_mb']} MB")
+        for stage, st in sorted(result.get("stages", {}).items(), key=lambda kv: -kv[1]["total_ms"])[:8]:
+            print(f"    {stage:<22} p50={st['p50_ms']:>8.1f}ms p95={st['p95_ms']:>8.1f}ms total={st['total_ms']:>9.0f}ms")
+
+    saved = None
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        saved = os.path.join(RESULTS_DIR, f"{report['timestamp'].replace(':', '')}_{report['git_rev']}.json")
+        with open(saved, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nresults saved to {saved}")
+
+    baseline_path = args.baseline or latest_results(exclude=saved)
+    regressions: List[str] = []
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,169 @@
+"""
+stub_server.py
+
+Local HTTP stub that serves synthetic RSS feeds and article pages so the
+scraper can be benchmarked without touching the live SOURCES.
+
+- GET /feed/<feed_no>.xml          -> RSS 2.0 with `items_per_feed` items
+- GET /article/<feed_no>/<item_no> -> article HTML (~paragraphs of filler text)
+
+With `corpus_source` (one source from corpus.load_corpus) it serves that recorded
+source instead:
+- GET /feed.xml                    -> the recorded feed
+- GET /page/<n>                    -> the recorded article page n
+
+Every response is delayed by `latency` seconds (+ up to `jitter`) to mimic network
+waits, and a seeded `error_rate` fraction of requests answers `error_status`
+(503 by default, which GLOBAL_SESSION retries with backoff).
+"""
+
+from __future__ import annotations
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from corpus import render
+
+FILLER = (
+    "Stub article paragraph used for scraper benchmarks. It carries enough words "
+    "for the extractors to treat the page as real content rather than boilerplate. "
+)
+
+
+def _rss(base: str, feed_no: int, items: int) -> bytes:
+    now = format_datetime(datetime.now(timezone.utc))
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<rss version="2.0"><channel>',
+        f"<title>Stub feed {feed_no}</title><link>{base}/</link><description>stub</description>",
+    ]
+    for i in range(items):
+        link = f"{base}/article/{feed_no}/{i}"
+        parts.append(
+            f"<item><title>Stub story {feed_no}-{i}</title><link>{link}</link>"
+            f"<guid>{link}</guid><pubDate>{now}</pubDate>"
+            f"<description>Summary for stub story {feed_no}-{i}.</description></item>"
+        )
+    parts.append("</channel></rss>")
+    return "".join(parts).encode("utf-8")
+
+
+def _article(base: str, feed_no: int, item_no: int, paragraphs: int) -> bytes:
+    body = "".join(f"<p>{FILLER * 3}</p>" for _ in range(paragraphs))
+    return (
+        f'<html lang="en"><head><title>Stub story {feed_no}-{item_no}</title>'
+        f'<link rel="canonical" href="{base}/article/{feed_no}/{item_no}"></head>'
+        f"<body><nav>menu</nav><article><h1>Stub story {feed_no}-{item_no}</h1>{body}</article>"
+        f"<footer>footer</footer></body></html>"
+    ).encode("utf-8")
+
+
+class StubServer:
+    """Runs a ThreadingHTTPServer on 127.0.0.1 in a background thread."""
+
+    def __init__(self, latency: float = 0.2, items_per_feed: int = 20, paragraphs: int = 8,
+                 jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 503, seed: int = 0,
+                 corpus_source: Optional[Dict[str, Any]] = None):
+        self.latency = latency
+        self.items_per_feed = items_per_feed
+        self.paragraphs = paragraphs
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.corpus_source = corpus_source
+        self._rng = random.Random(seed)
+        self.request_count = 0
+        self.error_count = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def feed_url(self, feed_no: int) -> str:
+        return f"{self.base_url}/feed/{feed_no}.xml"
+
+    def _route(self, parts: List[str]):
+        """(content_type, payload) for a request path, or raises ValueError/IndexError/KeyError for 404."""
+        if self.corpus_source is not None:
+            if parts[0] == "feed.xml":
+                return "application/rss+xml", render(self.corpus_source["feed_bytes"], self.base_url)
+            if parts[0] == "page":
+                return "text/html; charset=utf-8", render(self.corpus_source["page_bytes"][int(parts[1])], self.base_url)
+            raise ValueError("/".join(parts))
+        if parts[0] == "feed":
+            return "application/rss+xml", _rss(self.base_url, int(parts[1].split(".")[0]), self.items_per_feed)
+        if parts[0] == "article":
+            return "text/html; charset=utf-8", _article(self.base_url, int(parts[1]), int(parts[2]), self.paragraphs)
+        raise ValueError("/".join(parts))
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.request_count += 1
+                    delay = stub.latency + (stub._rng.uniform(0, stub.jitter) if stub.jitter else 0.0)
+                    fail = stub.error_rate > 0 and stub._rng.random() < stub.error_rate
+                    if fail:
+                        stub.error_count += 1
+                if delay:
+                    threading.Event().wait(delay)
+                if fail:
+                    self.send_error(stub.error_status)
+                    return
+                try:
+                    ctype, payload = stub._route(self.path.strip("/").split("/"))
+                except (ValueError, IndexError, KeyError):
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def start_hosts(n_hosts: int, **kwargs) -> List[StubServer]:
+    """One stub per simulated host (each listens on its own port, i.e. its own netloc)."""
+    return [StubServer(**kwargs).start() for _ in range(n_hosts)]
+
+
+def start_corpus_hosts(corpus: Dict[str, Any], seed: int = 0, **kwargs) -> List[StubServer]:
+    """One stub per recorded source; `source_dicts` turns them into scraper SOURCES entries."""
+    return [StubServer(corpus_source=src, seed=seed + i, **kwargs).start() for i, src in enumerate(corpus["sources"])]
+
+
+def source_dicts(servers: List[StubServer]) -> List[Dict[str, Any]]:
+    return [
+        {"_id": srv.corpus_source["_id"], "name": srv.corpus_source["name"], "type": "rss",
+         "url": f"{srv.base_url}/feed.xml", "category": srv.corpus_source.get("category"), "active": True}
+        for srv in servers
+    ]
@@ -0,0 +1,209 @@
+"""
+dedup.py
+
+Near-duplicate detection for scraped articles (same story syndicated or rewritten
+across TechCrunch / The Verge / VentureBeat ...).
+
+- Signature: MinHash over word 5-shingles of full_text (numpy-vectorized when
+  numpy is installed, pure Python otherwise; both give identical signatures).
+- Index: banded LSH (bands x rows = num_perm), stored in SQLite so clusters carry
+  across sessions. Each article only looks at the docs sharing one of its band
+  buckets, so indexing N articles costs ~O(N) instead of O(N^2) comparisons.
+- Output: article["dedup"] = { cluster_id, duplicate_of, similarity }.
+  Candidates are confirmed with the estimated Jaccard similarity >= threshold.
+"""
+
+from __future__ import annotations
+import hashlib
+import random
+import re
+import sqlite3
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+# optional vectorized minhash
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except Exception:
+    NUMPY_AVAILABLE = False
+
+from article_io import article_text
+from fetch_cache import normalize_url
+
+HASH_PRIME = 4294967311  # smallest prime above 2**32; a*x+b stays below 2**63 for 32-bit x
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    doc_key TEXT PRIMARY KEY,
+    cluster_id TEXT NOT NULL,
+    richness INTEGER NOT NULL,
+    signature BLOB NOT NULL,
+    session_id TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    doc_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_buckets ON buckets (band, bucket);
+"""
+
+
+def shingle_hashes(text: str, k: int = 5) -> List[int]:
+    """32-bit hashes of the distinct lower-cased word k-shingles of text."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < k:
+        grams = {" ".join(words)} if words else set()
+    else:
+        grams = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+    return [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") for g in grams]
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.a = [rng.randrange(1, 1 << 31) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, 1 << 31) for _ in range(num_perm)]
+        if NUMPY_AVAILABLE:
+            self._a = np.array(self.a, dtype=np.uint64)[:, None]
+            self._b = np.array(self.b, dtype=np.uint64)[:, None]
+
+    def signature(self, hashes: Sequence[int]) -> List[int]:
+        if not hashes:
+            return [HASH_PRIME] * self.num_perm
+        if NUMPY_AVAILABLE:
+            x = np.array(hashes, dtype=np.uint64)[None, :]
+            return ((self._a * x + self._b) % np.uint64(HASH_PRIME)).min(axis=1).tolist()
+        return [min((a * x + b) % HASH_PRIME for x in hashes) for a, b in zip(self.a, self.b)]
+
+
+def _pack(sig: Sequence[int]) -> bytes:
+    return struct.pack(f"<{len(sig)}Q", *sig)
+
+
+def _unpack(blob: bytes) -> List[int]:
+    return list(struct.unpack(f"<{len(blob) // 8}Q", blob))
+
+
+def estimated_jaccard(a: Sequence[int], b: Sequence[int]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / max(1, len(a))
+
+
+class DedupIndex:
+    """
+    Persistent LSH index. scrape_and_save feeds it from the main thread in output
+    order; a lock still guards the connection for other library callers.
+    """
+
+    def __init__(self, path: str, num_perm: int = 64, bands: int = 16, threshold: float = 0.6,
+                 shingle_size: int = 5, min_words: int = 50):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self.hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        # cluster_id -> richness of the copy kept in this run (for drop_duplicates)
+        self.kept_in_run: Dict[str, int] = {}
+        self.stats = {"indexed": 0, "duplicates": 0, "dropped": 0, "too_short": 0}
+
+    def _band_keys(self, sig: Sequence[int]) -> List[int]:
+        keys = []
+        for band in range(self.bands):
+            chunk = _pack(sig[band * self.rows:(band + 1) * self.rows])
+            keys.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True))
+        return keys
+
+    @staticmethod
+    def doc_key(article: Dict[str, Any]) -> str:
+        url = article.get("canonical_url") or article.get("url") or ""
+        return normalize_url(url) if url.startswith(("http://", "https://")) else url
+
+    @staticmethod
+    def richness(article: Dict[str, Any]) -> int:
+        return int(article.get("word_count") or 0)
+
+    def assign(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Computes the article's signature, finds its cluster (creating one if needed),
+        indexes it, and returns the dedup record (None when the text is too short).
+        """
+        text = article_text(article)
+        if self.richness(article) < self.min_words:
+            self.stats["too_short"] += 1
+            return None
+        key = self.doc_key(article)
+        with self._lock:
+            row = self._conn.execute("SELECT cluster_id FROM docs WHERE doc_key = ?", (key,)).fetchone()
+            if row:
+                # same URL seen in an earlier session: same cluster, nothing new to index
+                return {"cluster_id": row[0], "duplicate_of": None, "similarity": 1.0}
+
+            sig = self.hasher.signature(shingle_hashes(text, self.shingle_size))
+            band_keys = self._band_keys(sig)
+            candidates = set()
+            for band, bucket in enumerate(band_keys):
+                for (cand,) in self._conn.execute(
+                    "SELECT doc_key FROM buckets WHERE band = ? AND bucket = ?", (band, bucket)
+                ):
+                    candidates.add(cand)
+
+            best_key, best_sim, cluster_id = None, 0.0, None
+            for cand in candidates:
+                crow = self._conn.execute("SELECT cluster_id, signature FROM docs WHERE doc_key = ?", (cand,)).fetchone()
+                if not crow:
+                    continue
+                sim = estimated_jaccard(sig, _unpack(crow[1]))
+                if sim >= self.threshold and sim > best_sim:
+                    best_key, best_sim, cluster_id = cand, sim, crow[0]
+            if cluster_id is None:
+                cluster_id = "dup_" + hashlib.blake2b(key.encode("utf-8"), digest_size=6).hexdigest()
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO docs (doc_key, cluster_id, richness, signature, session_id, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, cluster_id, self.richness(article), _pack(sig), article.get("session_id"), time.time()),
+            )
+            self._conn.executemany(
+                "INSERT INTO buckets (band, bucket, doc_key) VALUES (?, ?, ?)",
+                [(band, bucket, key) for band, bucket in enumerate(band_keys)],
+            )
+            self._conn.commit()
+        self.stats["indexed"] += 1
+        if best_key:
+            self.stats["duplicates"] += 1
+        return {"cluster_id": cluster_id, "duplicate_of": best_key, "similarity": round(best_sim, 3) if best_key else None}
+
+    def process(self, article: Dict[str, Any], drop_duplicates: bool = False) -> bool:
+        """
+        Annotates article["dedup"]; returns False when the article should be dropped
+        (drop_duplicates and an equally rich or richer copy was already kept in this run).
+        Streaming output cannot retract a copy already written, so a later, richer copy
+        is still kept.
+        """
+        record = self.assign(article)
+        if record is None:
+            return True
+        article["dedup"] = record
+        cluster = record["cluster_id"]
+        kept = self.kept_in_run.get(cluster)
+        if drop_duplicates and kept is not None and kept >= self.richness(article):
+            self.stats["dropped"] += 1
+            return False
+        self.kept_in_run[cluster] = max(kept or 0, self.richness(article))
+        return True
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
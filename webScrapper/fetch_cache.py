@@ -0,0 +1,274 @@
+"""
+fetch_cache.py
+
+Cross-session article cache used by scrape_and_save.py.
+
+- Keyed by a normalized URL (lower-cased host, no fragment, no tracking params);
+  the page's canonical URL is stored as an alias so either form hits, unless that
+  URL has an entry of its own (which always wins over an alias).
+- Stores the extracted result (full_text, content_html, canonical_url, language,
+  text_chunks, fetch_method) so a hit skips both the network and extraction.
+  Chunks are kept as offsets into full_text and sliced back out on lookup.
+- Entries younger than `ttl_seconds` are served directly; older entries are
+  revalidated with a conditional GET (ETag / Last-Modified).
+- Total stored size is bounded; least-recently-used entries are evicted first.
+- Also keeps per-source feed state between runs: the feed's ETag / Last-Modified
+  and the entry GUIDs already seen, so polling only passes new entries on.
+"""
+
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+TRACKING_PARAM_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "guccounter", "cmpid", "ncid"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url_key TEXT PRIMARY KEY,
+    canonical_url TEXT,
+    full_text TEXT,
+    content_html TEXT,
+    language TEXT,
+    text_chunks TEXT,
+    fetch_method TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_accessed ON articles (accessed_at);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias_key TEXT PRIMARY KEY,
+    url_key TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS feed_state (
+    source_id TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    checked_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen_entries (
+    source_id TEXT NOT NULL,
+    guid TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (source_id, guid)
+);
+CREATE INDEX IF NOT EXISTS idx_seen_entries_seen_at ON seen_entries (seen_at);
+"""
+
+
+def normalize_url(url: str) -> str:
+    """Stable cache key for an article URL."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PARAM_PREFIXES)
+    ]
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+def _chunks_to_offsets(chunks: List[Dict[str, Any]], full_text: str) -> List[Dict[str, Any]]:
+    out = []
+    for c in chunks:
+        start, end = c.get("start"), c.get("end")
+        if start is not None and end is not None and full_text[start:end] == c.get("text"):
+            c = {k: v for k, v in c.items() if k != "text"}
+        out.append(c)
+    return out
+
+
+def _chunks_from_offsets(chunks: List[Dict[str, Any]], full_text: str) -> List[Dict[str, Any]]:
+    return [c if "text" in c else {"chunk_id": c.get("chunk_id"), "text": full_text[c["start"]:c["end"]], **c} for c in chunks]
+
+
+class FetchCache:
+    """Thread-safe SQLite store; one connection guarded by a lock."""
+
+    def __init__(self, path: str, ttl_seconds: float = 24 * 3600, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM articles").fetchone()[0]
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached record (with `fresh` set when inside the TTL) or None.
+        Does not update hit/miss counters; callers report the outcome via record_*().
+        """
+        key = normalize_url(url)
+        now = time.time()
+        query = ("SELECT url_key, canonical_url, full_text, content_html, language, text_chunks, fetch_method, "
+                 "etag, last_modified, fetched_at FROM articles WHERE url_key = ?")
+        with self._lock:
+            # the URL's own entry wins; the aliases (other pages' canonical URLs) are only a fallback
+            row = self._conn.execute(query, (key,)).fetchone()
+            if row is None:
+                alias = self._conn.execute("SELECT url_key FROM aliases WHERE alias_key = ?", (key,)).fetchone()
+                row = self._conn.execute(query, (alias[0],)).fetchone() if alias else None
+            if row is None:
+                return None
+            self._conn.execute("UPDATE articles SET accessed_at = ? WHERE url_key = ?", (now, row[0]))
+        return {
+            "url_key": row[0],
+            "canonical_url": row[1],
+            "full_text": row[2],
+            "content_html": row[3],
+            "language": row[4],
+            "text_chunks": _chunks_from_offsets(json.loads(row[5]) if row[5] else [], row[2] or ""),
+            "fetch_method": row[6],
+            "etag": row[7],
+            "last_modified": row[8],
+            "fresh": (now - row[9]) < self.ttl_seconds,
+        }
+
+    @staticmethod
+    def conditional_headers(record: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if record and record.get("etag"):
+            headers["If-None-Match"] = record["etag"]
+        if record and record.get("last_modified"):
+            headers["If-Modified-Since"] = record["last_modified"]
+        return headers
+
+    def refresh(self, record: Dict[str, Any]):
+        """Mark a stale record as fresh again after a 304 Not Modified."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE articles SET fetched_at = ?, accessed_at = ? WHERE url_key = ?", (now, now, record["url_key"])
+            )
+
+    def store(self, url: str, result: Dict[str, Any], etag: Optional[str] = None, last_modified: Optional[str] = None):
+        key = normalize_url(url)
+        chunks = json.dumps(_chunks_to_offsets(result.get("text_chunks") or [], result.get("full_text") or ""),
+                            ensure_ascii=False)
+        fields = (
+            result.get("canonical_url"), result.get("full_text"), result.get("content_html"),
+            result.get("language"), chunks, result.get("fetch_method"), etag, last_modified,
+        )
+        size = sum(len(f) for f in fields if isinstance(f, str))
+        now = time.time()
+        canonical = result.get("canonical_url")
+        alias = normalize_url(canonical) if canonical and canonical.startswith(("http://", "https://")) else None
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM articles WHERE url_key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO articles (url_key, canonical_url, full_text, content_html, language, text_chunks, "
+                "fetch_method, etag, last_modified, fetched_at, accessed_at, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, *fields, now, now, size),
+            )
+            # a URL stored under its own key never becomes (or stays) an alias of another page
+            self._conn.execute("DELETE FROM aliases WHERE alias_key = ?", (key,))
+            if alias and alias != key:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO aliases (alias_key, url_key) SELECT ?, ? "
+                    "WHERE NOT EXISTS (SELECT 1 FROM articles WHERE url_key = ?)", (alias, key, alias))
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least-recently-accessed entries until under 90% of max_bytes. Caller holds the lock."""
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT url_key, size FROM articles ORDER BY accessed_at ASC").fetchall()
+        victims = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM articles WHERE url_key = ?", victims)
+        self._conn.executemany("DELETE FROM aliases WHERE url_key = ?", victims)
+
+    # ----- feed polling state -----
+    def get_feed_state(self, source_id: str) -> Dict[str, Optional[str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM feed_state WHERE source_id = ?", (source_id,)
+            ).fetchone()
+        return {"etag": row[0], "last_modified": row[1]} if row else {"etag": None, "last_modified": None}
+
+    def set_feed_state(self, source_id: str, etag: Optional[str], last_modified: Optional[str],
+                       not_modified: bool = False):
+        """
+        Stores the feed's validators. After a 304 (`not_modified`) a validator the response
+        did not repeat keeps its stored value; many servers send neither on a 304.
+        """
+        update = ("etag = COALESCE(excluded.etag, etag), last_modified = COALESCE(excluded.last_modified, last_modified)"
+                  if not_modified else "etag = excluded.etag, last_modified = excluded.last_modified")
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO feed_state (source_id, etag, last_modified, checked_at) VALUES (?, ?, ?, ?) "
+                f"ON CONFLICT(source_id) DO UPDATE SET {update}, checked_at = excluded.checked_at",
+                (source_id, etag, last_modified, time.time()),
+            )
+
+    def unseen_guids(self, source_id: str, guids: List[str]) -> Set[str]:
+        if not guids:
+            return set()
+        seen: Set[str] = set()
+        with self._lock:
+            for start in range(0, len(guids), 500):
+                batch = guids[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT guid FROM seen_entries WHERE source_id = ? AND guid IN ({marks})", (source_id, *batch)
+                ).fetchall()
+                seen.update(r[0] for r in rows)
+        return set(guids) - seen
+
+    def mark_seen(self, source_id: str, guids: List[str]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO seen_entries (source_id, guid, seen_at) VALUES (?, ?, ?)",
+                [(source_id, g, now) for g in guids],
+            )
+
+    def prune_seen(self, max_age_seconds: float) -> int:
+        """Forget GUIDs older than max_age_seconds (feeds rarely republish that far back)."""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM seen_entries WHERE seen_at < ?", (time.time() - max_age_seconds,))
+        return cur.rowcount
+
+    # ----- outcome counters (reported into scrape_meta / session doc) -----
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_revalidated(self):
+        with self._lock:
+            self.revalidated += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"cache_hits": self.hits, "cache_revalidated": self.revalidated, "cache_misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,214 @@
+"""
+host_stats.py
+
+Per-host fetch history used by scrape_and_save.py, kept across runs in SQLite.
+
+- Extraction strategy statistics: for every (host, strategy) the attempts, successes
+  and time spent. strategy_order() ranks a host's strategies by expected cost per
+  success (mean ms / success rate) and drops the ones that practically never succeed
+  there, so e.g. a site where trafilatura always comes up short goes straight to
+  readability. Until a strategy has `min_samples` attempts on a host it keeps its
+  default position, and every `explore_every`-th article on a host runs the default
+  order so a site redesign is noticed. The naive fallback always runs last.
+- Circuit breaker: `failure_threshold` consecutive host failures (403 / 429 / 5xx /
+  connection errors) open the host's circuit for `cooldown` seconds; while open,
+  articles are not fetched at all (the caller falls back to the cache or RSS summary).
+  After the cooldown one probe request is let through: success closes the circuit,
+  failure re-opens it with the cooldown doubled (up to `max_cooldown`).
+"""
+
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+# extraction strategies in their default order; scrape_and_save.py maps each to its extractor
+STRATEGIES = ("trafilatura", "readability", "newspaper3k")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS strategy_stats (
+    host TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    successes INTEGER NOT NULL,
+    total_ms REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (host, strategy)
+);
+CREATE TABLE IF NOT EXISTS host_circuits (
+    host TEXT PRIMARY KEY,
+    failures INTEGER NOT NULL,
+    open_until REAL NOT NULL,
+    cooldown REAL NOT NULL,
+    last_error TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def url_host(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def is_host_failure(status: Optional[int]) -> bool:
+    """Whether a failed download says something about the host rather than the one URL (404/410 do not)."""
+    return status is None or status in (403, 429) or status >= 500
+
+
+class HostStats:
+    """Thread-safe; counters live in memory and are written back on flush() / close()."""
+
+    def __init__(self, path: str, min_samples: int = 5, min_success_rate: float = 0.05, explore_every: int = 20,
+                 failure_threshold: int = 5, cooldown: float = 600, max_cooldown: float = 6 * 3600):
+        self.path = path
+        self.min_samples = min_samples
+        self.min_success_rate = min_success_rate
+        self.explore_every = max(1, explore_every)
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self.circuit_skips = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # host -> strategy -> [attempts, successes, total_ms]
+        self._strategies: Dict[str, Dict[str, List[float]]] = {}
+        for host, strategy, attempts, successes, total_ms in self._conn.execute(
+                "SELECT host, strategy, attempts, successes, total_ms FROM strategy_stats"):
+            self._strategies.setdefault(host, {})[strategy] = [attempts, successes, total_ms]
+        # host -> {failures, open_until, cooldown, last_error}; probing hosts are tracked in memory only
+        self._circuits: Dict[str, Dict[str, Any]] = {}
+        for host, failures, open_until, cooldown, last_error in self._conn.execute(
+                "SELECT host, failures, open_until, cooldown, last_error FROM host_circuits"):
+            self._circuits[host] = {"failures": failures, "open_until": open_until, "cooldown": cooldown, "last_error": last_error}
+        self._probing: set = set()
+        self._picks: Dict[str, int] = {}
+        self._dirty_strategies: set = set()
+        self._dirty_circuits: set = set()
+
+    # ----- extraction strategies -----
+    def strategy_order(self, url: str) -> List[str]:
+        """Strategies to try on this URL's host, best first (the naive fallback is implied last)."""
+        host = url_host(url)
+        with self._lock:
+            n = self._picks.get(host, 0) + 1
+            self._picks[host] = n
+            stats = self._strategies.get(host)
+            if not stats or n % self.explore_every == 0:
+                return list(STRATEGIES)
+            ranked: List[Tuple[float, str]] = []
+            unproven: List[Tuple[int, str]] = []
+            for pos, name in enumerate(STRATEGIES):
+                attempts, successes, total_ms = stats.get(name, (0, 0, 0.0))
+                if attempts < self.min_samples:
+                    unproven.append((pos, name))
+                    continue
+                rate = successes / attempts
+                if rate < self.min_success_rate:
+                    continue
+                ranked.append(((total_ms / attempts) / rate, name))
+        order = [name for _, name in sorted(ranked)]
+        for pos, name in unproven:  # not enough evidence yet: keep the default position
+            order.insert(min(pos, len(order)), name)
+        return order
+
+    def record_extraction(self, url: str, timings: Dict[str, float], winner: Optional[str]):
+        """Counts every strategy that ran (timings `<strategy>_ms`) as an attempt, and `winner` as a success."""
+        host = url_host(url)
+        with self._lock:
+            stats = self._strategies.setdefault(host, {})
+            for name in STRATEGIES:
+                ms = timings.get(f"{name}_ms")
+                if ms is None:
+                    continue
+                row = stats.setdefault(name, [0, 0, 0.0])
+                row[0] += 1
+                row[1] += 1 if name == winner else 0
+                row[2] += ms
+                self._dirty_strategies.add((host, name))
+
+    # ----- circuit breaker -----
+    def allow(self, url: str) -> bool:
+        """False while the host's circuit is open; after the cooldown lets one probe through at a time."""
+        host = url_host(url)
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or circuit["failures"] < self.failure_threshold:
+                return True
+            if time.time() >= circuit["open_until"] and host not in self._probing:
+                self._probing.add(host)
+                return True
+            self.circuit_skips += 1
+            return False
+
+    def is_suspect(self, url: str) -> bool:
+        """Host has failed recently; callers skip slow retry loops for it."""
+        with self._lock:
+            circuit = self._circuits.get(url_host(url))
+            return bool(circuit and circuit["failures"])
+
+    def record_success(self, url: str):
+        host = url_host(url)
+        with self._lock:
+            self._probing.discard(host)
+            if host in self._circuits and self._circuits[host]["failures"]:
+                self._circuits[host].update(failures=0, open_until=0.0, cooldown=self.cooldown, last_error=None)
+                self._dirty_circuits.add(host)
+
+    def record_failure(self, url: str, error: Optional[str] = None):
+        host = url_host(url)
+        now = time.time()
+        with self._lock:
+            circuit = self._circuits.setdefault(host, {"failures": 0, "open_until": 0.0, "cooldown": self.cooldown, "last_error": None})
+            circuit["failures"] += 1
+            circuit["last_error"] = (error or "")[:500]
+            if host in self._probing:
+                self._probing.discard(host)
+                circuit["cooldown"] = min(self.max_cooldown, circuit["cooldown"] * 2)
+                circuit["open_until"] = now + circuit["cooldown"]
+            elif circuit["failures"] == self.failure_threshold:
+                circuit["open_until"] = now + circuit["cooldown"]
+            self._dirty_circuits.add(host)
+
+    def open_circuits(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            return [{"host": h, **c, "retry_in_s": round(max(0.0, c["open_until"] - now))}
+                    for h, c in sorted(self._circuits.items()) if c["failures"] >= self.failure_threshold]
+
+    # ----- reporting / persistence -----
+    def host_report(self, hosts: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """host -> strategy -> {attempts, success_rate, mean_ms}"""
+        with self._lock:
+            items = [(h, dict(s)) for h, s in self._strategies.items() if hosts is None or h in hosts]
+        return {
+            host: {name: {"attempts": int(a), "success_rate": round(s / a, 3) if a else 0.0, "mean_ms": round(ms / a, 1) if a else 0.0}
+                   for name, (a, s, ms) in stats.items()}
+            for host, stats in sorted(items)
+        }
+
+    def flush(self):
+        now = time.time()
+        with self._lock:
+            strategy_rows = [(h, n, *self._strategies[h][n], now) for h, n in self._dirty_strategies]
+            circuit_rows = [(h, c["failures"], c["open_until"], c["cooldown"], c["last_error"], now)
+                            for h, c in ((h, self._circuits[h]) for h in self._dirty_circuits)]
+            self._dirty_strategies.clear()
+            self._dirty_circuits.clear()
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO strategy_stats VALUES (?, ?, ?, ?, ?, ?)", strategy_rows)
+            self._conn.executemany("INSERT OR REPLACE INTO host_circuits VALUES (?, ?, ?, ?, ?, ?)", circuit_rows)
+            self._conn.execute("COMMIT")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hosts_tracked": len(self._strategies), "circuit_skips": self.circuit_skips,
+                "open_circuits": len(self.open_circuits())}
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,428 @@
+"""
+job_queue.py
+
+Work-queue mode for scrape_and_save.py: the scrape of a session is split into jobs
+in a MongoDB collection (SCRAPE_JOBS_COLL), so any number of worker processes, on
+any number of machines, can share it.
+
+- The coordinator (`scrape_and_save.py --enqueue`) creates the session and one
+  "feed" job per active source (the sources collection, i.e. SOURCES plus whatever
+  was added in the DB, restricted to --selected and, like main(), at most 5 of them).
+- Workers (`scrape_and_save.py --worker`) claim jobs with a lease: a feed job reads
+  the feed and enqueues one "article" job per entry in the window; article jobs
+  are fetched / extracted / chunked on the worker's thread pool and written with
+  insert_articles_to_db (upsert per (session_id, url), so a job run twice is harmless).
+- A heartbeat thread keeps extending the leases of the jobs a worker holds. A job
+  whose lease ran out (its worker crashed or hung) is claimed again by the next
+  worker; each claim counts as an attempt. A failing job is retried with
+  exponential backoff and marked "failed" after `max_attempts`.
+- Whoever finishes the last job of a session marks the session "completed" with
+  its job and article counts.
+
+Job ids are derived from the session and the feed / entry link and enqueued with
+$setOnInsert, so re-running the coordinator or a feed job never duplicates work.
+Lease times are compared on the workers' clocks; keep them NTP-synced.
+"""
+
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("scraper_full")
+
+SCRAPE_JOBS_COLL = "scrape_jobs"
+JOB_KINDS = ("feed", "article")
+OPEN_STATUSES = ("queued", "leased")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def job_id(session_id: str, kind: str, key: str) -> str:
+    return f"{session_id}:{kind}:{hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()}"
+
+
+class JobQueue:
+    """Leased jobs in one MongoDB collection; every state change is a single atomic update."""
+
+    def __init__(self, db, lease_seconds: float = 120, max_attempts: int = 3, backoff_base: float = 30):
+        self.db = db
+        self.coll = db[SCRAPE_JOBS_COLL]
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+
+    def ensure_indexes(self):
+        from pymongo import ASCENDING
+        self.coll.create_index([("status", ASCENDING), ("priority", ASCENDING), ("not_before", ASCENDING)])
+        self.coll.create_index([("status", ASCENDING), ("lease_expires", ASCENDING)])
+        self.coll.create_index([("session_id", ASCENDING), ("status", ASCENDING)])
+
+    # ----- producer side -----
+    def enqueue(self, jobs: Iterable[Dict[str, Any]]) -> int:
+        """Jobs as {_id, session_id, kind, payload}; existing ids are left alone. Returns how many were new."""
+        from pymongo import UpdateOne
+        now = _utcnow()
+        ops = [UpdateOne({"_id": j["_id"]}, {"$setOnInsert": {
+            "session_id": j["session_id"],
+            "kind": j["kind"],
+            "payload": j["payload"],
+            "priority": 0 if j["kind"] == "article" else 1,  # drain articles before opening more feeds
+            "status": "queued",
+            "attempts": 0,
+            "not_before": now,
+            "lease_owner": None,
+            "lease_expires": None,
+            "last_error": None,
+            "created_at": now,
+            "updated_at": now,
+        }}, upsert=True) for j in jobs]
+        if not ops:
+            return 0
+        return self.coll.bulk_write(ops, ordered=False).upserted_count
+
+    # ----- worker side -----
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """The next runnable job (queued and due, or leased with an expired lease), now leased to `worker_id`."""
+        from pymongo import ReturnDocument
+        now = _utcnow()
+        return self.coll.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "not_before": {"$lte": now}},
+                {"status": "leased", "lease_expires": {"$lt": now}, "attempts": {"$lt": self.max_attempts}},
+            ]},
+            {"$set": {"status": "leased", "lease_owner": worker_id, "updated_at": now,
+                      "lease_expires": now + timedelta(seconds=self.lease_seconds)},
+             "$inc": {"attempts": 1}},
+            sort=[("priority", 1), ("not_before", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def claim_batch(self, worker_id: str, n: int) -> List[Dict[str, Any]]:
+        jobs = []
+        while len(jobs) < n:
+            job = self.claim(worker_id)
+            if job is None:
+                break
+            jobs.append(job)
+        return jobs
+
+    def heartbeat(self, worker_id: str, job_ids: List[str]) -> int:
+        """Extends the leases still held by `worker_id`; returns how many were extended."""
+        if not job_ids:
+            return 0
+        now = _utcnow()
+        res = self.coll.update_many(
+            {"_id": {"$in": job_ids}, "status": "leased", "lease_owner": worker_id},
+            {"$set": {"lease_expires": now + timedelta(seconds=self.lease_seconds), "updated_at": now}})
+        return res.modified_count
+
+    def complete(self, job: Dict[str, Any], worker_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        """False if the lease was lost meanwhile (another worker owns the job now)."""
+        res = self.coll.update_one({"_id": job["_id"], "status": "leased", "lease_owner": worker_id}, {"$set": {
+            "status": "done", "lease_owner": None, "lease_expires": None, "result": result or {}, "updated_at": _utcnow()}})
+        return res.modified_count == 1
+
+    def fail(self, job: Dict[str, Any], worker_id: str, error: str) -> str:
+        """Back to "queued" with exponential backoff, or "failed" once attempts are used up; returns the new status."""
+        now = _utcnow()
+        attempts = job.get("attempts", 1)
+        if attempts >= self.max_attempts:
+            update = {"status": "failed"}
+        else:
+            update = {"status": "queued", "not_before": now + timedelta(seconds=self.backoff_base * 2 ** (attempts - 1))}
+        update.update(lease_owner=None, lease_expires=None, last_error=error[:500], updated_at=now)
+        self.coll.update_one({"_id": job["_id"], "status": "leased", "lease_owner": worker_id}, {"$set": update})
+        return update["status"]
+
+    def reap(self) -> List[str]:
+        """Marks jobs whose lease expired on their last attempt as failed (nobody may claim them again); returns their sessions."""
+        now = _utcnow()
+        query = {"status": "leased", "lease_expires": {"$lt": now}, "attempts": {"$gte": self.max_attempts}}
+        sessions = self.coll.distinct("session_id", query)
+        if sessions:
+            self.coll.update_many(query, {"$set": {"status": "failed", "lease_owner": None, "lease_expires": None,
+                                                   "last_error": "lease expired on the last attempt", "updated_at": now}})
+        return sessions
+
+    # ----- sessions -----
+    def session_counts(self, session_id: str) -> Dict[str, int]:
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        for row in self.coll.aggregate([{"$match": {"session_id": session_id}},
+                                        {"$group": {"_id": "$status", "n": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["n"]
+        return counts
+
+    def finish_session_if_drained(self, session_id: str) -> bool:
+        """Marks a running queue session completed once none of its jobs is queued or leased (only one caller wins)."""
+        import scrape_and_save as sas
+        counts = self.session_counts(session_id)
+        if counts["queued"] or counts["leased"]:
+            return False
+        res = self.db[sas.SESSIONS_COLL].update_one({"_id": session_id, "status": "running", "mode": "queue"}, {"$set": {
+            "status": "completed",
+            "job_stats": counts,
+            "inserted_count": self.db[sas.ARTICLES_COLL].count_documents({"session_id": session_id}),
+            "scrape_completed_at": sas.iso_now(),
+        }})
+        if res.modified_count:
+            logger.info("Session %s drained: %d jobs done, %d failed", session_id, counts["done"], counts["failed"])
+        return bool(res.modified_count)
+
+    def idle(self) -> bool:
+        """True when no job of any session is queued (including in backoff) or leased."""
+        return self.coll.count_documents({"status": {"$in": list(OPEN_STATUSES)}}, limit=1) == 0
+
+
+class LeaseKeeper(threading.Thread):
+    """Heartbeats the leases of the jobs a worker currently holds, every lease_seconds / 3."""
+
+    def __init__(self, queue: JobQueue, worker_id: str):
+        super().__init__(name="lease-keeper", daemon=True)
+        self.queue = queue
+        self.worker_id = worker_id
+        self.held: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def hold(self, job_ids: Iterable[str]):
+        with self._lock:
+            self.held.update(job_ids)
+
+    def release(self, job_id: str):
+        with self._lock:
+            self.held.discard(job_id)
+
+    def run(self):
+        while not self._stop.wait(max(1.0, self.queue.lease_seconds / 3)):
+            with self._lock:
+                ids = list(self.held)
+            try:
+                extended = self.queue.heartbeat(self.worker_id, ids)
+                if extended < len(ids):
+                    logger.warning("%d of %d leases were lost (reclaimed by another worker)", len(ids) - extended, len(ids))
+            except Exception as e:
+                logger.warning("Lease heartbeat failed: %s", e)
+
+    def stop(self):
+        self._stop.set()
+
+
+def make_queue(args):
+    """(db, JobQueue) for the queue modes, or (None, None) when MongoDB is not configured."""
+    import scrape_and_save as sas
+    if not os.environ.get("MONGODB_URI", "").strip() or not sas.PYMONGO_AVAILABLE or args.no_db:
+        logger.error("The job queue lives in MongoDB: set MONGODB_URI, install pymongo and drop --no-db.")
+        return None, None
+    _, db = sas.get_mongo_db()
+    queue = JobQueue(db, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    sas.ensure_indexes(db)
+    queue.ensure_indexes()
+    return db, queue
+
+
+def run_coordinator(args) -> int:
+    """Creates the session and enqueues one feed job per selected source."""
+    import scrape_and_save as sas
+    db, queue = make_queue(args)
+    if queue is None:
+        return 1
+    session_id = args.session_id or f"sess_{uuid.uuid4().hex[:8]}"
+    sas.seed_sources_to_db(db, sas.SOURCES)
+    query: Dict[str, Any] = {"active": True}
+    selected = sas.selected_source_ids(args.selected)
+    if selected:
+        query["_id"] = {"$in": selected}
+    sources = list(db[sas.SOURCES_COLL].find(query))
+    if not sources:
+        logger.error("No active sources selected.")
+        return 1
+    sas.create_or_update_session(db, session_id, args.user_id, args.topic, [s["_id"] for s in sources])
+    db[sas.SESSIONS_COLL].update_one({"_id": session_id}, {"$set": {"status": "running", "mode": "queue"}})
+    cutoff = (_utcnow() - timedelta(hours=args.window_hours)).isoformat()
+    n = queue.enqueue({"_id": job_id(session_id, "feed", src["_id"]), "session_id": session_id, "kind": "feed",
+                       "payload": {"source": src, "cutoff": cutoff, "incremental": args.incremental}} for src in sources)
+    logger.info("Session %s: enqueued %d feed jobs (%d sources); start workers with --worker", session_id, n, len(sources))
+    print("Session:", session_id)
+    return 0
+
+
+class QueueWorker:
+    """One worker process: claims jobs in batches of 2 * --workers and runs them on its thread pool."""
+
+    def __init__(self, args, queue: JobQueue):
+        import scrape_and_save as sas
+        from fetch_cache import FetchCache
+        from language import SourceLanguageCache
+        from metrics import RunMetrics
+        self.sas = sas
+        self.args = args
+        self.queue = queue
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:4]}"
+        self.limiter = sas.DomainRateLimiter(min_interval=args.domain_delay, max_per_host=args.per_host)
+        self.cache = None if args.no_cache else FetchCache(args.cache_path, ttl_seconds=args.cache_ttl_hours * 3600,
+                                                           max_bytes=args.cache_max_mb * 1024 * 1024)
+        self.host_stats = sas.make_host_stats(args)
+        self.languages = SourceLanguageCache()
+        self.cpu_pool = sas.make_cpu_pool(args.cpu_workers)
+        self.metrics = RunMetrics(self.worker_id)
+        self.counts = {"feed": 0, "article": 0, "failed": 0, "lost": 0}
+
+    def run_feed(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Reads the feed and enqueues an article job per entry in the window."""
+        sas = self.sas
+        src = job["payload"]["source"]
+        incremental = job["payload"].get("incremental") and self.cache is not None
+        feed = sas._fetch_source_feed(src, self.limiter, self.cache, incremental)
+        self.metrics.record_feed(src["_id"], feed)
+        if feed.get("error"):
+            raise RuntimeError(feed["error"])
+        if feed["not_modified"]:
+            if self.cache is not None:  # a 304 usually repeats no validators; keep the stored ones
+                self.cache.set_feed_state(src["_id"], feed.get("etag"), feed.get("last_modified"), not_modified=True)
+            return {"entries": 0, "enqueued": 0, "not_modified": True}
+        entries = [e for e in feed["entries"] if sas._entry_has_title_and_link(e)]
+        if incremental:
+            unseen = self.cache.unseen_guids(src["_id"], [sas.entry_guid(e) for e in entries])
+            entries = [e for e in entries if sas.entry_guid(e) in unseen]
+        cutoff = datetime.fromisoformat(job["payload"]["cutoff"])
+        jobs = []
+        for e in entries:
+            published = sas.entry_published_at(e)
+            if not sas.is_within_window(published, cutoff):
+                continue
+            entry = {"title": e.get("title"), "link": e.get("link"), "summary": e.get("summary") or e.get("description"),
+                     "id": e.get("id")}
+            jobs.append({"_id": job_id(job["session_id"], "article", entry["link"]), "session_id": job["session_id"],
+                         "kind": "article", "payload": {"source": {k: src.get(k) for k in ("_id", "name", "category")},
+                                                        "entry": entry, "published": published,
+                                                        "feed_language": feed.get("language")}})
+        enqueued = self.queue.enqueue(jobs)
+        # article jobs are durable now, so the entries count as seen even if this worker dies
+        if self.cache is not None:
+            self.cache.mark_seen(src["_id"], [sas.entry_guid(e) for e in feed["entries"] if sas.entry_guid(e)])
+            self.cache.set_feed_state(src["_id"], feed.get("etag"), feed.get("last_modified"))
+        return {"entries": len(feed["entries"]), "enqueued": enqueued}
+
+    def run_article(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        p = job["payload"]
+        src = p["source"]
+        art = self.sas.normalize_entry_with_full(SimpleNamespace(**p["entry"]), src["_id"], job["session_id"],
+                                                 self.limiter, p.get("published"), self.cache, self.cpu_pool,
+                                                 self.host_stats, p.get("feed_language"), self.languages)
+        art["source_name"] = src.get("name")
+        art["category"] = src.get("category")
+        self.metrics.record_article(art)
+        return art
+
+    def run_batch(self, pool: ThreadPoolExecutor, keeper: LeaseKeeper, jobs: List[Dict[str, Any]]):
+        """Runs a claimed batch; articles are written before their jobs are acknowledged."""
+        futures = [(job, pool.submit(self.run_feed if job["kind"] == "feed" else self.run_article, job)) for job in jobs]
+        finished, articles = [], {}
+        for job, fut in futures:
+            try:
+                result = fut.result()
+            except Exception as e:
+                status = self.queue.fail(job, self.worker_id, f"{type(e).__name__}: {e}")
+                logger.warning("Job %s failed (attempt %d, now %s): %s", job["_id"], job["attempts"], status, e)
+                self.counts["failed"] += 1
+                keeper.release(job["_id"])
+                continue
+            if job["kind"] == "article":
+                articles.setdefault(job["session_id"], []).append(result)
+                result = {"url": result["url"], "success": result["scrape_meta"].get("success")}
+            finished.append((job, result))
+        for session_id, arts in articles.items():
+            try:
+                with self.metrics.timer("mongo_write"):
+                    self.sas.insert_articles_to_db(self.queue.db, arts, batch_size=self.args.db_batch_size)
+            except Exception as e:
+                logger.exception("MongoDB write failed: %s", e)
+                for job, _ in [f for f in finished if f[0]["session_id"] == session_id and f[0]["kind"] == "article"]:
+                    self.queue.fail(job, self.worker_id, f"article write failed: {e}")
+                    self.counts["failed"] += 1
+                    keeper.release(job["_id"])
+                finished = [f for f in finished if f[0]["session_id"] != session_id or f[0]["kind"] != "article"]
+        for job, result in finished:
+            if self.queue.complete(job, self.worker_id, result):
+                self.counts[job["kind"]] += 1
+            else:
+                self.counts["lost"] += 1
+            keeper.release(job["_id"])
+        for session_id in {job["session_id"] for job in jobs}:
+            self.queue.finish_session_if_drained(session_id)
+
+    def run(self, stop: threading.Event) -> int:
+        args = self.args
+        keeper = LeaseKeeper(self.queue, self.worker_id)
+        keeper.start()
+        idle_since = time.monotonic()
+        logger.info("Worker %s polling %s (lease %ss, max attempts %d)", self.worker_id, SCRAPE_JOBS_COLL,
+                    self.queue.lease_seconds, self.queue.max_attempts)
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="job") as pool:
+                while not stop.is_set():
+                    for session_id in self.queue.reap():
+                        self.queue.finish_session_if_drained(session_id)
+                    jobs = self.queue.claim_batch(self.worker_id, 2 * max(1, args.workers))
+                    if not jobs:
+                        # jobs in backoff or leased elsewhere may still need this worker (a lease can expire)
+                        if args.idle_exit and time.monotonic() - idle_since >= args.idle_exit and self.queue.idle():
+                            logger.info("No jobs for %ss and none queued or leased; exiting.", args.idle_exit)
+                            break
+                        stop.wait(args.poll_interval)
+                        continue
+                    keeper.hold(job["_id"] for job in jobs)
+                    self.run_batch(pool, keeper, jobs)
+                    idle_since = time.monotonic()
+        finally:
+            keeper.stop()
+            self.close()
+        logger.info("Worker %s done: %d feed jobs, %d article jobs, %d failures, %d leases lost", self.worker_id,
+                    self.counts["feed"], self.counts["article"], self.counts["failed"], self.counts["lost"])
+        return 0
+
+    def close(self):
+        if self.cpu_pool is not None:
+            self.cpu_pool.shutdown()
+        if self.host_stats is not None:
+            self.host_stats.close()
+        if self.cache is not None:
+            self.cache.close()
+        if not self.args.no_metrics:
+            metrics_dir = self.args.metrics_dir or self.args.output_dir
+            try:
+                self.metrics.write_json(os.path.join(metrics_dir, f"metrics_worker_{os.getpid()}.json"),
+                                        extra={"jobs": self.counts})
+            except OSError as e:
+                logger.warning("Could not write run metrics: %s", e)
+
+
+def run_worker(args) -> int:
+    _, queue = make_queue(args)
+    if queue is None:
+        return 1
+    stop = threading.Event()
+
+    def _stop(signum, frame):
+        logger.info("Signal %s received; finishing the claimed jobs.", signum)
+        stop.set()
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        return QueueWorker(args, queue).run(stop)
+    finally:
+        import scrape_and_save as sas
+        sas.close_mongo_clients()
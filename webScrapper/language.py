@@ -0,0 +1,128 @@
+"""
+language.py
+
+Article language resolution for scrape_and_save.py, cheapest signal first:
+
+1. `<html lang>` (or xml:lang / Content-Language meta) of the page already downloaded
+2. `og:locale` of the same page
+3. a local document's declared language (PDF catalog /Lang)
+4. the feed's `<language>` element
+5. the source's learned language (SourceLanguageCache)
+6. langdetect on a short sample, with a fixed seed so runs are reproducible
+
+resolve_language() returns the language and the signal it came from; the scraper
+records that as scrape_meta.language_method so accuracy can be audited against speed.
+Tags are normalized to langdetect's codes ("en-US" / "en_US" -> "en", "zh-Hant" -> "zh-tw").
+"""
+
+from __future__ import annotations
+import re
+import threading
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+LANGUAGE_SIGNALS = ("html_lang", "og_locale", "doc_lang", "feed", "source")
+DETECT_SAMPLE_CHARS = 1000
+DETECT_SEED = 0
+
+_TAG_RE = re.compile(r"^([a-z]{2,3})(?:[-_]([a-z0-9]{2,8}))?", re.IGNORECASE)
+_NOT_A_LANGUAGE = {"und", "mul", "zxx", "xx"}
+_ZH_TRADITIONAL = {"tw", "hk", "mo", "hant"}
+_XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+
+def normalize_language(tag: Optional[str]) -> Optional[str]:
+    """Primary subtag in lower case (zh keeps langdetect's zh-cn / zh-tw split); None if not a language tag."""
+    if not tag:
+        return None
+    m = _TAG_RE.match(tag.strip())
+    if not m:
+        return None
+    primary = m.group(1).lower()
+    if primary in _NOT_A_LANGUAGE:
+        return None
+    if primary == "zh":
+        return "zh-tw" if (m.group(2) or "").lower() in _ZH_TRADITIONAL else "zh-cn"
+    return primary
+
+
+def page_language_hints(tree) -> Dict[str, Optional[str]]:
+    """Declared languages of a parsed page (lxml tree): { html_lang, og_locale }."""
+    hints: Dict[str, Optional[str]] = {"html_lang": None, "og_locale": None}
+    try:
+        root = tree.getroottree().getroot()
+        hints["html_lang"] = root.get("lang") or root.get(_XML_LANG)
+        if not hints["html_lang"]:
+            for content in tree.xpath('//meta[translate(@http-equiv, "CONTENT-LANGUAGE", "content-language")'
+                                      '="content-language"]/@content'):
+                hints["html_lang"] = content.split(",")[0]
+                break
+        for content in tree.xpath('//meta[@property="og:locale"]/@content'):
+            hints["og_locale"] = content
+            break
+    except Exception:
+        pass
+    return hints
+
+
+def _sample(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > max_chars // 2 else max_chars]
+
+
+def detect_language(text: str, sample_chars: int = DETECT_SAMPLE_CHARS) -> Optional[str]:
+    """langdetect on the first `sample_chars` characters, seeded (same text -> same answer every run)."""
+    if not text or len(text) <= 50:
+        return None
+    from langdetect import DetectorFactory, LangDetectException, detect
+    DetectorFactory.seed = DETECT_SEED
+    try:
+        return detect(_sample(text, sample_chars))
+    except LangDetectException:
+        return None
+
+
+def resolve_language(text: Optional[str], hints: Optional[Mapping[str, Optional[str]]] = None,
+                     sample_chars: int = DETECT_SAMPLE_CHARS) -> Tuple[Optional[str], Optional[str]]:
+    """(language, method): the first usable LANGUAGE_SIGNALS entry in `hints`, else "langdetect"."""
+    hints = hints or {}
+    for signal in LANGUAGE_SIGNALS:
+        lang = normalize_language(hints.get(signal))
+        if lang:
+            return lang, signal
+    lang = detect_language(text or "", sample_chars)
+    return (lang, "langdetect") if lang else (None, None)
+
+
+class SourceLanguageCache:
+    """
+    Per-source language learned during the process: once `min_agree` consecutive articles
+    of a source resolved (from their page or langdetect) to the same language, later
+    articles of that source without page metadata use it instead of running langdetect.
+    A disagreeing article resets the source.
+    """
+
+    def __init__(self, min_agree: int = 3):
+        self.min_agree = max(1, min_agree)
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Any]] = {}
+
+    def learned(self, source_id: str) -> Optional[str]:
+        with self._lock:
+            st = self._state.get(source_id)
+            return st["language"] if st and st["agree"] >= self.min_agree else None
+
+    def observe(self, source_id: str, language: Optional[str], method: Optional[str]):
+        if not language or method not in ("html_lang", "og_locale", "langdetect"):
+            return
+        with self._lock:
+            st = self._state.get(source_id)
+            if st and st["language"] == language:
+                st["agree"] += 1
+            else:
+                self._state[source_id] = {"language": language, "agree": 1}
+
+    def snapshot(self) -> Dict[str, Optional[str]]:
+        with self._lock:
+            return {sid: st["language"] for sid, st in self._state.items() if st["agree"] >= self.min_agree}
@@ -0,0 +1,189 @@
+"""
+local_docs.py
+
+Text extraction for local documents attached to a session (PROJECT_FILES and
+--uploads-dir), used by scrape_and_save.project_file_articles().
+
+- PDFs are parsed once with pypdf from an open file handle, page by page, so the
+  raw PDF bytes are never loaded into memory at once. The extracted text is not
+  streamed: it is joined into one full_text string, and .txt / .md files are
+  read whole.
+- Results are cached in SQLite by the file's content hash (blake2b, read in
+  1 MB blocks): an unchanged file is never parsed again, whatever its path or
+  mtime. The caller chunks / resolves the language once and stores that too.
+  A PDF with no extractable text (e.g. scanned pages) is stored with a NULL
+  full_text, so it is not parsed again on every run either.
+- pypdf is optional; without it PDFs are attached without text, as before.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from importlib.util import find_spec
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("scraper_full")
+
+PYPDF_AVAILABLE = find_spec("pypdf") is not None
+PDF_EXTENSIONS = (".pdf",)
+TEXT_EXTENSIONS = (".txt", ".md")
+DOC_EXTENSIONS = PDF_EXTENSIONS + TEXT_EXTENSIONS
+HASH_BLOCK = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    content_hash TEXT PRIMARY KEY,
+    path TEXT,
+    size INTEGER NOT NULL,
+    extractor TEXT,
+    pages TEXT,
+    full_text TEXT,
+    language TEXT,
+    language_method TEXT,
+    text_chunks TEXT,
+    extracted_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+"""
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def list_documents(paths: List[str], uploads_dir: Optional[str] = None) -> List[str]:
+    """Existing files from `paths`, then every supported file under `uploads_dir` (sorted, recursive)."""
+    found = []
+    for p in paths:
+        if os.path.isfile(p):
+            found.append(p)
+        else:
+            logger.debug("Local project file not found (skipping): %s", p)
+    if uploads_dir:
+        if not os.path.isdir(uploads_dir):
+            logger.warning("Uploads directory %s does not exist", uploads_dir)
+        else:
+            for root, dirs, files in os.walk(uploads_dir):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(DOC_EXTENSIONS) and not name.startswith("."):
+                        found.append(os.path.join(root, name))
+    unique, seen = [], set()
+    for p in found:
+        key = os.path.abspath(p)
+        if key not in seen:
+            seen.add(key)
+            unique.append(p)
+    return unique
+
+
+def iter_pdf_pages(reader, path: str) -> Iterator[Tuple[int, str]]:
+    """(page number from 1, text) per page of an open PdfReader; pypdf reads objects from the file as pages are visited."""
+    for n, page in enumerate(reader.pages, start=1):
+        try:
+            text = page.extract_text() or ""
+        except Exception as e:  # one bad page should not lose the document
+            logger.warning("PDF %s page %d: text extraction failed (%s)", path, n, e)
+            text = ""
+        yield n, text
+
+
+def pdf_language(reader) -> Optional[str]:
+    """The document catalog's /Lang entry of an open PdfReader, if any."""
+    try:
+        lang = reader.trailer["/Root"].get("/Lang")
+        return str(lang) if lang else None
+    except Exception:
+        return None
+
+
+def extract_document(path: str) -> Dict[str, Any]:
+    """
+    { full_text, pages: [{page, start, end}], extractor, doc_lang, timings } for a PDF or text file.
+    full_text is None when the file type is unsupported or pypdf is missing.
+    """
+    t0 = time.perf_counter()
+    lower = path.lower()
+    if lower.endswith(TEXT_EXTENSIONS):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        return {"full_text": text, "pages": [], "extractor": "text", "doc_lang": None,
+                "timings": {"doc_extract_ms": round((time.perf_counter() - t0) * 1000, 1)}}
+    if not lower.endswith(PDF_EXTENSIONS):
+        return {"full_text": None, "pages": [], "extractor": None, "doc_lang": None, "error": "unsupported file type"}
+    if not PYPDF_AVAILABLE:
+        return {"full_text": None, "pages": [], "extractor": None, "doc_lang": None, "error": "pypdf not installed"}
+    from pypdf import PdfReader
+    parts: List[str] = []
+    pages = []
+    offset = 0
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        doc_lang = pdf_language(reader)
+        for n, text in iter_pdf_pages(reader, path):
+            text = text.strip()
+            if not text:
+                continue
+            if parts:
+                parts.append("\n\n")
+                offset += 2
+            pages.append({"page": n, "start": offset, "end": offset + len(text)})
+            parts.append(text)
+            offset += len(text)
+    return {"full_text": "".join(parts), "pages": pages, "extractor": "pypdf", "doc_lang": doc_lang,
+            "timings": {"doc_extract_ms": round((time.perf_counter() - t0) * 1000, 1)}}
+
+
+class DocumentCache:
+    """Extracted documents keyed by content hash; thread-safe, one connection guarded by a lock."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, extractor, pages, full_text, language, language_method, text_chunks "
+                "FROM documents WHERE content_hash = ?", (content_hash,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE documents SET accessed_at = ? WHERE content_hash = ?", (time.time(), content_hash))
+        return {"path": row[0], "extractor": row[1], "pages": json.loads(row[2] or "[]"), "full_text": row[3],
+                "language": row[4], "language_method": row[5], "text_chunks": json.loads(row[6] or "[]")}
+
+    def put(self, content_hash: str, path: str, size: int, doc: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, path, size, doc.get("extractor"), json.dumps(doc.get("pages") or []), doc.get("full_text"),
+                 doc.get("language"), doc.get("language_method"), json.dumps(doc.get("text_chunks") or []), now, now))
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Drops documents not attached to any session for `max_age_seconds`."""
+        with self._lock:
+            return self._conn.execute("DELETE FROM documents WHERE accessed_at < ?", (time.time() - max_age_seconds,)).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        return {"doc_cache_hits": self.hits, "doc_cache_misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,246 @@
+"""
+metrics.py
+
+Run instrumentation for scrape_and_save.py.
+
+- RunMetrics collects per-stage latencies (feed download/parse, download, parse,
+  trafilatura, readability, newspaper3k, naive, language / langdetect, chunking, Mongo writes,
+  dedup, ranking, indexing, output) overall, per source and per fetch_method,
+  plus labelled counters (articles, bytes, HTTP retries, errors, cache outcomes,
+  circuit-breaker skips, language resolution methods).
+- summary() gives count / total / mean / p50 / p95 / max per stage; write_json()
+  and write_prometheus() export it at the end of a run (the Prometheus file is in
+  the node_exporter textfile-collector format and is replaced atomically).
+- profile_run() optionally wraps a run in cProfile or tracemalloc.
+"""
+
+from __future__ import annotations
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("scraper_full")
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+
+def _percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile of already-sorted values (q in [0, 1])."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def _stage_stats(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "total_ms": round(total, 1),
+        "mean_ms": round(total / len(ordered), 1) if ordered else 0.0,
+        "p50_ms": round(_percentile(ordered, 0.5), 1),
+        "p95_ms": round(_percentile(ordered, 0.95), 1),
+        "max_ms": round(ordered[-1], 1) if ordered else 0.0,
+    }
+
+
+def _prom_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    def esc(v: Any) -> str:
+        return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels.items()) + "}"
+
+
+class RunMetrics:
+    """Thread-safe collector; fetch threads, the main loop and DB writers all report into one instance."""
+
+    def __init__(self, session_id: Optional[str] = None):
+        self.session_id = session_id
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        # (stage, dimension, value) -> samples in ms; dimension is "all", "source" or "fetch_method"
+        self._samples: Dict[Tuple[str, str, str], List[float]] = defaultdict(list)
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+
+    # ----- recording -----
+    def observe(self, stage: str, ms: float, source: Optional[str] = None, method: Optional[str] = None):
+        with self._lock:
+            self._samples[(stage, "all", "")].append(ms)
+            if source:
+                self._samples[(stage, "source", source)].append(ms)
+            if method:
+                self._samples[(stage, "fetch_method", method)].append(ms)
+
+    def incr(self, name: str, n: float = 1, **labels: Any):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None)))
+        with self._lock:
+            self._counters[key] += n
+
+    @contextmanager
+    def timer(self, stage: str, source: Optional[str] = None, method: Optional[str] = None) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, (time.perf_counter() - t0) * 1000, source=source, method=method)
+
+    def record_feed(self, source_id: str, feed: Dict[str, Any]):
+        """Feed poll result from fetch_feed / _fetch_source_feed."""
+        for key, ms in (feed.get("timings") or {}).items():
+            self.observe(key[:-3] if key.endswith("_ms") else key, ms, source=source_id)
+        self.incr("feeds", source=source_id, outcome="error" if feed.get("error") else
+                  "not_modified" if feed.get("not_modified") else "ok")
+        if feed.get("bytes"):
+            self.incr("bytes_downloaded", feed["bytes"], source=source_id, kind="feed")
+        if feed.get("retries"):
+            self.incr("http_retries", feed["retries"], source=source_id, kind="feed")
+
+    def record_article(self, article: Dict[str, Any]):
+        """Per-article timings / sizes from scrape_meta (also filled when the CPU stage ran in a worker process)."""
+        meta = article.get("scrape_meta") or {}
+        source = article.get("source_id")
+        method = meta.get("fetch_method") or "none"
+        timings = meta.get("timings") or {}
+        for key, ms in timings.items():
+            self.observe(key[:-3] if key.endswith("_ms") else key, ms, source=source, method=method)
+        if timings:
+            self.observe("article_total", sum(timings.values()), source=source, method=method)
+        self.incr("articles", source=source, fetch_method=method)
+        if meta.get("cache"):
+            self.incr("cache_lookups", outcome=meta["cache"])
+        if meta.get("language_method"):
+            self.incr("language_methods", method=meta["language_method"])
+        if meta.get("bytes"):
+            self.incr("bytes_downloaded", meta["bytes"], source=source, kind="article")
+        if meta.get("retries"):
+            self.incr("http_retries", meta["retries"], source=source, kind="article")
+        if meta.get("success") is False:
+            self.incr("fetch_errors", source=source)
+        if meta.get("note") == "fallback_to_rss":
+            self.incr("rss_fallbacks", source=source)
+        if meta.get("circuit") == "open" or meta.get("note") == "circuit_open":
+            self.incr("circuit_skips", source=source)
+
+    # ----- export -----
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = {k: list(v) for k, v in self._samples.items()}
+            counters = dict(self._counters)
+        out: Dict[str, Any] = {
+            "session_id": self.session_id,
+            "started_at": self.started_at,
+            "duration_s": round(time.perf_counter() - self._t0, 3),
+            "stages": {},
+            "by_source": {},
+            "by_fetch_method": {},
+            "counters": [],
+        }
+        groups = {"all": out["stages"], "source": out["by_source"], "fetch_method": out["by_fetch_method"]}
+        for (stage, dim, value), values in sorted(samples.items()):
+            target = groups[dim] if dim == "all" else groups[dim].setdefault(value, {})
+            target[stage] = _stage_stats(values)
+        for (name, labels), value in sorted(counters.items()):
+            out["counters"].append({"name": name, "labels": dict(labels), "value": value})
+        return out
+
+    def write_json(self, path: str, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        summary = self.summary()
+        if extra:
+            summary.update(extra)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+        return summary
+
+    def write_prometheus(self, path: str, prefix: str = "scraper") -> None:
+        s = self.summary()
+        lines: List[str] = []
+
+        def summary_family(name: str, help_text: str, rows: List[Tuple[Dict[str, Any], Dict[str, float]]]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for labels, st in rows:
+                for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+                    lines.append(f"{name}{_prom_labels({**labels, 'quantile': q})} {st[key] / 1000:.6f}")
+                lines.append(f"{name}_sum{_prom_labels(labels)} {st['total_ms'] / 1000:.6f}")
+                lines.append(f"{name}_count{_prom_labels(labels)} {st['count']}")
+
+        summary_family(f"{prefix}_stage_duration_seconds", "Per-stage latency over the run.",
+                       [({"stage": stage}, st) for stage, st in s["stages"].items()])
+        summary_family(f"{prefix}_source_stage_duration_seconds", "Per-stage latency by source.",
+                       [({"source": src, "stage": stage}, st)
+                        for src, stages in s["by_source"].items() for stage, st in stages.items()])
+        summary_family(f"{prefix}_fetch_method_stage_duration_seconds", "Per-stage latency by extraction method.",
+                       [({"fetch_method": m, "stage": stage}, st)
+                        for m, stages in s["by_fetch_method"].items() for stage, st in stages.items()])
+
+        by_name: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for c in s["counters"]:
+            by_name[c["name"]].append(c)
+        for name, rows in by_name.items():
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for c in rows:
+                lines.append(f"{metric}{_prom_labels(c['labels'])} {c['value']:g}")
+
+        lines.append(f"# TYPE {prefix}_run_duration_seconds gauge")
+        lines.append(f"{prefix}_run_duration_seconds {s['duration_s']}")
+        lines.append(f"# TYPE {prefix}_last_run_timestamp_seconds gauge")
+        lines.append(f"{prefix}_last_run_timestamp_seconds {time.time():.0f}")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
+
+
+@contextmanager
+def profile_run(mode: Optional[str], out_prefix: str, top: int = 30) -> Iterator[None]:
+    """
+    mode "cprofile": writes <out_prefix>.prof and logs the top functions by cumulative time.
+    cProfile only sees the calling thread, so run with --workers 1 to profile fetch/extract.
+    mode "tracemalloc": writes <out_prefix>.tracemalloc.txt (top allocation sites) and logs the peak.
+    """
+    if not mode:
+        yield
+        return
+    if mode == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            prof.dump_stats(out_prefix + ".prof")
+            buf = io.StringIO()
+            pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(top)
+            logger.info("cProfile written to %s.prof\n%s", out_prefix, buf.getvalue())
+    elif mode == "tracemalloc":
+        tracemalloc.start(25)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(out_prefix + ".tracemalloc.txt", "w", encoding="utf-8") as f:
+                f.write(f"current={current / 1e6:.1f} MB peak={peak / 1e6:.1f} MB\n")
+                for stat in snapshot.statistics("lineno")[:top]:
+                    f.write(f"{stat}\n")
+            logger.info("tracemalloc: peak %.1f MB traced; top allocations in %s.tracemalloc.txt", peak / 1e6, out_prefix)
+    else:
+        raise ValueError(f"unknown profile mode: {mode}")
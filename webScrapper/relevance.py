@@ -0,0 +1,169 @@
+"""
+relevance.py
+
+Topic relevance for scraped articles (the session's --topic).
+
+- Each article's text_chunks are scored against the topic with BM25; the article
+  score is its best chunk's score (plus which chunk that was).
+- Scoring is batched: all chunks of a batch become one scipy.sparse CSR
+  term-frequency matrix and BM25 is computed with NumPy over the query columns.
+- Corpus statistics (chunk count, total length, per-term document frequency) live
+  in SQLite and are updated incrementally, so IDF reflects every session scored so
+  far. An article (by URL) only contributes to the statistics once.
+"""
+
+from __future__ import annotations
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from article_io import article_text, iter_chunk_texts
+
+# numpy / scipy are needed only for scoring
+try:
+    import numpy as np
+    from scipy import sparse
+    RELEVANCE_AVAILABLE = True
+except Exception:
+    RELEVANCE_AVAILABLE = False
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.-]*[a-z0-9+#]|[a-z0-9]", re.UNICODE)
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers
+him his how i if in into is it its itself just me more most my no nor not now of off on once only or other our
+ours out over own same she should so some such than that the their theirs them then there these they this those
+through to too under until up very was we were what when where which while who whom why will with would you your
+""".split())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS docs (doc_key TEXT PRIMARY KEY);
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens without stopwords; keeps terms like c++, c#, gpt-4o, node.js."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def article_passages(article: Dict[str, Any]) -> List[str]:
+    """Chunk texts (classic or compact storage), else the whole text / summary / title as one passage."""
+    chunks = list(iter_chunk_texts(article))
+    if chunks:
+        return chunks
+    return [article_text(article) or article.get("summary") or article.get("title") or ""]
+
+
+class RelevanceModel:
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        if not RELEVANCE_AVAILABLE:
+            raise RuntimeError("numpy/scipy not installed but relevance ranking was requested.")
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        self.n_docs = int(meta.get("n_docs", 0))
+        self.total_len = float(meta.get("total_len", 0.0))
+
+    # ----- corpus statistics -----
+    def update(self, doc_key: Optional[str], passages_tokens: Sequence[Sequence[str]]) -> bool:
+        """Adds one article's passages to the statistics; returns False if doc_key was already counted."""
+        with self._lock:
+            if doc_key:
+                cur = self._conn.execute("INSERT OR IGNORE INTO docs (doc_key) VALUES (?)", (doc_key,))
+                if cur.rowcount == 0:
+                    return False
+            df: Dict[str, int] = {}
+            for tokens in passages_tokens:
+                for term in set(tokens):
+                    df[term] = df.get(term, 0) + 1
+            self._conn.executemany(
+                "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+                df.items(),
+            )
+            self.n_docs += len(passages_tokens)
+            self.total_len += sum(len(t) for t in passages_tokens)
+            self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                   [("n_docs", self.n_docs), ("total_len", self.total_len)])
+            self._conn.commit()
+            return True
+
+    def idf(self, terms: Sequence[str]) -> "np.ndarray":
+        with self._lock:
+            marks = ",".join("?" * len(terms))
+            rows = dict(self._conn.execute(f"SELECT term, df FROM terms WHERE term IN ({marks})", tuple(terms)).fetchall())
+            n = max(1, self.n_docs)
+        df = np.array([rows.get(t, 0) for t in terms], dtype=np.float64)
+        return np.log1p((n - df + 0.5) / (df + 0.5))
+
+    # ----- scoring -----
+    def score_passages(self, query_terms: Sequence[str], passages_tokens: Sequence[Sequence[str]]) -> "np.ndarray":
+        """BM25 of every passage against the query, computed over one sparse tf matrix."""
+        n_rows = len(passages_tokens)
+        if not query_terms or not n_rows:
+            return np.zeros(n_rows)
+        col = {t: i for i, t in enumerate(query_terms)}
+        rows, cols = [], []
+        for r, tokens in enumerate(passages_tokens):
+            for t in tokens:
+                c = col.get(t)
+                if c is not None:
+                    rows.append(r)
+                    cols.append(c)
+        tf = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n_rows, len(query_terms)))
+        tf.sum_duplicates()
+        lengths = np.array([len(t) for t in passages_tokens], dtype=np.float64)
+        avgdl = (self.total_len / self.n_docs) if self.n_docs else max(1.0, lengths.mean())
+        norm = self.k1 * (1.0 - self.b + self.b * lengths / avgdl)
+        # BM25 only over non-zero tf entries: data / (data + norm[row])
+        row_of = np.repeat(np.arange(n_rows), np.diff(tf.indptr))
+        weighted = tf.data * (self.k1 + 1.0) / (tf.data + norm[row_of])
+        scored = sparse.csr_matrix((weighted, tf.indices, tf.indptr), shape=tf.shape)
+        return np.asarray(scored @ self.idf(list(query_terms))).ravel()
+
+    def score_articles(self, topic: str, articles: Iterable[Dict[str, Any]], update_stats: bool = True) -> List[Dict[str, Any]]:
+        """
+        Scores a batch of articles against `topic` and stores article["relevance"] =
+        { topic, score, best_chunk }. Statistics are updated first so IDF includes the batch.
+        """
+        articles = list(articles)
+        query_terms = list(dict.fromkeys(tokenize(topic)))
+        per_article = [[tokenize(p) for p in article_passages(a)] for a in articles]
+        if update_stats:
+            for a, toks in zip(articles, per_article):
+                self.update(a.get("canonical_url") or a.get("url"), toks)
+        flat = [t for toks in per_article for t in toks]
+        scores = self.score_passages(query_terms, flat)
+        offset = 0
+        for a, toks in zip(articles, per_article):
+            part = scores[offset:offset + len(toks)]
+            offset += len(toks)
+            best = int(part.argmax()) if len(part) else 0
+            a["relevance"] = {"topic": topic, "score": round(float(part[best]) if len(part) else 0.0, 4), "best_chunk": best}
+        return articles
+
+    def score_topics(self, topics: Sequence[str], article: Dict[str, Any],
+                     update_stats: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        One article against several topics: { topic: {score, best_chunk} }. The passages are
+        tokenized (and counted in the statistics) once, whatever the number of topics.
+        Unlike score_articles() the article itself is left unchanged.
+        """
+        toks = [tokenize(p) for p in article_passages(article)]
+        if update_stats:
+            self.update(article.get("canonical_url") or article.get("url"), toks)
+        result = {}
+        for topic in dict.fromkeys(topics):
+            scores = self.score_passages(list(dict.fromkeys(tokenize(topic))), toks)
+            best = int(scores.argmax()) if len(scores) else 0
+            result[topic] = {"score": round(float(scores[best]) if len(scores) else 0.0, 4), "best_chunk": best}
+        return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+retention_manager_and_wrapper.py
+
+Retention for the `sessions` / `articles` collections written by scrape_and_save.py
+(with the sessions' article_cards and shared-crawl session_articles references).
+
+- --retain-sessions N : keep only the N newest sessions
+- --retain-days D     : keep only sessions created in the last D days
+  (both given: a session must pass both rules to be kept; a shared crawl's
+  `crawl_<id>` session is not counted and is kept while a kept session references it)
+- --dry-run           : report what would be deleted, delete nothing
+- --archive-dir DIR   : before deleting, write each session's articles to
+                        DIR/<session_id>.ndjson.gz (+ <session_id>.session.json, and
+                        <session_id>.bodies.ndjson.gz for compact articles' content_html)
+- --run-scrape        : wrapper mode; runs scrape_and_save.main with the arguments
+                        after `--`, then applies retention
+
+Deletes are batched delete_many({"session_id": {"$in": [...]}}) calls served by the
+(session_id, url) index, never per-document loops. Out-of-line bodies that older
+--compact runs stored in `article_bodies` are deleted with them once no remaining
+article references them. Prints a JSON report:
+
+{
+  "kept_count": 4,
+  "to_delete_sessions": ["sess_abcd1234", "sess_98de833f"],
+  "deleted_articles": 112
+}
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import scrape_and_save as sas
+from article_io import ArticleWriter, bodies_filename, body_html, json_safe
+
+logger = logging.getLogger("retention")
+
+DELETE_BATCH = 100
+
+
+def plan_retention(db, retain_sessions: Optional[int] = None, retain_days: Optional[float] = None) -> Tuple[List[str], List[str]]:
+    """
+    Returns (kept, to_delete) session ids, newest first, crawl sessions last. Only
+    _id/created_at/mode/crawl_session_id are read. Shared-crawl sessions (mode "crawl")
+    hold the articles their users' sessions reference, so they are not counted against
+    the rules themselves: one is kept exactly as long as a kept session references it.
+    """
+    cutoff = None
+    if retain_days is not None:
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=retain_days)).isoformat()
+    kept: List[str] = []
+    to_delete: List[str] = []
+    crawls: List[str] = []
+    referenced = set()
+    cursor = db[sas.SESSIONS_COLL].find({}, {"_id": 1, "created_at": 1, "mode": 1, "crawl_session_id": 1}).sort("created_at", -1)
+    for sess in cursor:
+        if sess.get("mode") == "crawl":
+            crawls.append(sess["_id"])
+            continue
+        keep = True
+        if retain_sessions is not None and len(kept) >= retain_sessions:
+            keep = False
+        # created_at is an ISO-8601 UTC string, so string comparison is chronological
+        if cutoff is not None and (sess.get("created_at") or "") < cutoff:
+            keep = False
+        (kept if keep else to_delete).append(sess["_id"])
+        if keep and sess.get("crawl_session_id"):
+            referenced.add(sess["crawl_session_id"])
+    for crawl_id in crawls:
+        (kept if crawl_id in referenced else to_delete).append(crawl_id)
+    return kept, to_delete
+
+
+def _batches(items: List[str], size: int = DELETE_BATCH):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def archive_session(db, session_id: str, archive_dir: str, compression: str = "gzip") -> int:
+    """Streams one session's articles to a compressed NDJSON file; returns the article count."""
+    os.makedirs(archive_dir, exist_ok=True)
+    session_doc = db[sas.SESSIONS_COLL].find_one({"_id": session_id}) or {"_id": session_id}
+    with open(os.path.join(archive_dir, f"{session_id}.session.json"), "w", encoding="utf-8") as f:
+        json.dump(session_doc, f, ensure_ascii=False, indent=2, default=str)
+    suffix = ".ndjson.gz" if compression == "gzip" else ".ndjson.zst"
+    path = os.path.join(archive_dir, session_id + suffix)
+    refs = set()
+    with ArticleWriter(path, compression=compression) as writer:
+        for doc in db[sas.ARTICLES_COLL].find({"session_id": session_id}, batch_size=500):
+            doc["_id"] = str(doc["_id"])
+            if doc.get("content_html_ref"):
+                refs.add(doc["content_html_ref"])
+            writer.write(json_safe(doc))
+        count = writer.count
+    if refs:
+        with ArticleWriter(bodies_filename(path), compression=compression) as bodies:
+            for body in db[sas.BODIES_COLL].find({"_id": {"$in": sorted(refs)}}):
+                bodies.write({"_id": body["_id"], "content_html": body_html(body)})
+    return count
+
+
+def delete_orphan_bodies(db, refs: List[str]) -> int:
+    """Deletes the out-of-line bodies among `refs` that no article references any more."""
+    deleted = 0
+    for batch in _batches(refs):
+        still_used = set(db[sas.ARTICLES_COLL].distinct("content_html_ref", {"content_html_ref": {"$in": batch}}))
+        orphans = [r for r in batch if r not in still_used]
+        if orphans:
+            deleted += db[sas.BODIES_COLL].delete_many({"_id": {"$in": orphans}}).deleted_count
+    return deleted
+
+
+def apply_retention(db, retain_sessions: Optional[int] = None, retain_days: Optional[float] = None,
+                    dry_run: bool = False, archive_dir: Optional[str] = None,
+                    archive_compression: str = "gzip") -> Dict[str, Any]:
+    sas.ensure_indexes(db)
+    kept, to_delete = plan_retention(db, retain_sessions, retain_days)
+    deleted_articles = 0
+    deleted_bodies = 0
+    archived: Dict[str, int] = {}
+    for batch in _batches(to_delete):
+        if dry_run:
+            deleted_articles += db[sas.ARTICLES_COLL].count_documents({"session_id": {"$in": batch}})
+            continue
+        if archive_dir:
+            for sid in batch:
+                archived[sid] = archive_session(db, sid, archive_dir, archive_compression)
+        refs = [r for r in db[sas.ARTICLES_COLL].distinct("content_html_ref", {"session_id": {"$in": batch}}) if r]
+        deleted_articles += db[sas.ARTICLES_COLL].delete_many({"session_id": {"$in": batch}}).deleted_count
+        db[sas.ARTICLE_CARDS_COLL].delete_many({"session_id": {"$in": batch}})
+        db[sas.SESSION_ARTICLES_COLL].delete_many({"session_id": {"$in": batch}})
+        db[sas.SESSIONS_COLL].delete_many({"_id": {"$in": batch}})
+        deleted_bodies += delete_orphan_bodies(db, refs)
+    report: Dict[str, Any] = {
+        "kept_count": len(kept),
+        "to_delete_sessions": to_delete,
+        "deleted_articles": deleted_articles,
+    }
+    if deleted_bodies:
+        report["deleted_bodies"] = deleted_bodies
+    if dry_run:
+        report["dry_run"] = True
+    if archive_dir and not dry_run:
+        report["archived"] = archived
+    return report
+
+
+def main(argv):
+    scrape_argv: List[str] = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, scrape_argv = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser(description="Session/article retention for the scraper (optionally wrapping a scrape run).")
+    parser.add_argument("--retain-sessions", type=int, help="Keep only the N newest sessions.")
+    parser.add_argument("--retain-days", type=float, help="Keep only sessions created in the last D days.")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would be deleted without deleting.")
+    parser.add_argument("--archive-dir", type=str, help="Archive each deleted session to compressed NDJSON here first.")
+    parser.add_argument("--archive-compression", choices=("gzip", "zstd"), default="gzip")
+    parser.add_argument("--run-scrape", action="store_true", help="Run scrape_and_save.py first (its arguments go after `--`).")
+    args = parser.parse_args(argv)
+
+    if args.retain_sessions is None and args.retain_days is None:
+        parser.error("give --retain-sessions and/or --retain-days")
+    sas.configure_logging()
+
+    if args.run_scrape:
+        sas.main(scrape_argv)
+
+    conn = sas.get_mongo_db()
+    if conn is None:
+        logger.error("MONGODB_URI not set; nothing to apply retention to.")
+        return 1
+    _, db = conn
+    try:
+        report = apply_retention(db, args.retain_sessions, args.retain_days, dry_run=args.dry_run,
+                                 archive_dir=args.archive_dir, archive_compression=args.archive_compression)
+    finally:
+        sas.close_mongo_clients()
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
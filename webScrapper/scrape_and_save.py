@@ -6,59 +6,89 @@
 scrape_full_and_save.py
 
 - Scrapes full articles (13 RSS sources)
-- Extracts main content (trafilatura / readability / newspaper3k fallbacks)
+- Extracts main content (trafilatura / readability / newspaper3k fallbacks) from one download and one lxml parse
 - Produces full_text, content_html, canonical_url, word_count, language, scrape_meta
 - Chunks text by tokens (uses tiktoken if installed, else word-heuristic)
-- Saves JSON: articles_full_<session_id>.json
+- Attaches PROJECT_FILES and --uploads-dir documents with their PDF text extracted page by page,
+  cached by content hash and chunked like articles (local_docs.py)
+- Takes the language from <html lang> / og:locale / the feed's <language> / the source's learned
+  language, running (seeded) langdetect only when none is declared (language.py)
+- Fetches feeds and articles concurrently (--workers) with per-host concurrency and rate limits
+- Optionally runs extraction / language detection / chunking in a process pool (--cpu-workers)
+- Learns per host which extraction strategy works (tried first, useless ones skipped) and stops
+  fetching from hosts that keep failing until a cooldown passes (host_stats.py, --no-adaptive to disable)
+- Caches extracted articles across sessions (fetch_cache.py) with TTL + ETag/Last-Modified revalidation
+- Optionally clusters near-duplicate stories across sources/sessions (MinHash + LSH, --dedup)
+- Optionally scores articles against --topic with BM25 (--rank) and keeps only the --top-k best
+- Optionally adds the session's chunks to a local keyword search index (--index; see search_index.py)
+- Polls feeds through the shared HTTP session; --incremental sends conditional GETs and only passes unseen GUIDs on
+- Streams articles to articles_full_<session_id>.ndjson as each one finishes (optionally .gz/.zst);
+  --output-format json keeps the original single JSON array
+- --compact stores chunks as offsets into full_text, zstd-compresses large bodies and moves
+  content_html out of line (.bodies.ndjson sidecar; see article_io.py). Those savings are in the
+  output file only: MongoDB documents keep full_text / content_html inline for the dashboard and
+  only lose the chunk text duplicated from full_text.
 - Optionally seeds sources, creates a session and inserts articles into MongoDB (if MONGODB_URI env var set)
+- Writes per-stage run metrics (p50/p95, bytes, retries; metrics.py) as JSON and a Prometheus textfile;
+  --profile wraps the run in cProfile or tracemalloc
 
-This version uses a lenient 24-hour filter:
+This version uses a lenient 24-hour filter (window configurable via --window-hours):
 - Keep article if published_at is within last 24 hours OR
 - If published_at is missing, keep if created_at (scrape time) is within last 24 hours.
+The filter runs on the RSS entry dates *before* any article is downloaded, so
+out-of-window entries never cost an HTTP request or an extraction pass.
 """
 
 from __future__ import annotations
 import os
 import sys
 import argparse
-import json
+import hashlib
 import uuid
 import logging
 import re
+import bisect
+import heapq
 import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Any, Optional
-
-import feedparser
-import requests
-from bs4 import BeautifulSoup
-from dateutil import parser as dateparser
-import trafilatura
-from readability import Document
-from newspaper import Article as NewsArticle
-from langdetect import detect, LangDetectException
-
-# optional precise chunker
-try:
-    import tiktoken
-    TIKTOKEN_AVAILABLE = True
-except Exception:
-    TIKTOKEN_AVAILABLE = False
-
-# optional pymongo
-try:
-    from pymongo import MongoClient, ReplaceOne, ASCENDING, errors
-except Exception:
-    MongoClient = None
-
-# requests retry helpers
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
-# logging
-logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+from collections import deque
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Iterator, Deque
+from urllib.parse import urlparse
+
+# Heavy dependencies (feedparser, requests, dateutil, lxml, trafilatura, readability,
+# newspaper3k, langdetect, tiktoken, pymongo, numpy/scipy via dedup/relevance/search_index)
+# are imported inside the functions that use them, so importing this module, --help
+# and the retention wrapper stay fast. Python caches modules, so only the first call pays.
+
+# optional precise chunker / optional pymongo (checked without importing them)
+TIKTOKEN_AVAILABLE = find_spec("tiktoken") is not None
+PYMONGO_AVAILABLE = find_spec("pymongo") is not None
+
+from article_io import (ArticleWriter, FORMATS, COMPRESSIONS, output_filename, bodies_filename, compact_article,
+                        body_html, json_safe)
+from fetch_cache import FetchCache
+from host_stats import STRATEGIES, HostStats, is_host_failure
+from language import SourceLanguageCache, detect_language, page_language_hints, resolve_language
+from local_docs import DocumentCache, extract_document, file_hash, list_documents
+from metrics import RunMetrics, PROFILE_MODES, profile_run
+
+if TYPE_CHECKING:
+    from dedup import DedupIndex
+    from relevance import RelevanceModel
+    from search_index import SearchIndex
+
 logger = logging.getLogger("scraper_full")
 
+def configure_logging(level: int = logging.INFO):
+    """Console logging for the command-line entry points (importing the module configures nothing)."""
+    logging.basicConfig(level=level, format="[%(levelname)s] %(message)s")
+
 # ====== CLEAN SOURCE LIST (403-free) ======
 SOURCES = [
     {
@@ -163,6 +193,15 @@ DEFAULT_DB = "agentic_ai_db"
 SESSIONS_COLL = "sessions"
 SOURCES_COLL = "sources"
 ARTICLES_COLL = "articles"
+# out-of-line content_html of compact articles written before MongoDB kept it inline; nothing
+# writes here any more, it is only read (load_article_body) and cleaned up (retention) for those
+BODIES_COLL = "article_bodies"
+SUBSCRIPTIONS_COLL = "subscriptions"
+SESSION_ARTICLES_COLL = "session_articles"
+ARTICLE_CARDS_COLL = "article_cards"
+CARD_FIELDS = ("session_id", "title", "url", "summary", "source_id", "source_name", "category", "published_at",
+               "word_count", "language")
+CARD_SUMMARY_CHARS = 400
 
 # ----- Utilities -----
 def iso_now() -> str:
@@ -171,6 +210,7 @@ def iso_now() -> str:
 def parse_date_to_iso(s: Optional[str]) -> Optional[str]:
     if not s:
         return None
+    from dateutil import parser as dateparser
     try:
         dt = dateparser.parse(s)
         if dt.tzinfo is None:
@@ -179,21 +219,36 @@ def parse_date_to_iso(s: Optional[str]) -> Optional[str]:
     except Exception:
         return None
 
-def _extract_canonical(html: str) -> Optional[str]:
+def parse_html(html: str):
+    """Single lxml parse of a downloaded page (bytes in, so <?xml encoding?> prologs are accepted)."""
+    import lxml.html
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    return lxml.html.document_fromstring(html.encode("utf-8", errors="replace"), parser=parser)
+
+def _extract_canonical(tree) -> Optional[str]:
     try:
-        soup = BeautifulSoup(html, "html.parser")
-        tag = soup.find("link", rel="canonical")
-        if tag and tag.get("href"):
-            return tag.get("href")
-        og = soup.find("meta", property="og:url")
-        if og and og.get("content"):
-            return og.get("content")
+        for link in tree.iter("link"):
+            rel = (link.get("rel") or "").lower().split()
+            if "canonical" in rel and link.get("href"):
+                return link.get("href").strip()
+        for content in tree.xpath('//meta[@property="og:url"]/@content'):
+            if content.strip():
+                return content.strip()
     except Exception:
         pass
     return None
 
+def _naive_text(tree) -> str:
+    """Visible text of the shared tree, skipping script/style/noscript without mutating it."""
+    texts = tree.xpath("//text()[not(ancestor::script or ancestor::style or ancestor::noscript)]")
+    return "\n".join(t.strip() for t in texts if t.strip())
+
 # ----- Requests session factory (global) -----
-def make_session(timeout: int = 12):
+def make_session(timeout: int = 12, max_retries: int = 3):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
     s = requests.Session()
     s.headers.update({
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -201,7 +256,7 @@ def make_session(timeout: int = 12):
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
         "Connection": "keep-alive",
     })
-    retries = Retry(total=3, backoff_factor=1, status_forcelist=[429,500,502,503,504], allowed_methods=["GET","HEAD"])
+    retries = Retry(total=max_retries, backoff_factor=1, status_forcelist=[429,500,502,503,504], allowed_methods=["GET","HEAD"])
     adapter = HTTPAdapter(max_retries=retries)
     s.mount("https://", adapter)
     s.mount("http://", adapter)
@@ -213,129 +268,361 @@ def make_session(timeout: int = 12):
     s.request_timeout = timeout
     return s
 
-GLOBAL_SESSION = make_session()
+_SESSIONS: Dict[bool, Any] = {}
+_SESSIONS_LOCK = threading.Lock()
 
-# ----- Full-article fetcher (uses GLOBAL_SESSION and optional ScrapingBee) -----
-def fetch_full_text(url: str, timeout: int = 12) -> Dict[str, Optional[Any]]:
+def get_session(fail_fast: bool = False):
     """
-    Returns dict:
-      { full_text, content_html, canonical_url, fetch_method, success, error }
+    The shared keep-alive session, built on first use. fail_fast=True gives the
+    single-attempt session for hosts that have been failing (their next article
+    should fail fast, not retry with backoff).
+    """
+    session = _SESSIONS.get(fail_fast)
+    if session is None:
+        with _SESSIONS_LOCK:
+            session = _SESSIONS.get(fail_fast)
+            if session is None:
+                session = _SESSIONS[fail_fast] = make_session(max_retries=0 if fail_fast else 3)
+    return session
+
+def __getattr__(name: str):
+    # GLOBAL_SESSION / FAIL_FAST_SESSION stay available as module attributes, built lazily
+    if name == "GLOBAL_SESSION":
+        return get_session()
+    if name == "FAIL_FAST_SESSION":
+        return get_session(fail_fast=True)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _retry_count(r) -> int:
+    """Retries urllib3 spent on this response (the shared session retries 429/5xx with backoff)."""
+    retries = getattr(getattr(r, "raw", None), "retries", None)
+    return len(getattr(retries, "history", None) or ())
+
+# ----- Per-host politeness (replaces the old global sleep) -----
+class DomainRateLimiter:
+    """
+    Caps in-flight requests per host and spaces request starts to the same host
+    by `min_interval` seconds. Different hosts never wait on each other.
+    """
+
+    def __init__(self, min_interval: float = 0.35, max_per_host: int = 2):
+        self.min_interval = max(0.0, min_interval)
+        self.max_per_host = max(1, max_per_host)
+        self._lock = threading.Lock()
+        self._next_start: Dict[str, float] = {}
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._semaphores.get(host)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.max_per_host)
+                self._semaphores[host] = sem
+            return sem
+
+    @contextmanager
+    def slot(self, url: str):
+        host = urlparse(url).netloc.lower()
+        with self._semaphore(host):
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(host, 0.0))
+                self._next_start[host] = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+DEFAULT_LIMITER = DomainRateLimiter()
+
+# ----- Full-article fetcher (uses the shared session and optional ScrapingBee) -----
+def download_html(url: str, timeout: int = 12, limiter: Optional[DomainRateLimiter] = None,
+                  conditional_headers: Optional[Dict[str, str]] = None, fail_fast: bool = False) -> Dict[str, Optional[Any]]:
+    """
+    Network half of fetch_full_text. Returns dict:
+      { html, success, error, etag, last_modified, timings } or { not_modified: True, success: True }
+    `bytes` / `retries` report the response size and urllib3 retries.
     Uses ScrapingBee if SCRAPINGBEE_API_KEY env var set (helps avoid 403s).
+    Politeness comes from `limiter` (per-host), keyed on the target url's host.
+    With `conditional_headers` (If-None-Match / If-Modified-Since) a 304 answer
+    returns { not_modified: True, success: True }.
+    A failure also carries the HTTP `status` (None for connection errors / timeouts);
+    `fail_fast` skips urllib3's retries.
     """
+    limiter = limiter or DEFAULT_LIMITER
+    session = get_session(fail_fast)
     scraping_api_key = os.environ.get("SCRAPINGBEE_API_KEY", "").strip()
+    started = time.perf_counter()
     try:
-        if scraping_api_key:
-            api_url = "https://app.scrapingbee.com/api/v1/"
-            params = {"api_key": scraping_api_key, "url": url, "render_js": "false"}
-            r = GLOBAL_SESSION.get(api_url, params=params, timeout=timeout)
-        else:
-            r = GLOBAL_SESSION.get(url, timeout=timeout)
+        with limiter.slot(url):
+            if scraping_api_key:
+                api_url = "https://app.scrapingbee.com/api/v1/"
+                params = {"api_key": scraping_api_key, "url": url, "render_js": "false"}
+                r = session.get(api_url, params=params, timeout=timeout)
+            else:
+                r = session.get(url, timeout=timeout, headers=conditional_headers or None)
+        if r.status_code == 304:
+            return {"not_modified": True, "success": True, "bytes": 0, "retries": _retry_count(r)}
         r.raise_for_status()
         html = r.text
     except Exception as e:
-        status = getattr(getattr(e, "response", None), "status_code", None)
+        response = getattr(e, "response", None)
+        status = getattr(response, "status_code", None)
         logger.warning("GET failed for %s: %s (status=%s)", url, e, status)
-        return {"full_text": None, "content_html": None, "canonical_url": None, "fetch_method": None, "success": False, "error": str(e)}
+        return {"full_text": None, "content_html": None, "canonical_url": None, "fetch_method": None, "success": False, "error": str(e),
+                "status": status, "retries": _retry_count(response), "timings": {"download_ms": round((time.perf_counter() - started) * 1000, 1)}}
+
+    return {
+        "html": html,
+        "success": True,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "bytes": len(r.content),
+        "retries": _retry_count(r),
+        "timings": {"download_ms": round((time.perf_counter() - started) * 1000, 1)},
+    }
+
+def fetch_full_text(url: str, timeout: int = 12, limiter: Optional[DomainRateLimiter] = None,
+                    conditional_headers: Optional[Dict[str, str]] = None,
+                    strategies: Optional[List[str]] = None) -> Dict[str, Optional[Any]]:
+    """
+    Returns dict:
+      { full_text, content_html, canonical_url, fetch_method, success, error, etag, last_modified, timings }
+    Download (download_html) followed by extraction (extract_from_html) in the calling thread.
+    """
+    downloaded = download_html(url, timeout=timeout, limiter=limiter, conditional_headers=conditional_headers)
+    if not downloaded.get("html"):
+        return downloaded
+    result = extract_from_html(downloaded["html"], url, strategies=strategies)
+    result["timings"] = {**downloaded["timings"], **result.get("timings", {})}
+    for key in ("etag", "last_modified", "bytes", "retries"):
+        result[key] = downloaded[key]
+    return result
+
+# ----- Extraction strategies: (tree, html, url) -> (text, content_html) -----
+def _extract_trafilatura(tree, html: str, url: str):
+    import trafilatura
+    # accepts the lxml tree directly and works on its own copy
+    return trafilatura.extract(tree, url=url, include_comments=False, include_tables=False), None
+
+def _extract_readability(tree, html: str, url: str):
+    import lxml.html
+    from readability import Document
+    # its cleaner deep-copies element input, so the shared tree is untouched
+    content_html = Document(tree, url=url).summary(html_partial=True)
+    return _naive_text(lxml.html.fragment_fromstring(content_html, create_parent="div")), content_html
+
+def _extract_newspaper(tree, html: str, url: str):
+    from newspaper import Article as NewsArticle
+    # fed the HTML we already have (no second download)
+    news = NewsArticle(url)
+    news.download(input_html=html)
+    news.parse()
+    return news.text, None
+
+# name -> (extractor, minimum characters for the result to count); the names and their
+# default order are host_stats.STRATEGIES
+_STRATEGY_FUNCS = {
+    "trafilatura": (_extract_trafilatura, 200),
+    "readability": (_extract_readability, 120),
+    "newspaper3k": (_extract_newspaper, 100),
+}
+
+def extract_from_html(html: str, url: str, strategies: Optional[List[str]] = None) -> Dict[str, Optional[Any]]:
+    """
+    Runs the extraction strategies over already-downloaded HTML, in the order given by
+    `strategies` (default trafilatura -> readability -> newspaper3k; see host_stats.py
+    for the per-host order), then the naive fallback.
+    The page is parsed once with lxml; the canonical lookup, trafilatura, readability
+    and the naive fallback all read that tree, and newspaper3k is handed the same
+    HTML instead of downloading the url again.
+    Result carries `timings` (ms per step that ran) so CPU cost is visible per strategy,
+    and `language_hints` (the page's declared <html lang> / og:locale).
+    """
+    timings: Dict[str, float] = {}
+    language_hints: Dict[str, Optional[str]] = {}
 
-    # polite small delay to avoid bursts
-    time.sleep(0.35)
+    def _done(result: Dict[str, Any]) -> Dict[str, Any]:
+        result["timings"] = {k: round(v, 1) for k, v in timings.items()}
+        result["language_hints"] = language_hints
+        return result
 
-    # Strategy A: trafilatura
+    t0 = time.perf_counter()
     try:
-        txt = trafilatura.extract(html, include_comments=False, include_tables=False)
-        if txt and len(txt.strip()) > 200:
-            canonical = _extract_canonical(html)
-            return {"full_text": txt.strip(), "content_html": None, "canonical_url": canonical, "fetch_method": "trafilatura", "success": True}
-    except Exception:
-        pass
+        tree = parse_html(html)
+    except Exception as e:
+        timings["parse_ms"] = (time.perf_counter() - t0) * 1000
+        return _done({"full_text": None, "content_html": None, "canonical_url": None, "fetch_method": None, "success": False, "error": f"parse failed: {e}"})
+    canonical = _extract_canonical(tree)
+    language_hints.update(page_language_hints(tree))
+    timings["parse_ms"] = (time.perf_counter() - t0) * 1000
+
+    for name in STRATEGIES if strategies is None else strategies:
+        extract, min_chars = _STRATEGY_FUNCS[name]
+        t0 = time.perf_counter()
+        try:
+            text, content_html = extract(tree, html, url)
+        except ImportError:
+            raise  # a missing extraction library is a broken install, not a page that failed to extract
+        except Exception:
+            text, content_html = None, None
+        timings[f"{name}_ms"] = (time.perf_counter() - t0) * 1000
+        if text and len(text.strip()) > min_chars:
+            return _done({"full_text": text.strip(), "content_html": content_html, "canonical_url": canonical, "fetch_method": name, "success": True})
 
-    # Strategy B: readability
+    # Fallback: naive text
+    t0 = time.perf_counter()
     try:
-        doc = Document(html)
-        content_html = doc.summary()
-        text = BeautifulSoup(content_html, "html.parser").get_text(separator="\n", strip=True)
-        if text and len(text.strip()) > 120:
-            canonical = _extract_canonical(html)
-            return {"full_text": text.strip(), "content_html": content_html, "canonical_url": canonical, "fetch_method": "readability", "success": True}
-    except Exception:
-        pass
+        text = _naive_text(tree)
+    except Exception as e:
+        timings["naive_ms"] = (time.perf_counter() - t0) * 1000
+        return _done({"full_text": None, "content_html": None, "canonical_url": None, "fetch_method": None, "success": False, "error": str(e)})
+    timings["naive_ms"] = (time.perf_counter() - t0) * 1000
+    return _done({"full_text": text.strip()[:20000] if text else None, "content_html": None, "canonical_url": canonical, "fetch_method": "naive", "success": bool(text)})
 
-    # Strategy C: newspaper3k
+# ----- Chunker -----
+def get_encoder(tokenizer_name: str = "gpt2"):
+    """tiktoken encoder, loaded once per process (None when tiktoken or its encoding files are unavailable)."""
+    # always one positional argument, so every call form shares a cache entry (and warns once)
+    return _load_encoder(tokenizer_name)
+
+@lru_cache(maxsize=4)
+def _load_encoder(tokenizer_name: str):
+    if not TIKTOKEN_AVAILABLE:
+        return None
     try:
-        news = NewsArticle(url)
-        news.download()
-        news.parse()
-        text = news.text
-        if text and len(text.strip()) > 100:
-            canonical = _extract_canonical(html)
-            return {"full_text": text.strip(), "content_html": None, "canonical_url": canonical, "fetch_method": "newspaper3k", "success": True}
+        import tiktoken
+        return tiktoken.get_encoding(tokenizer_name)
+    except ImportError as e:
+        logger.warning("tiktoken failed to import (%s); chunking by approximate word counts.", e)
+        return None
     except Exception:
         pass
-
-    # Fallback: naive text
     try:
-        soup = BeautifulSoup(html, "html.parser")
-        for s in soup(["script", "style", "noscript"]):
-            s.extract()
-        text = soup.get_text(separator="\n", strip=True)
-        canonical = _extract_canonical(html)
-        return {"full_text": text.strip()[:20000] if text else None, "content_html": None, "canonical_url": canonical, "fetch_method": "naive", "success": bool(text)}
+        return tiktoken.encoding_for_model("gpt-4o-mini")
     except Exception as e:
-        return {"full_text": None, "content_html": None, "canonical_url": None, "fetch_method": None, "success": False, "error": str(e)}
+        logger.warning("No tiktoken encoding available (%s); chunking by approximate word counts.", e)
+        return None
 
-# ----- Chunker -----
-def chunk_text_by_tokens(text: str, max_tokens: int = 900, overlap: int = 150, tokenizer_name: str = "gpt2") -> List[Dict[str, Any]]:
-    if not text or not text.strip():
-        return []
+APPROX_TOKENS_PER_WORD = 0.75
+_WORD_RE = re.compile(r"\S+")
+_BOUNDARY_RES = {
+    "paragraph": re.compile(r"\n\s*\n"),
+    "sentence": re.compile(r"(?<=[.!?])[\"')\]]?\s+|\n+"),
+}
 
-    if TIKTOKEN_AVAILABLE:
+def _token_spans(text: str, tokenizer_name: str):
+    """
+    (starts, ends, exact) char spans of the units the chunker windows over.
+    tiktoken: one encode + one decode_with_offsets, so chunks are slices of `text`
+    and no window is ever decoded again. Fallback: whitespace-separated words.
+    """
+    enc = get_encoder(tokenizer_name)
+    if enc is not None:
         try:
-            try:
-                enc = tiktoken.get_encoding(tokenizer_name)
-            except Exception:
-                enc = tiktoken.encoding_for_model("gpt-4o-mini")
             tokens = enc.encode(text)
-            n = len(tokens)
-            chunks = []
-            i = 0
-            chunk_id = 0
-            while i < n:
-                end = min(i + max_tokens, n)
-                chunk_tokens = tokens[i:end]
-                chunk_text = enc.decode(chunk_tokens)
-                chunks.append({"chunk_id": chunk_id, "text": chunk_text, "token_count": len(chunk_tokens)})
-                chunk_id += 1
-                i = end - overlap if end - overlap > i else end
-            return chunks
+            decoded, starts = enc.decode_with_offsets(tokens)
+            if decoded == text:
+                ends = starts[1:] + [len(text)]
+                return starts, ends, True
         except Exception:
             pass
+    spans = [m.span() for m in _WORD_RE.finditer(text)]
+    return [a for a, _ in spans], [b for _, b in spans], False
+
+def chunk_text_by_tokens(text: str, max_tokens: int = 900, overlap: int = 150, tokenizer_name: str = "gpt2",
+                         boundary: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Splits text into windows of at most `max_tokens`, consecutive windows sharing `overlap` tokens.
+    Each chunk: { chunk_id, text, token_count, start, end } with text == text[start:end].
+    Uses exact tiktoken counts when available, else ~0.75 tokens per word.
+    `boundary` ("sentence" | "paragraph") pulls each window's end back to the last such
+    boundary, as long as that keeps at least half of the window.
+    Always terminates: every window starts at least one unit after the previous one.
+    """
+    if not text or not text.strip():
+        return []
+
+    starts, ends, exact = _token_spans(text, tokenizer_name)
+    if exact:
+        window = max(1, max_tokens)
+        overlap_units = overlap
+    else:
+        # word heuristic: express the token budget in words
+        window = max(1, int(max_tokens / APPROX_TOKENS_PER_WORD))
+        overlap_units = int(overlap / APPROX_TOKENS_PER_WORD)
+    overlap_units = max(0, min(overlap_units, window - 1))
+
+    boundary_re = _BOUNDARY_RES.get(boundary) if boundary else None
+    boundary_positions = [m.end() for m in boundary_re.finditer(text)] if boundary_re else []
 
-    # fallback heuristic
-    approx_tokens_per_word = 0.75
-    max_words = int(max_tokens / approx_tokens_per_word)
-    overlap_words = int(overlap / approx_tokens_per_word)
-    words = re.sub(r"\s+", " ", text).strip().split(" ")
-    chunks = []
+    n = len(starts)
+    chunks: List[Dict[str, Any]] = []
     i = 0
-    chunk_id = 0
-    n = len(words)
     while i < n:
-        end = min(i + max_words, n)
-        chunk_words = words[i:end]
-        chunk_text = " ".join(chunk_words).strip()
-        token_est = int(len(chunk_words) * approx_tokens_per_word)
-        chunks.append({"chunk_id": chunk_id, "text": chunk_text, "token_count": token_est})
-        chunk_id += 1
-        i = end - overlap_words
-        if i <= end and i < 0:
-            i = end
+        end = min(i + window, n)
+        if boundary_positions and end < n:
+            # last boundary inside the window's second half, snapped to the units ending before it
+            lo = bisect.bisect_right(boundary_positions, starts[i + (end - i) // 2])
+            hi = bisect.bisect_right(boundary_positions, ends[end - 1])
+            if hi > lo:
+                snapped = bisect.bisect_right(ends, boundary_positions[hi - 1], i, end)
+                if snapped > i + (end - i) // 2:
+                    end = snapped
+        start_char, end_char = starts[i], ends[end - 1]
+        chunks.append({
+            "chunk_id": len(chunks),
+            "text": text[start_char:end_char],
+            "token_count": end - i if exact else int((end - i) * APPROX_TOKENS_PER_WORD),
+            "start": start_char,
+            "end": end_char,
+        })
+        if end >= n:
+            break
+        i = max(end - overlap_units, i + 1)
     return chunks
 
-# ----- Normalize RSS entry with full-text attempt and RSS fallback -----
-def normalize_entry_with_full(entry, source_id: str, session_id: str) -> Dict[str, Any]:
-    title = getattr(entry, "title", "") or ""
-    link = getattr(entry, "link", "") or ""
-    summary = getattr(entry, "summary", "") or getattr(entry, "description", "") or ""
+# ----- CPU stage: extraction + language + chunking (inline or in worker processes) -----
+def extract_and_analyze(html: str, url: str, strategies: Optional[List[str]] = None,
+                        language_hints: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Any]:
+    """
+    Everything CPU-bound for one downloaded page: extract_from_html, then language
+    resolution and chunking of the extracted text. Picklable in and out, so it can
+    run in a ProcessPoolExecutor worker.
+    The language comes from the page's own declaration, then `language_hints` (feed /
+    source language from the caller), and only then from langdetect (language.py);
+    `language_method` says which. The timing is langdetect_ms when detection ran,
+    language_ms otherwise.
+    """
+    result = extract_from_html(html, url, strategies=strategies)
+    full = result.get("full_text")
+    if full:
+        t0 = time.perf_counter()
+        result["language"], result["language_method"] = resolve_language(full, {**(language_hints or {}), **result["language_hints"]})
+        t1 = time.perf_counter()
+        result["text_chunks"] = chunk_text_by_tokens(full, max_tokens=900, overlap=150)
+        t2 = time.perf_counter()
+        language_key = "langdetect_ms" if result["language_method"] == "langdetect" else "language_ms"
+        result.setdefault("timings", {}).update({language_key: round((t1 - t0) * 1000, 1), "chunking_ms": round((t2 - t1) * 1000, 1)})
+    return result
+
+def _init_cpu_worker():
+    """Process-pool initializer: load per-process expensive objects (tokenizer) once."""
+    get_encoder()
+
+def make_cpu_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    """
+    Process pool for extract_and_analyze, or None to run it inline in the fetch threads.
+    Uses the spawn start method: the pool is fed from fetch threads, and forking a
+    multi-threaded process can deadlock the child.
+    """
+    if workers <= 0:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_cpu_worker)
+
+# ----- Cheap date pre-filter (runs on RSS entries, before any download) -----
+def entry_published_at(entry) -> Optional[str]:
+    """Best-effort ISO publish date from an RSS entry (published -> updated -> published_parsed)."""
     published = None
     if hasattr(entry, "published"):
         published = parse_date_to_iso(getattr(entry, "published", None))
@@ -346,6 +633,54 @@ def normalize_entry_with_full(entry, source_id: str, session_id: str) -> Dict[st
             published = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc).isoformat()
         except Exception:
             published = None
+    return published
+
+def is_within_window(published_iso: Optional[str], cutoff: datetime) -> bool:
+    """
+    Lenient window check. A missing date is kept, because the article's
+    created_at (scrape time) is "now" and therefore always inside the window.
+    """
+    if not published_iso:
+        return True
+    try:
+        dt = datetime.fromisoformat(published_iso)
+    except ValueError:
+        return False
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt >= cutoff
+
+# ----- Normalize RSS entry with full-text attempt and RSS fallback -----
+def _apply_extracted(article: Dict[str, Any], full: str, canonical_url: Optional[str], content_html: Optional[str],
+                     language: Optional[str], text_chunks: List[Dict[str, Any]]):
+    """Fills the full-text fields from a CPU-stage result or a cache record."""
+    if content_html:
+        article["content_html"] = content_html
+    article["full_text"] = full
+    article["canonical_url"] = canonical_url
+    words = re.sub(r"\s+", " ", full).strip().split(" ")
+    article["word_count"] = len(words)
+    article["language"] = language
+    article["text_chunks"] = text_chunks
+
+def _apply_summary_fallback(article: Dict[str, Any], language_hints: Optional[Dict[str, Optional[str]]] = None):
+    """RSS summary as minimal full_text so downstream AI always has something."""
+    fallback_text = article["summary"] or ""
+    article["full_text"] = fallback_text
+    article["word_count"] = len(fallback_text.split())
+    article["text_chunks"] = chunk_text_by_tokens(fallback_text, max_tokens=400, overlap=50)
+    article["language"], article["scrape_meta"]["language_method"] = resolve_language(fallback_text, language_hints)
+
+def normalize_entry_with_full(entry, source_id: str, session_id: str, limiter: Optional[DomainRateLimiter] = None,
+                              published: Optional[str] = None, cache: Optional[FetchCache] = None,
+                              cpu_pool: Optional[ProcessPoolExecutor] = None,
+                              host_stats: Optional[HostStats] = None, feed_language: Optional[str] = None,
+                              languages: Optional[SourceLanguageCache] = None) -> Dict[str, Any]:
+    title = getattr(entry, "title", "") or ""
+    link = getattr(entry, "link", "") or ""
+    summary = getattr(entry, "summary", "") or getattr(entry, "description", "") or ""
+    if published is None:
+        published = entry_published_at(entry)
 
     article = {
         "session_id": session_id,
@@ -363,65 +698,387 @@ def normalize_entry_with_full(entry, source_id: str, session_id: str) -> Dict[st
         "language": None,
         "scrape_meta": {}
     }
+    # language signals known before the page is read (the page's own <html lang> / og:locale win over these)
+    language_hints = {"feed": feed_language, "source": languages.learned(source_id) if languages is not None else None}
 
     # Only attempt fetch for http(s) links
     if link and (link.startswith("http://") or link.startswith("https://")):
-        fetched = fetch_full_text(link)
+        cached = cache.lookup(link) if cache else None
+        if cached and cached["fresh"]:
+            cache.record_hit()
+            article["scrape_meta"] = {"fetch_method": cached["fetch_method"], "success": True, "error": None, "cache": "hit",
+                                      "language_method": "cache"}
+            _apply_extracted(article, cached["full_text"], cached["canonical_url"], cached["content_html"],
+                             cached["language"], cached["text_chunks"])
+            return article
+
+        if host_stats is not None and not host_stats.allow(link):
+            # host's circuit is open: no request at all; a stale cached copy beats the RSS summary
+            if cached:
+                article["scrape_meta"] = {"fetch_method": cached["fetch_method"], "success": True, "error": None, "cache": "stale",
+                                          "note": "circuit_open", "language_method": "cache"}
+                _apply_extracted(article, cached["full_text"], cached["canonical_url"], cached["content_html"],
+                                 cached["language"], cached["text_chunks"])
+            else:
+                article["scrape_meta"] = {"fetch_method": None, "success": False, "error": "circuit open for host",
+                                          "note": "fallback_to_rss", "circuit": "open"}
+                _apply_summary_fallback(article, language_hints)
+            return article
+
+        downloaded = download_html(link, limiter=limiter, conditional_headers=FetchCache.conditional_headers(cached) if cached else None,
+                                   fail_fast=host_stats is not None and host_stats.is_suspect(link))
+        if host_stats is not None:
+            if downloaded.get("success") or not is_host_failure(downloaded.get("status")):
+                host_stats.record_success(link)
+            else:
+                host_stats.record_failure(link, downloaded.get("error"))
+        if downloaded.get("not_modified") and cached:
+            cache.refresh(cached)
+            cache.record_revalidated()
+            article["scrape_meta"] = {"fetch_method": cached["fetch_method"], "success": True, "error": None, "cache": "revalidated",
+                                      "retries": downloaded.get("retries", 0), "language_method": "cache"}
+            _apply_extracted(article, cached["full_text"], cached["canonical_url"], cached["content_html"],
+                             cached["language"], cached["text_chunks"])
+            return article
+
+        if downloaded.get("html"):
+            # CPU stage; with a pool this thread just waits (GIL released) while other fetches proceed
+            strategies = host_stats.strategy_order(link) if host_stats is not None else None
+            if cpu_pool is not None:
+                fetched = cpu_pool.submit(extract_and_analyze, downloaded["html"], link, strategies, language_hints).result()
+            else:
+                fetched = extract_and_analyze(downloaded["html"], link, strategies, language_hints)
+            if languages is not None:
+                languages.observe(source_id, fetched.get("language"), fetched.get("language_method"))
+            if host_stats is not None:
+                host_stats.record_extraction(link, fetched.get("timings", {}), fetched.get("fetch_method"))
+            fetched["timings"] = {**downloaded["timings"], **fetched.get("timings", {})}
+        else:
+            fetched = downloaded
+
         article["scrape_meta"] = {
             "fetch_method": fetched.get("fetch_method"),
             "success": bool(fetched.get("success")),
-            "error": fetched.get("error", None)
+            "error": fetched.get("error", None),
+            "timings": fetched.get("timings", {}),
+            "bytes": downloaded.get("bytes", 0),
+            "retries": downloaded.get("retries", 0),
         }
-        if fetched.get("content_html"):
-            article["content_html"] = fetched.get("content_html")
+        if cache:
+            cache.record_miss()
+            article["scrape_meta"]["cache"] = "miss"
         if fetched.get("full_text"):
-            full = fetched.get("full_text")
-            article["full_text"] = full
-            article["canonical_url"] = fetched.get("canonical_url")
-            words = re.sub(r"\s+", " ", full).strip().split(" ")
-            article["word_count"] = len(words)
-            # language detection best-effort
-            try:
-                article["language"] = detect(full[:5000]) if len(full) > 50 else None
-            except LangDetectException:
-                article["language"] = None
-            # chunk
-            article["text_chunks"] = chunk_text_by_tokens(full, max_tokens=900, overlap=150)
+            _apply_extracted(article, fetched["full_text"], fetched.get("canonical_url"), fetched.get("content_html"),
+                             fetched.get("language"), fetched.get("text_chunks") or [])
+            article["scrape_meta"]["language_method"] = fetched.get("language_method")
+            if cache:
+                cache.store(link, {**article, "fetch_method": fetched.get("fetch_method")}, etag=downloaded.get("etag"), last_modified=downloaded.get("last_modified"))
         else:
-            # fallback: use RSS summary as minimal full_text so downstream AI always has something
-            fallback_text = article["summary"] or ""
-            article["full_text"] = fallback_text
-            article["word_count"] = len(fallback_text.split())
-            article["text_chunks"] = chunk_text_by_tokens(fallback_text, max_tokens=400, overlap=50)
+            _apply_summary_fallback(article, language_hints)
             article["scrape_meta"]["note"] = "fallback_to_rss"
     else:
         # non-http (local file etc.) keep summary only
-        fallback_text = article["summary"] or ""
-        article["full_text"] = fallback_text
-        article["word_count"] = len(fallback_text.split())
-        article["text_chunks"] = chunk_text_by_tokens(fallback_text, max_tokens=400, overlap=50)
+        _apply_summary_fallback(article, language_hints)
         article["scrape_meta"]["note"] = "non_http_link_or_local"
 
     return article
 
 # ----- RSS feed reader -----
-def fetch_feed_entries(feed_url: str):
-    parsed = feedparser.parse(feed_url)
+def fetch_feed(feed_url: str, limiter: Optional[DomainRateLimiter] = None,
+               conditional_headers: Optional[Dict[str, str]] = None, timeout: int = 12) -> Dict[str, Any]:
+    """
+    Downloads a feed through the shared session (retries, proxy, keep-alive, UA) and parses it.
+    Returns dict: { entries, not_modified, etag, last_modified, timings, bytes, retries, language }
+    (language = the feed's <language> / xml:lang, if declared)
+    """
+    t0 = time.perf_counter()
+    with (limiter or DEFAULT_LIMITER).slot(feed_url):
+        r = get_session().get(feed_url, timeout=timeout, headers=conditional_headers or None)
+    timings = {"feed_download_ms": round((time.perf_counter() - t0) * 1000, 1)}
+    if r.status_code == 304:
+        return {"entries": [], "not_modified": True, "etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+                "timings": timings, "bytes": 0, "retries": _retry_count(r)}
+    r.raise_for_status()
+    import feedparser
+    t0 = time.perf_counter()
+    parsed = feedparser.parse(r.content, response_headers={
+        "content-location": r.url,
+        "content-type": r.headers.get("Content-Type", "application/xml"),
+    })
+    timings["feed_parse_ms"] = round((time.perf_counter() - t0) * 1000, 1)
     if getattr(parsed, "bozo", False):
         logger.debug("Feedparser bozo for %s: %s", feed_url, getattr(parsed, "bozo_exception", None))
-    return getattr(parsed, "entries", []) or []
+    return {
+        "entries": getattr(parsed, "entries", []) or [],
+        "not_modified": False,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "timings": timings,
+        "bytes": len(r.content),
+        "retries": _retry_count(r),
+        "language": (getattr(parsed, "feed", None) or {}).get("language"),
+    }
+
+def fetch_feed_entries(feed_url: str, limiter: Optional[DomainRateLimiter] = None):
+    return fetch_feed(feed_url, limiter=limiter)["entries"]
+
+def entry_guid(entry) -> str:
+    return (getattr(entry, "id", "") or getattr(entry, "link", "") or "").strip()
+
+def fetch_failed(article: Dict[str, Any]) -> bool:
+    """The article's page could not be fetched (network / HTTP error, open circuit); worth retrying on a later poll."""
+    meta = article.get("scrape_meta") or {}
+    return not meta.get("success") and bool(meta.get("error"))
+
+# ----- Concurrent scrape engine -----
+def _entry_has_title_and_link(entry) -> bool:
+    title = getattr(entry, "title", "") or ""
+    link = getattr(entry, "link", "") or ""
+    return bool(title.strip() and link.strip())
+
+def _fetch_source_feed(src: Dict[str, Any], limiter: DomainRateLimiter, cache: Optional[FetchCache] = None,
+                       incremental: bool = False) -> Dict[str, Any]:
+    logger.info("Fetching feed for %s", src["_id"])
+    conditional = None
+    if incremental and cache:
+        conditional = FetchCache.conditional_headers(cache.get_feed_state(src["_id"]))
+    try:
+        return fetch_feed(src["url"], limiter=limiter, conditional_headers=conditional)
+    except Exception as e:
+        logger.warning("Failed feed parse for %s: %s", src["_id"], e)
+        return {"entries": [], "not_modified": False, "etag": None, "last_modified": None, "error": str(e)}
+
+def iter_scraped_articles(sources: List[Dict[str, Any]], session_id: str, workers: int = 1,
+                          limiter: Optional[DomainRateLimiter] = None, cutoff: Optional[datetime] = None,
+                          stats: Optional[Dict[str, int]] = None, cache: Optional[FetchCache] = None,
+                          incremental: bool = False, cpu_pool: Optional[ProcessPoolExecutor] = None,
+                          metrics: Optional[RunMetrics] = None,
+                          feed_results: Optional[Dict[str, Dict[str, Any]]] = None,
+                          host_stats: Optional[HostStats] = None,
+                          languages: Optional[SourceLanguageCache] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Fetches all feeds, then every entry's full text, on a thread pool of `workers`,
+    yielding each article as soon as it and everything before it are done.
+    Output order is deterministic: source order, then feed entry order,
+    regardless of which fetch finishes first. At most 4 * workers articles are
+    in flight, so memory does not grow with the size of the run.
+    Entries published before `cutoff` are dropped before their article is fetched;
+    counters are accumulated into `stats` (entries_seen, skipped_out_of_window, ...).
+    With `incremental` (needs `cache`), feeds are polled with conditional GETs,
+    a 304 skips the source, and only entry GUIDs never seen before are fetched.
+    With `cpu_pool`, extraction/langdetect/chunking run in worker processes while
+    the threads keep downloading, so network and CPU work overlap.
+    With `metrics`, every feed poll and finished article is recorded (timings, bytes, retries).
+    `feed_results` receives one entry per source id: { entries, new, not_modified, error,
+    published } (published = the feed's entry dates), which the daemon's scheduler learns from.
+    With `host_stats`, extraction strategies are tried in each host's learned order and
+    hosts with an open circuit are not fetched (cache or RSS summary instead); its
+    statistics are flushed to disk at the end.
+    Article languages come from page metadata, the feed's <language>, or the source's
+    language learned in `languages` (a fresh SourceLanguageCache when omitted), with
+    langdetect only as the last resort.
+    """
+    languages = languages if languages is not None else SourceLanguageCache()
+    limiter = limiter or DEFAULT_LIMITER
+    incremental = incremental and cache is not None
+    stats = stats if stats is not None else {}
+    for key in ("entries_seen", "skipped_out_of_window", "feeds_not_modified", "skipped_already_seen"):
+        stats.setdefault(key, 0)
+    max_in_flight = 4 * max(1, workers)
+    pending: Deque = deque()
+    failed_guids: Dict[str, set] = {}  # source id -> GUIDs whose fetch failed; left unseen so the next poll retries them
+
+    def _drain(limit: int):
+        while len(pending) > limit:
+            src, guid, fut = pending.popleft()
+            art = fut.result()
+            if fetch_failed(art):
+                failed_guids.setdefault(src["_id"], set()).add(guid)
+            art["source_name"] = src.get("name")
+            art["category"] = src.get("category")
+            if metrics is not None:
+                metrics.record_article(art)
+            yield art
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scrape") as pool:
+        feed_futures = [pool.submit(_fetch_source_feed, src, limiter, cache, incremental) for src in sources]
+        feeds = []
+        for src, feed_future in zip(sources, feed_futures):
+            feed = feed_future.result()
+            feeds.append((src, feed))
+            if metrics is not None:
+                metrics.record_feed(src["_id"], feed)
+            if feed_results is not None:
+                feed_results[src["_id"]] = {"entries": len(feed["entries"]), "new": 0, "not_modified": feed["not_modified"],
+                                            "error": feed.get("error"),
+                                            "published": [p for p in map(entry_published_at, feed["entries"]) if p]}
+            if feed["not_modified"]:
+                stats["feeds_not_modified"] += 1
+                logger.info("Feed for %s not modified since last poll; skipping", src["_id"])
+                continue
+            entries = [e for e in feed["entries"] if _entry_has_title_and_link(e)]
+            stats["entries_seen"] += len(entries)
+            if incremental:
+                unseen = cache.unseen_guids(src["_id"], [entry_guid(e) for e in entries])
+                stats["skipped_already_seen"] += len(entries) - len(unseen)
+                entries = [e for e in entries if entry_guid(e) in unseen]
+            for e in entries:
+                published = entry_published_at(e)
+                if cutoff is not None and not is_within_window(published, cutoff):
+                    stats["skipped_out_of_window"] += 1
+                    continue
+                pending.append((src, entry_guid(e), pool.submit(normalize_entry_with_full, e, src["_id"], session_id, limiter, published, cache,
+                                                 cpu_pool, host_stats, feed.get("language"), languages)))
+                if feed_results is not None:
+                    feed_results[src["_id"]]["new"] += 1
+                yield from _drain(max_in_flight)
+        yield from _drain(0)
+    if host_stats is not None:
+        host_stats.flush()
+    # Persist polling state only after the entries were processed, so a crash re-polls them.
+    if cache:
+        for src, feed in feeds:
+            if feed.get("error"):
+                continue
+            if not feed["not_modified"]:
+                failed = failed_guids.get(src["_id"], set())
+                cache.mark_seen(src["_id"], [g for g in map(entry_guid, feed["entries"]) if g and g not in failed])
+            cache.set_feed_state(src["_id"], feed.get("etag"), feed.get("last_modified"), not_modified=feed["not_modified"])
+
+def scrape_sources(sources: List[Dict[str, Any]], session_id: str, **kwargs) -> List[Dict[str, Any]]:
+    """List form of iter_scraped_articles (same keyword arguments)."""
+    return list(iter_scraped_articles(sources, session_id, **kwargs))
+
+# ----- Local project files -----
+def _local_document(path: str, doc_cache: Optional[DocumentCache]) -> Dict[str, Any]:
+    """Extracted text, chunks and language of one local file, from the cache when its content is unchanged."""
+    content_hash = file_hash(path)
+    cached = doc_cache.get(content_hash) if doc_cache is not None else None
+    if cached is not None:
+        return {**cached, "content_hash": content_hash, "cache": "hit", "timings": {}}
+    doc = extract_document(path)
+    doc["content_hash"] = content_hash
+    if doc.get("full_text"):
+        t0 = time.perf_counter()
+        doc["language"], doc["language_method"] = resolve_language(doc["full_text"], {"doc_lang": doc.get("doc_lang")})
+        t1 = time.perf_counter()
+        doc["text_chunks"] = chunk_text_by_tokens(doc["full_text"], max_tokens=900, overlap=150)
+        t2 = time.perf_counter()
+        language_key = "langdetect_ms" if doc["language_method"] == "langdetect" else "language_ms"
+        doc["timings"].update({language_key: round((t1 - t0) * 1000, 1), "chunking_ms": round((t2 - t1) * 1000, 1)})
+    else:
+        doc["full_text"] = None  # e.g. a scanned PDF: nothing to extract
+    if doc_cache is not None:
+        # a file the extractor ran on but found no text in is cached too (negative entry), so it
+        # is not parsed again; unsupported files or a missing pypdf are not, installing it helps
+        if doc.get("extractor"):
+            doc_cache.put(content_hash, path, os.path.getsize(path), doc)
+        doc["cache"] = "miss"
+    return doc
+
+def project_file_articles(session_id: str, uploads_dir: Optional[str] = None,
+                          doc_cache: Optional[DocumentCache] = None) -> Iterator[Dict[str, Any]]:
+    """
+    PROJECT_FILES plus every PDF / text file under `uploads_dir` as pseudo-articles.
+    Their text is extracted page by page (local_docs.py), cached by content hash in
+    `doc_cache`, and chunked / language-resolved like a web article.
+    """
+    for p in list_documents(PROJECT_FILES, uploads_dir):
+        fname = os.path.basename(p)
+        try:
+            doc = _local_document(p, doc_cache)
+        except Exception as e:
+            logger.warning("Could not read local file %s: %s", p, e)
+            doc = {"full_text": None, "error": str(e)}
+        full = doc.get("full_text")
+        scrape_meta = {"fetch_method": doc.get("extractor"), "success": bool(full),
+                       "note": "local_file_extracted" if full else "local_file_attached",
+                       "content_hash": doc.get("content_hash"), "pages": len(doc.get("pages") or []),
+                       "language_method": doc.get("language_method"), "timings": doc.get("timings") or {}}
+        if doc.get("error"):
+            scrape_meta["error"] = doc["error"]
+        if doc.get("cache"):
+            scrape_meta["cache"] = doc["cache"]
+        yield {
+            "session_id": session_id,
+            "source_id": "local_project_file",
+            "source_name": "local_project_file",
+            "category": "local",
+            "title": f"Local project file: {fname}",
+            "url": p,
+            "summary": "Uploaded project file attached to session",
+            "published_at": None,
+            "created_at": iso_now(),
+            "content_html": None,
+            "full_text": full,
+            "canonical_url": None,
+            "word_count": len(full.split()) if full else None,
+            "text_chunks": doc.get("text_chunks") or [],
+            "language": doc.get("language"),
+            "page_offsets": doc.get("pages") or [],
+            "scrape_meta": scrape_meta,
+        }
 
 # ----- Mongo helpers -----
+_MONGO_CLIENTS: Dict[str, Any] = {}
+_MONGO_LOCK = threading.Lock()
+_INDEXED_DBS: set = set()
+
 def get_mongo_db():
+    """
+    (client, db) for MONGODB_URI, or None when it is unset. One pooled MongoClient
+    per URI is shared by every caller in the process; close it with close_mongo_clients().
+    """
     uri = os.environ.get("MONGODB_URI", "").strip()
     if not uri:
         return None
-    if MongoClient is None:
+    if not PYMONGO_AVAILABLE:
         raise RuntimeError("pymongo not installed but MONGODB_URI was set.")
-    client = MongoClient(uri)
+    with _MONGO_LOCK:
+        client = _MONGO_CLIENTS.get(uri)
+        if client is None:
+            from pymongo import MongoClient
+            client = MongoClient(uri)
+            _MONGO_CLIENTS[uri] = client
     return client, client[DEFAULT_DB]
 
+def close_mongo_clients():
+    with _MONGO_LOCK:
+        for client in _MONGO_CLIENTS.values():
+            client.close()
+        _MONGO_CLIENTS.clear()
+        _INDEXED_DBS.clear()
+
+def ensure_indexes(db):
+    """Creates every index the scraper relies on, once per process and database."""
+    key = (id(db.client), db.name)
+    if key in _INDEXED_DBS:
+        return
+    from pymongo import ASCENDING, DESCENDING
+    try:
+        db[ARTICLES_COLL].create_index([("session_id", ASCENDING), ("url", ASCENDING)], unique=True)
+        db[ARTICLES_COLL].create_index("content_html_ref", sparse=True)
+        # the backend's "latest articles" reads, overall and per source / category
+        db[ARTICLES_COLL].create_index([("created_at", DESCENDING)])
+        db[ARTICLES_COLL].create_index([("source_id", ASCENDING), ("created_at", DESCENDING)])
+        db[ARTICLES_COLL].create_index([("category", ASCENDING), ("created_at", DESCENDING)])
+        # keyset pages of article_cards: (created_at, _id) descending, optionally within a source / category / session
+        for prefix in ([], [("source_id", ASCENDING)], [("category", ASCENDING)], [("session_id", ASCENDING)]):
+            db[ARTICLE_CARDS_COLL].create_index(prefix + [("created_at", DESCENDING), ("_id", DESCENDING)])
+        db[SESSIONS_COLL].create_index("status")
+        db[SESSIONS_COLL].create_index("created_at")
+        db[SOURCES_COLL].create_index("active")
+        db[SOURCES_COLL].create_index("category")
+        db[SESSION_ARTICLES_COLL].create_index([("session_id", ASCENDING), ("rank", ASCENDING)])
+        db[SESSION_ARTICLES_COLL].create_index([("article_session_id", ASCENDING), ("url", ASCENDING)])
+        db[SUBSCRIPTIONS_COLL].create_index("active")
+    except Exception as e:
+        logger.warning("Index creation failed: %s", e)
+        return
+    _INDEXED_DBS.add(key)
+
 def seed_sources_to_db(db, sources_list: List[Dict[str, Any]]):
+    from pymongo import ReplaceOne
     coll = db[SOURCES_COLL]
     ops = [ReplaceOne({"_id": s["_id"]}, s, upsert=True) for s in sources_list]
     if ops:
@@ -430,11 +1087,6 @@ def seed_sources_to_db(db, sources_list: List[Dict[str, Any]]):
             logger.info("Seeded sources into DB.")
         except Exception as e:
             logger.debug("Seed sources error: %s", e)
-    try:
-        coll.create_index("active")
-        coll.create_index("category")
-    except Exception:
-        pass
 
 def create_or_update_session(db, session_id: str, user_id: str, topic: str, selected_sources: List[str]):
     now = iso_now()
@@ -447,174 +1099,554 @@ def create_or_update_session(db, session_id: str, user_id: str, topic: str, sele
         "created_at": now
     }
     db[SESSIONS_COLL].replace_one({"_id": session_id}, doc, upsert=True)
-    try:
-        db[SESSIONS_COLL].create_index("status")
-    except Exception:
-        pass
 
-def insert_articles_to_db(db, articles: List[Dict[str, Any]]) -> List[str]:
+def card_id(session_id: str, url: str) -> str:
+    """article_cards _id: stable per (session_id, url), the articles collection's unique key."""
+    return hashlib.blake2b(f"{session_id}\n{url}".encode("utf-8"), digest_size=12).hexdigest()
+
+def article_card(article: Dict[str, Any]) -> Dict[str, Any]:
+    """The dashboard's view of an article: CARD_FIELDS only, summary cut to CARD_SUMMARY_CHARS."""
+    card = {k: article.get(k) for k in CARD_FIELDS}
+    summary = card["summary"] or ""
+    if len(summary) > CARD_SUMMARY_CHARS:
+        card["summary"] = summary[:CARD_SUMMARY_CHARS].rsplit(" ", 1)[0] + "..."
+    return card
+
+# scrape_meta fields that differ between runs of the same article (kept from the first write)
+VOLATILE_META = ("timings", "bytes", "retries", "cache", "language_method")
+# scrape_meta fields only some outcomes carry; removed when a later write no longer has them
+OPTIONAL_META = ("note", "circuit")
+
+class BulkArticleWriter:
+    """
+    Buffers articles and upserts them in batches of `batch_size` with
+    UpdateOne({session_id, url}, upsert=True), so re-running a session is idempotent
+    and writes happen while the scrape is still running.
+    created_at and the run-dependent scrape_meta fields (VOLATILE_META: timings, cache
+    outcome, ...) are only set on insert, so re-upserting an unchanged article counts as skipped.
+    Per-batch results: { inserted, updated, skipped, errors } (also summed in `totals`).
+    With `metrics`, each bulk_write round trip is timed as the "mongo_write" stage.
+    With `cards`, the cards (article_card) of a batch's inserted / modified articles are upserted
+    into ARTICLE_CARDS_COLL right after it, with the article's _id when the batch inserted it;
+    a batch whose matched articles were all unchanged costs no card write for them.
+    """
+
+    def __init__(self, db, batch_size: int = 100, metrics: Optional[RunMetrics] = None, cards: bool = True):
+        self.coll = db[ARTICLES_COLL]
+        self.cards_coll = db[ARTICLE_CARDS_COLL] if cards else None
+        self.batch_size = max(1, batch_size)
+        self.buffer: List[Dict[str, Any]] = []
+        self.batches: List[Dict[str, int]] = []
+        self.totals = {"inserted": 0, "updated": 0, "skipped": 0, "errors": 0}
+        self.upserted_ids: List[str] = []
+        self.metrics = metrics
+
+    @staticmethod
+    def _op(article: Dict[str, Any]):
+        from pymongo import UpdateOne
+        meta = article.get("scrape_meta") or {}
+        doc = {k: v for k, v in article.items() if k not in ("_id", "created_at", "scrape_meta")}
+        doc.update({f"scrape_meta.{k}": v for k, v in meta.items() if k not in VOLATILE_META})
+        on_insert = {"created_at": article.get("created_at") or iso_now()}
+        on_insert.update({f"scrape_meta.{k}": meta[k] for k in VOLATILE_META if k in meta})
+        update = {"$set": doc, "$setOnInsert": on_insert}
+        stale = {f"scrape_meta.{k}": "" for k in OPTIONAL_META if k not in meta}
+        if stale:
+            update["$unset"] = stale
+        return UpdateOne({"session_id": article["session_id"], "url": article["url"]}, update, upsert=True)
+
+    def _write_cards(self, articles: List[Dict[str, Any]], upserted: Dict[int, Any], failed: set, modified: int):
+        from pymongo import UpdateOne, errors
+        ops = []
+        for i, article in enumerate(articles):
+            # the bulk result counts modified articles but does not say which: a batch with none
+            # (e.g. a re-run) writes only its inserted articles' cards, otherwise all matched ones
+            if i in failed or (i not in upserted and not modified):
+                continue
+            card = article_card(article)
+            if i in upserted:
+                card["article_id"] = upserted[i]
+            ops.append(UpdateOne({"_id": card_id(article["session_id"], article["url"])},
+                                 {"$set": card, "$setOnInsert": {"created_at": article.get("created_at") or iso_now()}},
+                                 upsert=True))
+        if not ops:
+            return
+        try:
+            self.cards_coll.bulk_write(ops, ordered=False)
+        except errors.BulkWriteError as e:
+            logger.warning("card upsert had %d errors", len(e.details.get("writeErrors", [])))
+        if self.metrics is not None:
+            self.metrics.incr("card_docs", len(ops))
+
+    def add(self, article: Dict[str, Any]):
+        self.buffer.append(article)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> Optional[Dict[str, int]]:
+        if not self.buffer:
+            return None
+        from pymongo import errors
+        articles = self.buffer
+        ops = [self._op(a) for a in articles]
+        self.buffer = []
+        t0 = time.perf_counter()
+        try:
+            res = self.coll.bulk_write(ops, ordered=False)
+            details = {"nUpserted": res.upserted_count, "nMatched": res.matched_count, "nModified": res.modified_count,
+                       "upserted": [{"index": i, "_id": _id} for i, _id in (res.upserted_ids or {}).items()],
+                       "writeErrors": []}
+        except errors.BulkWriteError as e:
+            details = e.details
+            logger.warning("bulk upsert had %d errors (first: %s)", len(details.get("writeErrors", [])),
+                           (details.get("writeErrors") or [{}])[0].get("errmsg"))
+        batch = {
+            "inserted": details.get("nUpserted", 0),
+            "updated": details.get("nModified", 0),
+            "skipped": details.get("nMatched", 0) - details.get("nModified", 0),
+            "errors": len(details.get("writeErrors", [])),
+        }
+        self.upserted_ids.extend(str(u["_id"]) for u in details.get("upserted", []))
+        if self.cards_coll is not None:
+            self._write_cards(articles, {u["index"]: u["_id"] for u in details.get("upserted", [])},
+                              {e["index"] for e in details.get("writeErrors", [])}, details.get("nModified", 0))
+        if self.metrics is not None:
+            self.metrics.observe("mongo_write", (time.perf_counter() - t0) * 1000)
+            self.metrics.incr("mongo_docs", len(ops))
+        for k, v in batch.items():
+            self.totals[k] += v
+        self.batches.append(batch)
+        logger.debug("Article batch upserted: %s", batch)
+        return batch
+
+    def close(self) -> Dict[str, int]:
+        self.flush()
+        return self.totals
+
+def load_article_body(db, ref: Optional[str]) -> Optional[str]:
+    """content_html behind an older compact article's content_html_ref (pass to article_io.expand_article)."""
+    if not ref:
+        return None
+    return body_html(db[BODIES_COLL].find_one({"_id": ref}))
+
+def article_cards_page(db, limit: int = 50, cursor: Optional[str] = None, **filters) -> Dict[str, Any]:
+    """
+    One page of article_cards, newest first: { cards, next_cursor }. Keyset pagination on
+    (created_at, _id), so every page is an index range scan however deep it is; pass the
+    returned next_cursor back for the following page. `filters`: source_id / category / session_id.
+    """
+    limit = max(1, limit)
+    query: Dict[str, Any] = {k: v for k, v in filters.items() if k in ("source_id", "category", "session_id") and v}
+    if cursor:
+        created_at, _, last_id = cursor.partition("|")
+        query["$or"] = [{"created_at": {"$lt": created_at}}, {"created_at": created_at, "_id": {"$lt": last_id}}]
+    cards = list(db[ARTICLE_CARDS_COLL].find(query).sort([("created_at", -1), ("_id", -1)]).limit(limit))
+    next_cursor = f"{cards[-1]['created_at']}|{cards[-1]['_id']}" if len(cards) == limit else None
+    return {"cards": cards, "next_cursor": next_cursor}
+
+def backfill_article_cards(db, batch_size: int = 500) -> int:
+    """Builds the cards of articles written before article_cards existed (projection read, bulk upserts)."""
+    from pymongo import UpdateOne
+    ensure_indexes(db)
+    fields = {k: 1 for k in CARD_FIELDS + ("created_at",)}
+    ops, written = [], 0
+    for doc in db[ARTICLES_COLL].find({}, fields, batch_size=batch_size):
+        card = article_card(doc)
+        card.update(article_id=doc["_id"], created_at=doc.get("created_at"))
+        ops.append(UpdateOne({"_id": card_id(doc["session_id"], doc["url"])}, {"$set": card}, upsert=True))
+        if len(ops) >= batch_size:
+            written += db[ARTICLE_CARDS_COLL].bulk_write(ops, ordered=False).upserted_count
+            ops = []
+    if ops:
+        written += db[ARTICLE_CARDS_COLL].bulk_write(ops, ordered=False).upserted_count
+    return written
+
+def insert_articles_to_db(db, articles: List[Dict[str, Any]], batch_size: int = 100) -> List[str]:
+    """Upserts articles in batches; returns the ids of newly inserted documents."""
     if not articles:
         return []
-    try:
-        db[ARTICLES_COLL].create_index([("session_id", ASCENDING), ("url", ASCENDING)], unique=True)
-    except Exception:
-        pass
+    ensure_indexes(db)
+    writer = BulkArticleWriter(db, batch_size=batch_size)
+    for a in articles:
+        writer.add(a)
+    writer.close()
+    return writer.upserted_ids
 
-    inserted_ids = []
+def setup_db_session(session_id: str, user_id: str, topic: str, source_ids: List[str], batch_size: int = 100,
+                     metrics: Optional[RunMetrics] = None, no_db: bool = False):
+    """
+    (db, BulkArticleWriter) for a new session, or (None, None) when MongoDB is off or unreachable.
+    One pooled client, indexes once, sources seeded and the session doc created up front.
+    """
+    mongodb_uri = os.environ.get("MONGODB_URI", "").strip()
+    if no_db:
+        logger.info("--no-db passed; skipping DB write.")
+        return None, None
+    if not mongodb_uri:
+        logger.info("MONGODB_URI not set; skipping DB write.")
+        return None, None
+    if not PYMONGO_AVAILABLE:
+        logger.error("pymongo not installed; cannot write to MongoDB even though MONGODB_URI is set.")
+        return None, None
     try:
-        res = db[ARTICLES_COLL].insert_many(articles, ordered=False)
-        inserted_ids = [str(_id) for _id in res.inserted_ids]
+        _, db = get_mongo_db()
+        ensure_indexes(db)
+        seed_sources_to_db(db, SOURCES)
+        create_or_update_session(db, session_id, user_id, topic, source_ids)
+        return db, BulkArticleWriter(db, batch_size=batch_size, metrics=metrics)
     except Exception as e:
-        logger.warning("bulk insert failed: %s. Falling back to single inserts.", e)
-        for a in articles:
+        logger.exception("MongoDB setup failed: %s", e)
+        return None, None
+
+class SessionSink:
+    """
+    Where a session's finished articles go: near-duplicate check, ranking (and the
+    --top-k hold-back), the output file (+ bodies sidecar), MongoDB and the search
+    index. main() feeds it one scrape; scrape_daemon.py keeps one open per session
+    and feeds it cycle after cycle (append=True). Dedup / ranker / index objects
+    are owned by the caller; close() only closes the files.
+    """
+
+    def __init__(self, out_name: str, fmt: str = "ndjson", compression: str = "none", append: bool = False,
+                 db_writer: Optional[BulkArticleWriter] = None, dedup: Optional[DedupIndex] = None,
+                 dedup_drop: bool = False, ranker: Optional[RelevanceModel] = None, topic: str = "", top_k: int = 0,
+                 search_index: Optional[SearchIndex] = None, compact: bool = False, compact_min_bytes: int = 2048,
+                 metrics: Optional[RunMetrics] = None):
+        self.out_name = out_name
+        self.compression = compression
+        self.append = append
+        self.db_writer = db_writer
+        self.dedup = dedup
+        self.dedup_drop = dedup_drop
+        self.ranker = ranker
+        self.topic = topic
+        self.top_k = top_k
+        self.search_index = search_index
+        self.compact = compact
+        self.compact_min_bytes = compact_min_bytes
+        self.metrics = metrics or RunMetrics()
+        self.ranked_count = 0
+        self.top_heap: List[Any] = []  # (score, -arrival, article) of the K best so far
+        self.writer = ArticleWriter(out_name, fmt=fmt, compression=compression, append=append)
+        self.bodies_writer: Optional[ArticleWriter] = None  # sidecar, opened on the first out-of-line body
+        self.bodies_written: set = set()
+
+    @property
+    def count(self) -> int:
+        return self.writer.count
+
+    def add(self, art: Dict[str, Any]):
+        """A scraped article: dedup, rank, then written (or held back for --top-k)."""
+        if self.dedup is not None:
+            with self.metrics.timer("dedup"):
+                keep = self.dedup.process(art, drop_duplicates=self.dedup_drop)
+            if not keep:
+                return
+        if self.ranker is not None:
+            with self.metrics.timer("rank"):
+                self.ranker.score_articles(self.topic, [art])
+            self.ranked_count += 1
+            if self.top_k > 0:
+                item = (art["relevance"]["score"], -self.ranked_count, art)
+                if len(self.top_heap) < self.top_k:
+                    heapq.heappush(self.top_heap, item)
+                else:
+                    heapq.heappushpop(self.top_heap, item)
+                return
+        self.emit(art)
+
+    def flush_top_k(self):
+        """Writes the held-back --top-k articles, best first."""
+        for _, _, art in sorted(self.top_heap, key=lambda item: (-item[0], -item[1])):
+            self.emit(art)
+
+    def emit(self, doc: Dict[str, Any]):
+        """Stores one article as is (project files skip dedup/ranking)."""
+        body = None
+        stored = db_doc = doc
+        if self.compact:
+            with self.metrics.timer("compact"):
+                stored, body = compact_article(doc, "zstd-binary", self.compact_min_bytes)
+                if self.db_writer is not None:
+                    # the same offset chunks, with full_text / content_html put back inline: the
+                    # dashboard (backend/routes/articles.js) reads them as stored
+                    db_doc = {**stored, "full_text": doc.get("full_text"), "full_text_z": None,
+                              "content_html": doc.get("content_html"), "content_html_ref": None,
+                              "storage": {"compact": 1, "body": "plain"}}
+        with self.metrics.timer("output_write"):
+            self.writer.write(json_safe(stored))
+            if body is not None and body["_id"] not in self.bodies_written:
+                if self.bodies_writer is None:
+                    self.bodies_writer = ArticleWriter(bodies_filename(self.out_name), compression=self.compression,
+                                                       append=self.append)
+                self.bodies_written.add(body["_id"])
+                self.bodies_writer.write(body)
+        self._db_add(db_doc)
+        if self.search_index is not None:
+            with self.metrics.timer("search_index"):
+                self.search_index.add_article(doc)
+
+    def _db_add(self, doc: Dict[str, Any]):
+        if self.db_writer is None:
+            return
+        try:
+            self.db_writer.add(doc)
+        except Exception as e:
+            logger.exception("MongoDB write failed: %s", e)
+            logger.info("Continuing with the output file only.")
+            self.db_writer = None
+
+    def commit(self):
+        """End of a scrape (or daemon cycle): search-index segment, pending DB batch, file buffers."""
+        if self.search_index is not None:
+            with self.metrics.timer("search_index_commit"):
+                self.search_index.commit()
+        if self.db_writer is not None:
             try:
-                r = db[ARTICLES_COLL].insert_one(a)
-                inserted_ids.append(str(r.inserted_id))
-            except Exception:
-                logger.debug("skip duplicate insert: %s", a.get("url"))
-    return inserted_ids
+                self.db_writer.flush()
+            except Exception as e:
+                logger.exception("MongoDB write failed: %s", e)
+                self.db_writer = None
+        self.writer.flush()
+        if self.bodies_writer is not None:
+            self.bodies_writer.flush()
+
+    def close(self):
+        self.writer.close()
+        if self.bodies_writer is not None:
+            self.bodies_writer.close()
 
 # ----- Main -----
-def main(argv):
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Scraper options (shared with scrape_daemon.py, which adds its own)."""
     parser = argparse.ArgumentParser()
     parser.add_argument("--session-id", type=str, help="Optional session id (if omitted, generated).")
     parser.add_argument("--user-id", type=str, default="user_local", help="User id for session.")
     parser.add_argument("--topic", type=str, default="AI for Personal Branding", help="Session topic.")
     parser.add_argument("--selected", type=str, help="Comma-separated source ids to use (max 5). If omitted, defaults to all active sources.")
     parser.add_argument("--no-db", action="store_true", help="Skip MongoDB writes even if MONGODB_URI set.")
+    parser.add_argument("--db-batch-size", type=int, default=100, help="Articles per MongoDB bulk upsert (sent while scraping).")
     parser.add_argument("--output-dir", type=str, default=".", help="Where JSON output will be written.")
-    args = parser.parse_args(argv)
+    parser.add_argument("--output-format", choices=FORMATS, default="ndjson", help="ndjson (streamed, one article per line) or json (single array, original format).")
+    parser.add_argument("--compress", choices=COMPRESSIONS, default="none", help="Compress the output file (zstd needs the zstandard package).")
+    parser.add_argument("--compact", action="store_true", help="Compact storage: offset chunks, zstd bodies, content_html out of line in the output file; MongoDB documents only drop the duplicated chunk text.")
+    parser.add_argument("--compact-min-bytes", type=int, default=2048, help="With --compact, compress full_text from this size up.")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent feed/article fetches (1 = sequential).")
+    parser.add_argument("--cpu-workers", type=int, default=0, help="Processes for extraction/langdetect/chunking (0 = run in the fetch threads).")
+    parser.add_argument("--per-host", type=int, default=2, help="Max in-flight requests to a single host.")
+    parser.add_argument("--domain-delay", type=float, default=0.35, help="Minimum seconds between request starts to the same host.")
+    parser.add_argument("--window-hours", type=float, default=24.0, help="Only fetch entries published within this many hours (undated entries are kept).")
+    parser.add_argument("--cache-path", type=str, default=".scrape_cache.sqlite", help="SQLite file for the cross-session article cache.")
+    parser.add_argument("--cache-ttl-hours", type=float, default=24.0, help="Serve cached articles without revalidation for this long.")
+    parser.add_argument("--cache-max-mb", type=int, default=256, help="Size bound for the article cache (LRU eviction).")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the article cache.")
+    parser.add_argument("--dedup", action="store_true", help="Tag near-duplicate articles with a cluster id (MinHash/LSH index kept across sessions).")
+    parser.add_argument("--dedup-index", type=str, default=".dedup_index.sqlite", help="SQLite file for the near-duplicate index.")
+    parser.add_argument("--dedup-threshold", type=float, default=0.6, help="Estimated Jaccard similarity that counts as a near-duplicate.")
+    parser.add_argument("--dedup-drop", action="store_true", help="Drop a near-duplicate when an equally rich copy was already kept in this run.")
+    parser.add_argument("--rank", action="store_true", help="Score each article's chunks against --topic (BM25; needs numpy/scipy).")
+    parser.add_argument("--top-k", type=int, default=0, help="With ranking, keep only the K most relevant articles (implies --rank).")
+    parser.add_argument("--relevance-stats", type=str, default=".relevance_stats.sqlite", help="SQLite file with the incremental BM25 vocabulary/IDF statistics.")
+    parser.add_argument("--index", action="store_true", help="Add this session's chunks to the local search index.")
+    parser.add_argument("--index-dir", type=str, default=".search_index", help="Directory of the local search index.")
+    parser.add_argument("--host-stats", type=str, default=".host_stats.sqlite", help="SQLite file with per-host extraction statistics and circuit state.")
+    parser.add_argument("--no-adaptive", action="store_true", help="Always use the default extraction order and no host circuit breaker.")
+    parser.add_argument("--breaker-threshold", type=int, default=5, help="Consecutive host failures (403/429/5xx/timeouts) that open its circuit.")
+    parser.add_argument("--breaker-cooldown", type=float, default=600, help="Seconds a host's circuit stays open before one probe request.")
+    parser.add_argument("--uploads-dir", type=str, default=None, help="Also attach every PDF / .txt / .md file under this directory (with extracted text).")
+    parser.add_argument("--doc-cache", type=str, default=".doc_cache.sqlite", help="SQLite file caching local document text by content hash.")
+    parser.add_argument("--enqueue", action="store_true", help="Queue mode: create the session and enqueue its feed jobs in MongoDB, then exit.")
+    parser.add_argument("--worker", action="store_true", help="Queue mode: claim and run feed/article jobs from MongoDB until stopped.")
+    parser.add_argument("--lease-seconds", type=float, default=120, help="Queue mode: job lease length (renewed by heartbeats while running).")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Queue mode: claims per job before it is marked failed.")
+    parser.add_argument("--poll-interval", type=float, default=5, help="Queue mode: seconds a worker waits when no job is runnable.")
+    parser.add_argument("--idle-exit", type=float, default=0, help="Queue mode: a worker exits once it found no job for this many seconds and no job is queued or leased anywhere (0 = never).")
+    parser.add_argument("--incremental", action="store_true", help="Conditional-GET feed polling; only entries not seen in earlier runs are fetched (needs the cache).")
+    parser.add_argument("--metrics-dir", type=str, default=None, help="Where metrics_<session>.json and the Prometheus textfile go (default: --output-dir).")
+    parser.add_argument("--prom-file", type=str, default="scraper.prom", help="Prometheus textfile name inside --metrics-dir (replaced every run).")
+    parser.add_argument("--no-metrics", action="store_true", help="Do not write the metrics JSON / Prometheus textfile.")
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=None, help="Profile the run with cProfile (calling thread; use --workers 1) or tracemalloc.")
+    return parser
+
+def make_host_stats(args) -> Optional[HostStats]:
+    if args.no_adaptive:
+        return None
+    return HostStats(args.host_stats, failure_threshold=args.breaker_threshold, cooldown=args.breaker_cooldown)
+
+def selected_source_ids(selected_arg: Optional[str]) -> List[str]:
+    """The comma-separated --selected ids, at most 5 (empty when none were given)."""
+    selected = [s.strip() for s in (selected_arg or "").split(",") if s.strip()]
+    if len(selected) > 5:
+        logger.info("Selected more than 5 sources; truncating to first 5.")
+        selected = selected[:5]
+    return selected
+
+def select_sources(selected_arg: Optional[str]) -> List[Dict[str, Any]]:
+    """Active SOURCES, restricted to the comma-separated --selected ids (max 5) when given."""
+    selected = selected_source_ids(selected_arg)
+    if selected:
+        return [s for s in SOURCES if s["_id"] in selected and s.get("active", True)]
+    return [s for s in SOURCES if s.get("active", True)]
+
+def main(argv):
+    args = build_arg_parser().parse_args(argv)
+    configure_logging()
+    if args.enqueue or args.worker:
+        from job_queue import run_coordinator, run_worker
+        return run_worker(args) if args.worker else run_coordinator(args)
 
     session_id = args.session_id or f"sess_{uuid.uuid4().hex[:8]}"
     user_id = args.user_id
     topic = args.topic
-    selected = None
-    if args.selected:
-        selected = [s.strip() for s in args.selected.split(",") if s.strip()]
-        if len(selected) > 5:
-            logger.info("Selected more than 5 sources; truncating to first 5.")
-            selected = selected[:5]
-
-    logger.info("Starting full scrape. session_id=%s selected=%s", session_id, selected or "ALL")
+    logger.info("Starting full scrape. session_id=%s selected=%s", session_id, args.selected or "ALL")
 
     # Choose sources
-    if selected:
-        sources_to_use = [s for s in SOURCES if s["_id"] in selected and s.get("active", True)]
-    else:
-        sources_to_use = [s for s in SOURCES if s.get("active", True)]
+    sources_to_use = select_sources(args.selected)
+
+    # ----- Lenient time-window pre-filter (applied to RSS dates before any article download) -----
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=args.window_hours)
+
+    # Parse RSS and attempt full-text extraction per entry (concurrently, per-host limited)
+    limiter = DomainRateLimiter(min_interval=args.domain_delay, max_per_host=args.per_host)
+    cache = None if args.no_cache else FetchCache(args.cache_path, ttl_seconds=args.cache_ttl_hours * 3600,
+                                                  max_bytes=args.cache_max_mb * 1024 * 1024)
+    if args.incremental and cache is None:
+        logger.warning("--incremental needs the article cache for feed state; ignoring it because --no-cache was passed.")
+    scrape_stats: Dict[str, int] = {}
+    metrics = RunMetrics(session_id)
+    metrics_dir = args.metrics_dir or args.output_dir
+
+    # Optional DB: one pooled client, indexes once, session doc up front; articles upserted in batches while scraping
+    db, db_writer = setup_db_session(session_id, user_id, topic, [s["_id"] for s in sources_to_use],
+                                     batch_size=args.db_batch_size, metrics=metrics, no_db=args.no_db)
 
-    all_articles: List[Dict[str, Any]] = []
+    # the optional stages are imported only when their flags ask for them
+    dedup = None
+    if args.dedup or args.dedup_drop:
+        from dedup import DedupIndex
+        dedup = DedupIndex(args.dedup_index, threshold=args.dedup_threshold)
+    ranker = None
+    if args.rank or args.top_k > 0:
+        from relevance import RelevanceModel
+        try:
+            ranker = RelevanceModel(args.relevance_stats)
+        except RuntimeError as e:
+            logger.error("%s Continuing without ranking.", e)
+    search_index = None
+    if args.index:
+        from search_index import SearchIndex
+        search_index = SearchIndex(args.index_dir)
+    host_stats = make_host_stats(args)
+    doc_cache = None if args.no_cache else DocumentCache(args.doc_cache)
+
+    # Stream every finished article straight to disk
+    out_name = os.path.join(args.output_dir, output_filename(session_id, args.output_format, args.compress))
+    cpu_pool = make_cpu_pool(args.cpu_workers)
+    started = time.monotonic()
+    sink = SessionSink(out_name, fmt=args.output_format, compression=args.compress, db_writer=db_writer,
+                       dedup=dedup, dedup_drop=args.dedup_drop, ranker=ranker, topic=topic, top_k=args.top_k,
+                       search_index=search_index, compact=args.compact, compact_min_bytes=args.compact_min_bytes,
+                       metrics=metrics)
 
-    # Parse RSS and attempt full-text extraction per entry
-    for src in sources_to_use:
-        logger.info("Fetching feed for %s", src["_id"])
+    profile_prefix = os.path.join(metrics_dir, f"profile_{session_id}")
+    with profile_run(args.profile, profile_prefix):
         try:
-            entries = fetch_feed_entries(src["url"])
+            for art in iter_scraped_articles(sources_to_use, session_id, workers=args.workers,
+                                             limiter=limiter, cutoff=cutoff, stats=scrape_stats, cache=cache,
+                                             incremental=args.incremental, cpu_pool=cpu_pool,
+                                             metrics=metrics, host_stats=host_stats):
+                sink.add(art)
+            sink.flush_top_k()
+            scraped_count = sink.count
+            # Attach project files (local paths) as pseudo-articles
+            for doc in project_file_articles(session_id, uploads_dir=args.uploads_dir, doc_cache=doc_cache):
+                metrics.record_article(doc)
+                sink.emit(doc)
+            sink.commit()
+        finally:
+            sink.close()
+            if cpu_pool is not None:
+                cpu_pool.shutdown()
+            if dedup is not None:
+                dedup.close()
+            if ranker is not None:
+                ranker.close()
+            if search_index is not None:
+                search_index.close()
+    total_articles = sink.count
+    db_writer = sink.db_writer
+    if ranker is not None:
+        scrape_stats["ranked"] = sink.ranked_count
+        if args.top_k > 0:
+            logger.info("Ranked %d articles against topic %r; kept top %d", sink.ranked_count, topic, len(sink.top_heap))
+    if search_index is not None:
+        scrape_stats.update({f"search_{k}": v for k, v in search_index.stats.items()})
+        logger.info("Search index %s: %d chunks from %d articles added (%d already indexed)", args.index_dir,
+                    search_index.stats["indexed_chunks"], search_index.stats["indexed_articles"],
+                    search_index.stats["skipped_known"])
+    if dedup is not None:
+        scrape_stats.update({f"dedup_{k}": v for k, v in dedup.stats.items()})
+        logger.info("Near-duplicates: %d of %d indexed articles matched an existing cluster, %d dropped",
+                    dedup.stats["duplicates"], dedup.stats["indexed"], dedup.stats["dropped"])
+    if args.incremental:
+        logger.info("Incremental poll: %d feeds not modified, %d entries already seen",
+                    scrape_stats["feeds_not_modified"], scrape_stats["skipped_already_seen"])
+    if host_stats is not None:
+        scrape_stats.update({f"host_{k}": v for k, v in host_stats.stats().items()})
+        for circuit in host_stats.open_circuits():
+            logger.warning("Circuit open for %s after %d failures (%s); next probe in %ds",
+                           circuit["host"], circuit["failures"], circuit["last_error"], circuit["retry_in_s"])
+        host_stats.close()
+    if doc_cache is not None:
+        doc_cache.prune(max_age_seconds=90 * 24 * 3600)
+        scrape_stats.update(doc_cache.stats())
+        doc_cache.close()
+    if cache:
+        cache.prune_seen(max_age_seconds=30 * 24 * 3600)
+        scrape_stats.update(cache.stats())
+        cache.close()
+        logger.info("Article cache: %d hits, %d revalidated, %d misses",
+                    scrape_stats["cache_hits"], scrape_stats["cache_revalidated"], scrape_stats["cache_misses"])
+    logger.info("Fetched %d articles in %.1fs (workers=%d, cpu_workers=%d)", scraped_count, time.monotonic() - started,
+                args.workers, args.cpu_workers)
+    logger.info("%g-hour window: skipped %d of %d feed entries before download",
+                args.window_hours, scrape_stats["skipped_out_of_window"], scrape_stats["entries_seen"])
+
+    logger.info("Wrote %d articles (with full_text if available) to %s", total_articles, out_name)
+
+    # Finish DB write: last partial batch, then mark the session complete
+    if db_writer is not None:
+        try:
+            totals = db_writer.close()
+            db[SESSIONS_COLL].update_one({"_id": session_id}, {"$set": {
+                "status": "completed",
+                "inserted_count": totals["inserted"],
+                "write_stats": totals,
+                "skipped_fetches": scrape_stats["skipped_out_of_window"],
+                "scrape_stats": scrape_stats,
+                "scrape_completed_at": iso_now(),
+            }})
+            logger.info("MongoDB upserts (session %s): %d inserted, %d updated, %d unchanged, %d errors in %d batches",
+                        session_id, totals["inserted"], totals["updated"], totals["skipped"], totals["errors"], len(db_writer.batches))
         except Exception as e:
-            logger.warning("Failed feed parse for %s: %s", src["_id"], e)
-            entries = []
-        for e in entries:
-            art = normalize_entry_with_full(e, src["_id"], session_id)
-            if not art.get("title") or not art.get("url"):
-                continue
-            art["source_name"] = src.get("name")
-            art["category"] = src.get("category")
-            all_articles.append(art)
-
-    # Attach project files (local paths) as pseudo-articles
-    for p in PROJECT_FILES:
-        if os.path.exists(p):
-            fname = os.path.basename(p)
-            doc = {
-                "session_id": session_id,
-                "source_id": "local_project_file",
-                "source_name": "local_project_file",
-                "category": "local",
-                "title": f"Local project file: {fname}",
-                "url": p,
-                "summary": "Uploaded project file attached to session",
-                "published_at": None,
-                "created_at": iso_now(),
-                "content_html": None,
-                "full_text": None,
-                "canonical_url": None,
-                "word_count": None,
-                "text_chunks": [],
-                "language": None,
-                "scrape_meta": {"success": True, "note": "local_file_attached"}
-            }
-            all_articles.append(doc)
-        else:
-            logger.debug("Local project file not found (skipping): %s", p)
-
-    # ----- 24-hour lenient filter (Option B) -----
-    cutoff = datetime.now(timezone.utc) - timedelta(days=1)
-    filtered_articles: List[Dict[str, Any]] = []
-    for a in all_articles:
-        pub = a.get("published_at")
-        keep = False
-        if pub:
-            try:
-                dt = dateparser.parse(pub)
-                if dt and dt.tzinfo is None:
-                    dt = dt.replace(tzinfo=timezone.utc)
-                if dt and dt >= cutoff:
-                    keep = True
-            except Exception:
-                keep = False
-        else:
-            # no published date -> check created_at (scrape time)
-            created = a.get("created_at")
-            if created:
-                try:
-                    cdt = dateparser.parse(created)
-                    if cdt and cdt.tzinfo is None:
-                        cdt = cdt.replace(tzinfo=timezone.utc)
-                    if cdt and cdt >= cutoff:
-                        keep = True
-                except Exception:
-                    keep = False
-        if keep:
-            filtered_articles.append(a)
-
-    all_articles = filtered_articles
-    logger.info("After 24-hour lenient filter: %d articles remain", len(all_articles))
-
-    # Save JSON locally
-    out_name = os.path.join(args.output_dir, f"articles_full_{session_id}.json")
-    with open(out_name, "w", encoding="utf-8") as f:
-        json.dump(all_articles, f, ensure_ascii=False, indent=2)
-    logger.info("Wrote %d articles (with full_text if available) to %s", len(all_articles), out_name)
-
-    # Optional DB write
-    mongodb_uri = os.environ.get("MONGODB_URI", "").strip()
-    if not args.no_db and mongodb_uri:
-        if MongoClient is None:
-            logger.error("pymongo not installed; cannot write to MongoDB even though MONGODB_URI is set.")
-        else:
-            try:
-                client = MongoClient(mongodb_uri)
-                db = client[DEFAULT_DB]
-                seed_sources_to_db(db, SOURCES)
-                sel_ids = [s["_id"] for s in sources_to_use]
-                create_or_update_session(db, session_id, user_id, topic, sel_ids)
-                inserted = insert_articles_to_db(db, all_articles)
-                db[SESSIONS_COLL].update_one({"_id": session_id}, {"$set": {"status": "completed", "inserted_count": len(inserted), "scrape_completed_at": iso_now()}})
-                logger.info("Inserted %d articles into MongoDB (session %s)", len(inserted), session_id)
-                client.close()
-            except Exception as e:
-                logger.exception("MongoDB write failed: %s", e)
-                logger.info("You can still use the JSON file: %s", out_name)
-    else:
-        if not mongodb_uri:
-            logger.info("MONGODB_URI not set; skipping DB write.")
-        elif args.no_db:
-            logger.info("--no-db passed; skipping DB write.")
-        else:
-            logger.info("pymongo not available; skipping DB write.")
+            logger.exception("MongoDB write failed: %s", e)
+            logger.info("You can still use the output file: %s", out_name)
+    if db is not None:
+        close_mongo_clients()
+
+    if not args.no_metrics:
+        try:
+            metrics_path = os.path.join(metrics_dir, f"metrics_{session_id}.json")
+            summary = metrics.write_json(metrics_path, extra={"scrape_stats": scrape_stats, "total_articles": total_articles})
+            metrics.write_prometheus(os.path.join(metrics_dir, args.prom_file))
+            slowest = sorted(summary["stages"].items(), key=lambda kv: -kv[1]["total_ms"])[:5]
+            logger.info("Metrics written to %s; slowest stages: %s", metrics_path,
+                        ", ".join(f"{k} p50={v['p50_ms']:.0f}ms p95={v['p95_ms']:.0f}ms" for k, v in slowest))
+        except OSError as e:
+            logger.warning("Could not write run metrics: %s", e)
 
-    logger.info("Done. session=%s total_articles=%d", session_id, len(all_articles))
-    print("JSON output file:", out_name)
+    logger.info("Done. session=%s total_articles=%d", session_id, total_articles)
+    print("Output file:", out_name)
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+scrape_daemon.py
+
+Long-running mode for scrape_and_save.py: one warm process (HTTP keep-alive pool,
+article cache, CPU pool, MongoDB client, dedup/ranking/search indexes) polling each
+source on its own schedule instead of re-scraping everything from a cold start.
+
+- Each source's interval follows how often its feed actually publishes: half the
+  median gap between its recent entry dates, clamped to --min-interval/--max-interval.
+  Polls that bring nothing new stretch the interval by 1.5x.
+- Every poll time gets +/- --jitter so sources drift apart; a failing source backs
+  off exponentially (--backoff-base doubling, up to --max-interval).
+- A cycle polls only the due sources, incrementally (conditional GET + unseen GUIDs),
+  and appends the new articles to the current session: the session's NDJSON file,
+  MongoDB upserts and the session doc's counters. Sessions roll over every --session-hours.
+- Learned intervals are kept in --state-file, so a restart does not relearn them.
+- SIGINT / SIGTERM finish the running cycle, then close the session.
+
+All scrape_and_save.py options apply (--workers, --cpu-workers, --dedup, --index,
+--rank, --compact, ...); --top-k and --output-format json do not fit a stream and
+are rejected.
+
+    python scrape_daemon.py --selected src_techcrunch,src_wired --min-interval 300 --max-interval 3600
+"""
+
+from __future__ import annotations
+import json
+import logging
+import os
+import random
+import signal
+import statistics
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import scrape_and_save as sas
+from article_io import output_filename
+from fetch_cache import FetchCache
+from metrics import RunMetrics
+
+logger = logging.getLogger("scraper_daemon")
+
+
+class PollScheduler:
+    """Per-source next-due times and adaptive intervals (state is a plain JSON-able dict)."""
+
+    def __init__(self, sources: List[Dict[str, Any]], min_interval: float = 300, max_interval: float = 3600,
+                 jitter: float = 0.1, backoff_base: float = 60, state: Optional[Dict[str, Any]] = None,
+                 rng: Optional[random.Random] = None):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.jitter = jitter
+        self.backoff_base = backoff_base
+        self.rng = rng or random.Random()
+        self.sources = {s["_id"]: s for s in sources}
+        saved = (state or {}).get("sources", {})
+        now = time.time()
+        self.state: Dict[str, Dict[str, Any]] = {}
+        for sid in self.sources:
+            st = dict(saved.get(sid) or {})
+            st.setdefault("interval", self.min_interval)
+            st.setdefault("failures", 0)
+            # new sources are due now; known ones keep their slot unless it is far in the past
+            st["next_due"] = min(st.get("next_due", now), now + st["interval"])
+            self.state[sid] = st
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def due(self, now: float) -> List[Dict[str, Any]]:
+        return [self.sources[sid] for sid, st in self.state.items() if st["next_due"] <= now]
+
+    def next_wakeup(self) -> float:
+        return min(st["next_due"] for st in self.state.values())
+
+    def publish_gap(self, published: List[str]) -> Optional[float]:
+        """Median seconds between consecutive entries among the 20 most recent, or None."""
+        stamps = sorted({datetime.fromisoformat(p).timestamp() for p in published}, reverse=True)[:20]
+        gaps = [a - b for a, b in zip(stamps, stamps[1:]) if a > b]
+        return statistics.median(gaps) if gaps else None
+
+    def record(self, source_id: str, outcome: Dict[str, Any], now: float):
+        """Updates the source's interval from a poll outcome (iter_scraped_articles feed_results entry)."""
+        st = self.state[source_id]
+        st["last_polled"] = now
+        if outcome.get("error"):
+            st["failures"] += 1
+            delay = min(self.max_interval, self.backoff_base * 2 ** (st["failures"] - 1))
+            st["next_due"] = now + self._jittered(delay)
+            st["last_error"] = outcome["error"]
+            return
+        st["failures"] = 0
+        st.pop("last_error", None)
+        gap = self.publish_gap(outcome.get("published") or [])
+        if gap is not None:
+            st["publish_gap"] = round(gap, 1)
+        target = min(self.max_interval, max(self.min_interval, (st.get("publish_gap") or st["interval"] * 2) / 2))
+        st["last_new"] = outcome.get("new", 0)
+        if st["last_new"]:
+            st["interval"] = target
+        else:
+            st["interval"] = min(self.max_interval, max(target, st["interval"] * 1.5))
+        st["next_due"] = now + self._jittered(st["interval"])
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"sources": self.state, "saved_at": time.time()}
+
+
+def load_state(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path: str, state: Dict[str, Any]):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+class DaemonSession:
+    """One session of the daemon: the SessionSink, its MongoDB writer, metrics and counters."""
+
+    def __init__(self, args, sources: List[Dict[str, Any]], dedup, ranker, search_index, session_id: Optional[str] = None):
+        self.args = args
+        self.session_id = session_id or f"sess_{uuid.uuid4().hex[:8]}"
+        self.started = time.time()
+        self.metrics = RunMetrics(self.session_id)
+        self.stats: Dict[str, int] = {}
+        self.cycles = 0
+        self.db, db_writer = sas.setup_db_session(self.session_id, args.user_id, args.topic, [s["_id"] for s in sources],
+                                                  batch_size=args.db_batch_size, metrics=self.metrics, no_db=args.no_db)
+        if self.db is not None:
+            self.db[sas.SESSIONS_COLL].update_one({"_id": self.session_id}, {"$set": {"status": "running", "mode": "daemon"}})
+        self.out_name = os.path.join(args.output_dir, output_filename(self.session_id, "ndjson", args.compress))
+        self.sink = sas.SessionSink(self.out_name, compression=args.compress, append=True, db_writer=db_writer,
+                                    dedup=dedup, dedup_drop=args.dedup_drop, ranker=ranker, topic=args.topic,
+                                    search_index=search_index, compact=args.compact,
+                                    compact_min_bytes=args.compact_min_bytes, metrics=self.metrics)
+        logger.info("Session %s started; appending to %s", self.session_id, self.out_name)
+
+    def after_cycle(self, new_articles: int):
+        self.cycles += 1
+        self.sink.commit()
+        if self.db is not None and self.sink.db_writer is not None:
+            totals = self.sink.db_writer.totals
+            self.db[sas.SESSIONS_COLL].update_one({"_id": self.session_id}, {"$set": {
+                "inserted_count": totals["inserted"],
+                "write_stats": dict(totals),
+                "scrape_stats": self.stats,
+                "cycles": self.cycles,
+                "last_cycle_at": sas.iso_now(),
+                "last_cycle_articles": new_articles,
+            }})
+        if not self.args.no_metrics:
+            metrics_dir = self.args.metrics_dir or self.args.output_dir
+            try:
+                self.metrics.write_prometheus(os.path.join(metrics_dir, self.args.prom_file))
+            except OSError as e:
+                logger.warning("Could not write run metrics: %s", e)
+
+    def close(self):
+        self.sink.close()
+        if self.db is not None and self.sink.db_writer is not None:
+            totals = self.sink.db_writer.close()
+            self.db[sas.SESSIONS_COLL].update_one({"_id": self.session_id}, {"$set": {
+                "status": "completed",
+                "inserted_count": totals["inserted"],
+                "write_stats": totals,
+                "scrape_stats": self.stats,
+                "cycles": self.cycles,
+                "scrape_completed_at": sas.iso_now(),
+            }})
+        if not self.args.no_metrics:
+            metrics_dir = self.args.metrics_dir or self.args.output_dir
+            try:
+                self.metrics.write_json(os.path.join(metrics_dir, f"metrics_{self.session_id}.json"),
+                                        extra={"scrape_stats": self.stats, "total_articles": self.sink.count,
+                                               "cycles": self.cycles})
+            except OSError as e:
+                logger.warning("Could not write run metrics: %s", e)
+        logger.info("Session %s closed: %d articles over %d cycles", self.session_id, self.sink.count, self.cycles)
+
+
+def run(args, stop: threading.Event) -> int:
+    sources = sas.select_sources(args.selected)
+    if not sources:
+        logger.error("No active sources selected.")
+        return 1
+    if args.top_k:
+        logger.error("--top-k needs the whole run before writing; it is not available in daemon mode.")
+        return 1
+    if args.output_format != "ndjson":
+        logger.error("Daemon sessions are appended to as they grow; use --output-format ndjson.")
+        return 1
+    if args.no_cache:
+        logger.error("Daemon mode polls incrementally and needs the article cache; drop --no-cache.")
+        return 1
+
+    # warm for the whole process lifetime
+    limiter = sas.DomainRateLimiter(min_interval=args.domain_delay, max_per_host=args.per_host)
+    cache = FetchCache(args.cache_path, ttl_seconds=args.cache_ttl_hours * 3600, max_bytes=args.cache_max_mb * 1024 * 1024)
+    cpu_pool = sas.make_cpu_pool(args.cpu_workers)
+    dedup = None
+    if args.dedup or args.dedup_drop:
+        from dedup import DedupIndex
+        dedup = DedupIndex(args.dedup_index, threshold=args.dedup_threshold)
+    ranker = None
+    if args.rank:
+        from relevance import RelevanceModel
+        try:
+            ranker = RelevanceModel(args.relevance_stats)
+        except RuntimeError as e:
+            logger.error("%s Continuing without ranking.", e)
+    search_index = None
+    if args.index:
+        from search_index import SearchIndex
+        search_index = SearchIndex(args.index_dir)
+    host_stats = sas.make_host_stats(args)
+    languages = sas.SourceLanguageCache()
+    scheduler = PollScheduler(sources, args.min_interval, args.max_interval, jitter=args.jitter,
+                              backoff_base=args.backoff_base, state=load_state(args.state_file))
+
+    session = DaemonSession(args, sources, dedup, ranker, search_index, session_id=args.session_id)
+    cycles = 0
+    try:
+        while not stop.is_set():
+            now = time.time()
+            if args.session_hours > 0 and now - session.started >= args.session_hours * 3600:
+                session.close()
+                cache.prune_seen(max_age_seconds=30 * 24 * 3600)
+                session = DaemonSession(args, sources, dedup, ranker, search_index)
+            due = scheduler.due(now)
+            if not due:
+                stop.wait(max(0.5, min(scheduler.next_wakeup() - now, 60.0)))
+                continue
+
+            cutoff = datetime.now(timezone.utc) - timedelta(hours=args.window_hours)
+            feed_results: Dict[str, Dict[str, Any]] = {}
+            before = session.sink.count
+            for art in sas.iter_scraped_articles(due, session.session_id, workers=args.workers, limiter=limiter,
+                                                 cutoff=cutoff, stats=session.stats, cache=cache, incremental=True,
+                                                 cpu_pool=cpu_pool, metrics=session.metrics, feed_results=feed_results,
+                                                 host_stats=host_stats, languages=languages):
+                session.sink.add(art)
+            new_articles = session.sink.count - before
+            session.after_cycle(new_articles)
+
+            done = time.time()
+            for src in due:
+                scheduler.record(src["_id"], feed_results.get(src["_id"], {"error": "no result"}), done)
+            save_state(args.state_file, scheduler.to_state())
+            logger.info("Cycle: polled %s, %d new articles; next poll in %.0fs",
+                        ",".join(s["_id"] for s in due), new_articles, max(0.0, scheduler.next_wakeup() - done))
+            cycles += 1
+            if args.cycles and cycles >= args.cycles:
+                break
+    finally:
+        session.close()
+        if cpu_pool is not None:
+            cpu_pool.shutdown()
+        for closable in (dedup, ranker, search_index, cache, host_stats):
+            if closable is not None:
+                closable.close()
+        if session.db is not None:
+            sas.close_mongo_clients()
+    return 0
+
+
+def main(argv):
+    parser = sas.build_arg_parser()
+    parser.description = "Run the scraper as a long-lived daemon with adaptive per-source polling."
+    parser.add_argument("--min-interval", type=float, default=300, help="Shortest poll interval per source (seconds).")
+    parser.add_argument("--max-interval", type=float, default=3600, help="Longest poll interval / backoff per source (seconds).")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Random +/- fraction applied to every interval.")
+    parser.add_argument("--backoff-base", type=float, default=60, help="First retry delay for a failing source (doubles per failure).")
+    parser.add_argument("--session-hours", type=float, default=24, help="Start a new session this often (0 = one session for the process).")
+    parser.add_argument("--state-file", type=str, default=".daemon_state.json", help="Where learned per-source intervals are kept.")
+    parser.add_argument("--cycles", type=int, default=0, help="Stop after this many polling cycles (0 = run until stopped).")
+    args = parser.parse_args(argv)
+    sas.configure_logging()
+
+    stop = threading.Event()
+
+    def _stop(signum, frame):
+        logger.info("Signal %s received; finishing the current cycle.", signum)
+        stop.set()
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    return run(args, stop)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
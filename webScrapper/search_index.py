@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+search_index.py
+
+Local inverted index over scraped text_chunks, for keyword search across sessions
+without loading articles_full_<session> files or scanning MongoDB.
+
+- Layout (one directory):
+    catalog.sqlite   chunk metadata + text, the term lexicon, corpus statistics
+    lengths.u32      token length of every chunk (uint32, indexed by chunk id)
+    seg_<n>.post     postings segments: per term, (chunk_id, tf) uint32 pairs
+- Incremental: each session is written as one new segment when the writer commits;
+  an article URL already in the index is not indexed again.
+- Queries memory-map the segments and lengths and score chunks with BM25, so only
+  the postings of the query terms are touched.
+- compact() merges all segments into one when many sessions have piled up.
+
+    with SearchIndex(".search_index") as index:
+        for hit in index.search("ai branding", k=5):
+            print(hit["score"], hit["title"], hit["text"][:80])
+
+    python search_index.py "ai branding" -k 5
+    python search_index.py --add articles_full_sess_x.ndjson
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import math
+import mmap
+import os
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# optional vectorized scoring
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except Exception:
+    NUMPY_AVAILABLE = False
+
+from article_io import iter_articles
+from fetch_cache import normalize_url
+from relevance import article_passages, tokenize
+
+CATALOG = "catalog.sqlite"
+LENGTHS = "lengths.u32"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS docs (doc_key TEXT PRIMARY KEY, session_id TEXT);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT,
+    url TEXT,
+    title TEXT,
+    chunk_id INTEGER,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_session ON chunks (session_id);
+CREATE TABLE IF NOT EXISTS segments (seg INTEGER PRIMARY KEY, file TEXT NOT NULL, created_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS lexicon (
+    term TEXT NOT NULL,
+    seg INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (term, seg)
+);
+"""
+
+
+def _u32(values: Iterable[int]) -> array:
+    out = array("I", values)
+    if sys.byteorder != "little":
+        out.byteswap()
+    return out
+
+
+def _map(path: str) -> Optional[mmap.mmap]:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class SearchIndex:
+    """
+    Single writer (scrape_and_save or the CLI), any number of readers. Segment files
+    and lengths are written before the catalog transaction that references them
+    commits, so readers never see a term pointing at missing postings.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, CATALOG), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._pending: Dict[str, List[int]] = {}
+        self._pending_lengths: List[int] = []
+        self._pending_chunks: List[tuple] = []
+        self._pending_docs: List[tuple] = []
+        self._pending_keys: set = set()
+        self._load_meta()
+        self.stats = {"indexed_articles": 0, "indexed_chunks": 0, "skipped_known": 0}
+
+    def _load_meta(self):
+        meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        self.n_chunks = int(meta.get("n_chunks", 0))
+        self.total_len = float(meta.get("total_len", 0.0))
+
+    # ----- writing -----
+    def add_article(self, article: Dict[str, Any]) -> bool:
+        """Buffers one article's chunks; returns False when its URL is already indexed."""
+        url = article.get("canonical_url") or article.get("url") or ""
+        doc_key = normalize_url(url) if url.startswith(("http://", "https://")) else url
+        with self._lock:
+            if doc_key:
+                known = self._conn.execute("SELECT 1 FROM docs WHERE doc_key = ?", (doc_key,)).fetchone()
+                if known or doc_key in self._pending_keys:
+                    self.stats["skipped_known"] += 1
+                    return False
+                self._pending_docs.append((doc_key, article.get("session_id")))
+                self._pending_keys.add(doc_key)
+            for n, passage in enumerate(article_passages(article)):
+                tokens = tokenize(passage)
+                if not tokens:
+                    continue
+                chunk = self.n_chunks + len(self._pending_lengths)
+                self._pending_lengths.append(len(tokens))
+                self._pending_chunks.append(
+                    (chunk, article.get("session_id"), article.get("url"), article.get("title"), n, passage)
+                )
+                for term, tf in Counter(tokens).items():
+                    self._pending.setdefault(term, []).extend((chunk, tf))
+            self.stats["indexed_articles"] += 1
+        return True
+
+    def commit(self) -> int:
+        """Writes buffered chunks as one new segment; returns the number of chunks added."""
+        with self._lock:
+            if not self._pending_lengths:
+                if self._pending_docs:
+                    self._conn.executemany("INSERT OR IGNORE INTO docs (doc_key, session_id) VALUES (?, ?)", self._pending_docs)
+                    self._conn.commit()
+                    self._pending_docs, self._pending_keys = [], set()
+                return 0
+            seg = (self._conn.execute("SELECT COALESCE(MAX(seg), 0) FROM segments").fetchone()[0]) + 1
+            lexicon = self._write_segment(seg, self._pending)
+            with open(os.path.join(self.path, LENGTHS), "ab") as f:
+                # drop lengths left behind by a commit that crashed before the catalog update
+                f.truncate(self.n_chunks * 4)
+                f.write(_u32(self._pending_lengths).tobytes())
+            added = len(self._pending_lengths)
+            self.n_chunks += added
+            self.total_len += sum(self._pending_lengths)
+            with self._conn:
+                self._conn.execute("INSERT INTO segments (seg, file, created_at) VALUES (?, ?, ?)",
+                                   (seg, f"seg_{seg:06d}.post", time.time()))
+                self._conn.executemany("INSERT INTO lexicon (term, seg, offset, n) VALUES (?, ?, ?, ?)", lexicon)
+                self._conn.executemany(
+                    "INSERT INTO chunks (id, session_id, url, title, chunk_id, text) VALUES (?, ?, ?, ?, ?, ?)",
+                    self._pending_chunks,
+                )
+                self._conn.executemany("INSERT OR IGNORE INTO docs (doc_key, session_id) VALUES (?, ?)", self._pending_docs)
+                self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                       [("n_chunks", self.n_chunks), ("total_len", self.total_len)])
+            self._pending, self._pending_lengths, self._pending_chunks, self._pending_docs = {}, [], [], []
+            self._pending_keys = set()
+            self.stats["indexed_chunks"] += added
+            return added
+
+    def _write_segment(self, seg: int, postings: Dict[str, Sequence[int]]) -> List[tuple]:
+        """postings: term -> flat [chunk, tf, chunk, tf, ...]; returns lexicon rows. Caller holds the lock."""
+        rows = []
+        offset = 0
+        tmp = os.path.join(self.path, f"seg_{seg:06d}.post.tmp")
+        with open(tmp, "wb") as f:
+            for term in sorted(postings):
+                flat = postings[term]
+                f.write(_u32(flat).tobytes())
+                rows.append((term, seg, offset, len(flat) // 2))
+                offset += len(flat) * 4
+        os.replace(tmp, os.path.join(self.path, f"seg_{seg:06d}.post"))
+        return rows
+
+    def compact(self) -> int:
+        """Merges every segment into one; returns how many segments were merged."""
+        with self._lock:
+            segs = self._conn.execute("SELECT seg, file FROM segments ORDER BY seg").fetchall()
+            if len(segs) < 2:
+                return 0
+            merged: Dict[str, List[int]] = {}
+            for term, seg, offset, n in self._conn.execute("SELECT term, seg, offset, n FROM lexicon ORDER BY seg"):
+                merged.setdefault(term, []).extend(self._read_postings(dict(segs)[seg], offset, n))
+            new_seg = segs[-1][0] + 1
+            lexicon = self._write_segment(new_seg, merged)
+            with self._conn:
+                self._conn.execute("DELETE FROM lexicon")
+                self._conn.execute("DELETE FROM segments")
+                self._conn.execute("INSERT INTO segments (seg, file, created_at) VALUES (?, ?, ?)",
+                                   (new_seg, f"seg_{new_seg:06d}.post", time.time()))
+                self._conn.executemany("INSERT INTO lexicon (term, seg, offset, n) VALUES (?, ?, ?, ?)", lexicon)
+            for _, name in segs:
+                m = self._maps.pop(name, None)
+                if m is not None:
+                    m.close()
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+            return len(segs)
+
+    # ----- reading -----
+    def _mapped(self, name: str, min_size: int = 0) -> Optional[mmap.mmap]:
+        m = self._maps.get(name)
+        if m is None or len(m) < min_size:
+            if m is not None:
+                m.close()
+            m = _map(os.path.join(self.path, name))
+            if m is None:
+                self._maps.pop(name, None)
+                return None
+            self._maps[name] = m
+        return m
+
+    def _read_postings(self, name: str, offset: int, n: int) -> array:
+        m = self._mapped(name)
+        out = array("I")
+        out.frombytes(m[offset:offset + n * 8])
+        if sys.byteorder != "little":
+            out.byteswap()
+        return out
+
+    def search(self, query: str, k: int = 10, session_ids: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Top-k chunks for `query` by BM25: [{score, session_id, url, title, chunk_id, text}, ...]."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or k <= 0:
+            return []
+        with self._lock:
+            self._load_meta()
+            if not self.n_chunks:
+                return []
+            marks = ",".join("?" * len(terms))
+            rows = self._conn.execute(
+                f"SELECT l.term, s.file, l.offset, l.n FROM lexicon l JOIN segments s ON s.seg = l.seg "
+                f"WHERE l.term IN ({marks})", terms
+            ).fetchall()
+            allowed = None
+            if session_ids:
+                smarks = ",".join("?" * len(session_ids))
+                allowed = {r[0] for r in self._conn.execute(
+                    f"SELECT id FROM chunks WHERE session_id IN ({smarks})", tuple(session_ids))}
+            by_term: Dict[str, List[array]] = {}
+            for term, name, offset, n in rows:
+                by_term.setdefault(term, []).append(self._read_postings(name, offset, n))
+            lengths = self._mapped(LENGTHS, self.n_chunks * 4)
+        avgdl = self.total_len / self.n_chunks
+        scores = self._score(by_term, lengths, avgdl)
+        if allowed is not None:
+            scores = {c: s for c, s in scores.items() if c in allowed}
+        best = sorted(scores.items(), key=lambda cs: (-cs[1], cs[0]))[:k]
+        if not best:
+            return []
+        with self._lock:
+            ids = [c for c, _ in best]
+            meta = {r[0]: r for r in self._conn.execute(
+                f"SELECT id, session_id, url, title, chunk_id, text FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids)}
+        return [
+            {"score": round(s, 4), "session_id": meta[c][1], "url": meta[c][2], "title": meta[c][3],
+             "chunk_id": meta[c][4], "text": meta[c][5]}
+            for c, s in best if c in meta
+        ]
+
+    def _score(self, by_term: Dict[str, List[array]], lengths: mmap.mmap, avgdl: float) -> Dict[int, float]:
+        """BM25 per chunk over the postings of the query terms."""
+        n = self.n_chunks
+        if NUMPY_AVAILABLE:
+            all_len = np.frombuffer(lengths, dtype="<u4", count=n)
+            ids_parts, contrib_parts = [], []
+            for plist in by_term.values():
+                flat = np.concatenate([np.frombuffer(p.tobytes(), dtype=np.uint32) for p in plist])
+                ids, tf = flat[0::2].astype(np.int64), flat[1::2].astype(np.float64)
+                idf = math.log1p((n - len(ids) + 0.5) / (len(ids) + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * all_len[ids] / avgdl)
+                ids_parts.append(ids)
+                contrib_parts.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+            ids = np.concatenate(ids_parts)
+            uniq, inverse = np.unique(ids, return_inverse=True)
+            total = np.bincount(inverse, weights=np.concatenate(contrib_parts))
+            return dict(zip(uniq.tolist(), total.tolist()))
+        all_len = array("I")
+        all_len.frombytes(lengths[:n * 4])
+        if sys.byteorder != "little":
+            all_len.byteswap()
+        scores: Dict[int, float] = {}
+        for plist in by_term.values():
+            df = sum(len(p) // 2 for p in plist)
+            idf = math.log1p((n - df + 0.5) / (df + 0.5))
+            for p in plist:
+                for i in range(0, len(p), 2):
+                    c, tf = p[i], p[i + 1]
+                    norm = self.k1 * (1.0 - self.b + self.b * all_len[c] / avgdl)
+                    scores[c] = scores.get(c, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return scores
+
+    def close(self):
+        with self._lock:
+            for m in self._maps.values():
+                m.close()
+            self._maps = {}
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Keyword search over scraped chunks.")
+    parser.add_argument("query", nargs="?", help="Search terms")
+    parser.add_argument("--index-dir", default=".search_index")
+    parser.add_argument("-k", type=int, default=10, help="Number of chunk hits")
+    parser.add_argument("--session", action="append", default=[], help="Restrict to a session id (repeatable)")
+    parser.add_argument("--add", nargs="+", default=[], metavar="FILE", help="Index articles_full_<session> files (one segment each)")
+    parser.add_argument("--compact", action="store_true", help="Merge all segments into one")
+    parser.add_argument("--json", action="store_true", help="Print hits as JSON")
+    args = parser.parse_args(argv)
+
+    with SearchIndex(args.index_dir) as index:
+        for path in args.add:
+            for article in iter_articles(path):
+                index.add_article(article)
+            print(f"{path}: {index.commit()} chunks indexed")
+        if args.compact:
+            print(f"merged {index.compact()} segments")
+        if args.query:
+            started = time.perf_counter()
+            hits = index.search(args.query, k=args.k, session_ids=args.session or None)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if args.json:
+                print(json.dumps(hits, ensure_ascii=False, indent=2))
+            else:
+                for hit in hits:
+                    snippet = " ".join((hit["text"] or "").split())[:160]
+                    print(f"{hit['score']:8.3f}  {hit['session_id']}  {hit['title']}  [chunk {hit['chunk_id']}]")
+                    print(f"          {hit['url']}\n          {snippet}")
+                print(f"{len(hits)} hits in {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+shared_crawl.py
+
+Shared-crawl mode for scrape_and_save.py: one scrape for many users. Instead of one
+main() run per user (each scraping its own selected sources, so overlapping sources
+are fetched once per user), the union of all active subscriptions' sources is
+scraped once and fanned out:
+
+- Articles are stored once, under a crawl session (`crawl_<id>`): the usual output
+  file and MongoDB `articles` upserts, with dedup / --index / --compact as in main().
+- Every subscription gets its own session doc (mode "shared", crawl_session_id) and
+  lightweight references in `session_articles` (and refs_<session>.ndjson): url,
+  title, source, score, rank - never a copy of the article.
+- Each article is scored once per distinct topic among the users of its source
+  (BM25, RelevanceModel.score_topics: passages tokenized and counted once). A user
+  keeps the articles of their own sources scoring above their min_score, best first,
+  cut to their top_k; a subscription without a topic keeps them all, unranked.
+  Without numpy/scipy references are kept unranked.
+
+Crawl cost grows with the number of sources; per user there is only scoring and
+the reference writes. Subscriptions come from --subscriptions (a JSON list) or the
+MongoDB `subscriptions` collection (documents with active: true):
+
+    [{"user_id": "u1", "topic": "AI agents", "selected_sources": ["src_techcrunch", "src_wired"], "top_k": 20},
+     {"user_id": "u2", "topic": "LLM security", "selected_sources": ["src_wired"], "min_score": 1.5}]
+
+    python shared_crawl.py --subscriptions subscriptions.json --workers 8
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import scrape_and_save as sas
+from article_io import ArticleWriter, output_filename
+from fetch_cache import FetchCache
+from local_docs import DocumentCache
+from metrics import RunMetrics
+
+logger = logging.getLogger("scraper_full")
+
+
+def load_subscriptions(path: Optional[str], db=None) -> List[Dict[str, Any]]:
+    """Active subscriptions from the JSON file at `path`, else from MongoDB; selected sources capped at 5."""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+    elif db is not None:
+        raw = list(db[sas.SUBSCRIPTIONS_COLL].find({"active": True}))
+    else:
+        return []
+    active_ids = {s["_id"] for s in sas.SOURCES if s.get("active", True)}
+    subs = []
+    for sub in raw:
+        if not sub.get("active", True) or not sub.get("user_id"):
+            continue
+        selected = sub.get("selected_sources") or []
+        if isinstance(selected, str):
+            selected = [s.strip() for s in selected.split(",") if s.strip()]
+        if len(selected) > 5:
+            logger.info("Subscription of %s selects more than 5 sources; truncating to first 5.", sub["user_id"])
+            selected = selected[:5]
+        selected = [s for s in selected if s in active_ids] if selected else sorted(active_ids)
+        subs.append({
+            "user_id": str(sub["user_id"]),
+            "topic": sub.get("topic") or "",
+            "selected_sources": selected,
+            "top_k": int(sub.get("top_k") or 0),
+            "min_score": sub.get("min_score"),
+        })
+    return subs
+
+
+def ref_id(session_id: str, url: str) -> str:
+    return f"{session_id}:{hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()}"
+
+
+class UserSession:
+    """One subscription's session: the references it collects and where they are written."""
+
+    def __init__(self, sub: Dict[str, Any], crawl_id: str, default_min_score: float = 0.0):
+        from relevance import tokenize
+        self.session_id = f"sess_{uuid.uuid4().hex[:8]}"
+        self.user_id = sub["user_id"]
+        self.topic = sub["topic"]
+        # a subscription without topic terms (no topic, or only stopwords) scores 0.0 everywhere,
+        # so it is not scored at all: it keeps every article of its sources, unranked
+        self.scored = bool(tokenize(self.topic))
+        self.source_ids = sub["selected_sources"]
+        self.top_k = sub["top_k"]
+        self.min_score = default_min_score if sub["min_score"] is None else float(sub["min_score"])
+        self.crawl_id = crawl_id
+        self.refs: List[Dict[str, Any]] = []
+        self.offered = 0
+
+    def offer(self, art: Dict[str, Any], relevance: Optional[Dict[str, Any]], always: bool = False):
+        """Keeps a reference to a stored article if it passes this user's topic filter."""
+        self.offered += 1
+        score = relevance["score"] if relevance else None
+        if not always and score is not None and score <= self.min_score:
+            return
+        self.refs.append({
+            "_id": ref_id(self.session_id, art["url"]),
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "topic": self.topic,
+            "article_session_id": self.crawl_id,
+            "url": art["url"],
+            "canonical_url": art.get("canonical_url"),
+            "source_id": art.get("source_id"),
+            "title": art.get("title"),
+            "published_at": art.get("published_at"),
+            "score": score,
+            "best_chunk": relevance["best_chunk"] if relevance else None,
+            "created_at": sas.iso_now(),
+        })
+
+    def ranked_refs(self) -> List[Dict[str, Any]]:
+        """References best first (unscored ones keep arrival order, after the scored), cut to top_k, with rank."""
+        order = sorted(range(len(self.refs)), key=lambda i: (self.refs[i]["score"] is None, -(self.refs[i]["score"] or 0.0), i))
+        refs = [self.refs[i] for i in order]
+        if self.top_k > 0:
+            refs = refs[:self.top_k]
+        for rank, ref in enumerate(refs, start=1):
+            ref["rank"] = rank
+        return refs
+
+
+def write_references(db, session: UserSession, refs: List[Dict[str, Any]], output_dir: str, batch_size: int = 500):
+    """refs_<session>.ndjson, plus the session_articles upserts and the completed session doc when MongoDB is on."""
+    path = os.path.join(output_dir, f"refs_{session.session_id}.ndjson")
+    with ArticleWriter(path) as writer:
+        for ref in refs:
+            writer.write(ref)
+    if db is None:
+        return path
+    from pymongo import ReplaceOne
+    coll = db[sas.SESSION_ARTICLES_COLL]
+    for i in range(0, len(refs), batch_size):
+        coll.bulk_write([ReplaceOne({"_id": r["_id"]}, r, upsert=True) for r in refs[i:i + batch_size]], ordered=False)
+    db[sas.SESSIONS_COLL].update_one({"_id": session.session_id}, {"$set": {
+        "status": "completed",
+        "article_count": len(refs),
+        "candidates": session.offered,
+        "scrape_completed_at": sas.iso_now(),
+    }})
+    return path
+
+
+def run(args) -> int:
+    crawl_id = args.session_id or f"crawl_{uuid.uuid4().hex[:8]}"
+    metrics = RunMetrics(crawl_id)
+    metrics_dir = args.metrics_dir or args.output_dir
+
+    db = None
+    if not args.subscriptions and not args.no_db and os.environ.get("MONGODB_URI", "").strip() and sas.PYMONGO_AVAILABLE:
+        try:
+            _, db = sas.get_mongo_db()
+        except Exception as e:
+            logger.exception("MongoDB connection failed: %s", e)
+    subs = load_subscriptions(args.subscriptions, db)
+    if not subs:
+        logger.error("No active subscriptions (pass --subscriptions or fill the %s collection).", sas.SUBSCRIPTIONS_COLL)
+        return 1
+    wanted = {sid for sub in subs for sid in sub["selected_sources"]}
+    sources = [s for s in sas.SOURCES if s["_id"] in wanted]
+    requested = sum(len(sub["selected_sources"]) for sub in subs)
+    logger.info("Shared crawl %s: %d subscriptions, %d source selections -> %d sources to scrape",
+                crawl_id, len(subs), requested, len(sources))
+
+    db, db_writer = sas.setup_db_session(crawl_id, "shared_crawl", "", [s["_id"] for s in sources],
+                                         batch_size=args.db_batch_size, metrics=metrics, no_db=args.no_db)
+    sessions = [UserSession(sub, crawl_id, args.min_score) for sub in subs]
+    if db is not None:
+        try:
+            db[sas.SESSIONS_COLL].update_one({"_id": crawl_id}, {"$set": {"mode": "crawl", "status": "running",
+                                                                          "user_sessions": [u.session_id for u in sessions]}})
+            for u in sessions:
+                sas.create_or_update_session(db, u.session_id, u.user_id, u.topic, u.source_ids)
+                db[sas.SESSIONS_COLL].update_one({"_id": u.session_id}, {"$set": {
+                    "mode": "shared", "status": "running", "crawl_session_id": crawl_id}})
+        except Exception as e:
+            logger.exception("MongoDB session setup failed: %s", e)
+            db, db_writer = None, None
+    by_source: Dict[str, List[UserSession]] = {}
+    for u in sessions:
+        for sid in u.source_ids:
+            by_source.setdefault(sid, []).append(u)
+
+    from relevance import RelevanceModel
+
+    ranker = None
+    try:
+        ranker = RelevanceModel(args.relevance_stats)
+    except RuntimeError as e:
+        logger.error("%s References are kept unranked.", e)
+    dedup = None
+    if args.dedup or args.dedup_drop:
+        from dedup import DedupIndex
+        dedup = DedupIndex(args.dedup_index, threshold=args.dedup_threshold)
+    search_index = None
+    if args.index:
+        from search_index import SearchIndex
+        search_index = SearchIndex(args.index_dir)
+    limiter = sas.DomainRateLimiter(min_interval=args.domain_delay, max_per_host=args.per_host)
+    cache = None if args.no_cache else FetchCache(args.cache_path, ttl_seconds=args.cache_ttl_hours * 3600,
+                                                  max_bytes=args.cache_max_mb * 1024 * 1024)
+    doc_cache = None if args.no_cache else DocumentCache(args.doc_cache)
+    host_stats = sas.make_host_stats(args)
+    cpu_pool = sas.make_cpu_pool(args.cpu_workers)
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=args.window_hours)
+    scrape_stats: Dict[str, int] = {}
+
+    out_name = os.path.join(args.output_dir, output_filename(crawl_id, args.output_format, args.compress))
+    sink = sas.SessionSink(out_name, fmt=args.output_format, compression=args.compress, db_writer=db_writer,
+                           dedup=dedup, dedup_drop=args.dedup_drop, search_index=search_index, compact=args.compact,
+                           compact_min_bytes=args.compact_min_bytes, metrics=metrics)
+    started = time.monotonic()
+    try:
+        for art in sas.iter_scraped_articles(sources, crawl_id, workers=args.workers, limiter=limiter, cutoff=cutoff,
+                                             stats=scrape_stats, cache=cache, incremental=args.incremental,
+                                             cpu_pool=cpu_pool, metrics=metrics, host_stats=host_stats):
+            stored = sink.count
+            sink.add(art)
+            if sink.count == stored:  # dropped as a near-duplicate
+                continue
+            users = by_source.get(art["source_id"], [])
+            scores: Dict[str, Dict[str, Any]] = {}
+            if ranker is not None and users:
+                with metrics.timer("rank"):
+                    scores = ranker.score_topics([u.topic for u in users if u.scored], art)
+            for u in users:
+                u.offer(art, scores.get(u.topic) if u.scored else None)
+        for doc in sas.project_file_articles(crawl_id, uploads_dir=args.uploads_dir, doc_cache=doc_cache):
+            metrics.record_article(doc)
+            sink.emit(doc)
+            for u in sessions:
+                u.offer(doc, None, always=True)
+        sink.commit()
+    finally:
+        sink.close()
+        if cpu_pool is not None:
+            cpu_pool.shutdown()
+        for closable in (dedup, ranker, search_index):
+            if closable is not None:
+                closable.close()
+    db_writer = sink.db_writer
+    logger.info("Crawled %d articles from %d sources in %.1fs; stored once in %s", sink.count, len(sources),
+                time.monotonic() - started, out_name)
+
+    references = 0
+    with metrics.timer("fanout_write"):
+        for u in sessions:
+            refs = u.ranked_refs()
+            try:
+                path = write_references(db, u, refs, args.output_dir)
+            except Exception as e:
+                logger.exception("Writing references of session %s failed: %s", u.session_id, e)
+                continue
+            references += len(refs)
+            logger.info("Session %s (user %s, topic %r): %d of %d candidate articles -> %s", u.session_id,
+                        u.user_id, u.topic, len(refs), u.offered, path)
+    scrape_stats["user_sessions"] = len(sessions)
+    scrape_stats["references"] = references
+
+    if host_stats is not None:
+        scrape_stats.update({f"host_{k}": v for k, v in host_stats.stats().items()})
+        host_stats.close()
+    if doc_cache is not None:
+        doc_cache.prune(max_age_seconds=90 * 24 * 3600)
+        scrape_stats.update(doc_cache.stats())
+        doc_cache.close()
+    if cache is not None:
+        cache.prune_seen(max_age_seconds=30 * 24 * 3600)
+        scrape_stats.update(cache.stats())
+        cache.close()
+    if db_writer is not None:
+        try:
+            totals = db_writer.close()
+            db[sas.SESSIONS_COLL].update_one({"_id": crawl_id}, {"$set": {
+                "status": "completed",
+                "inserted_count": totals["inserted"],
+                "write_stats": totals,
+                "scrape_stats": scrape_stats,
+                "scrape_completed_at": sas.iso_now(),
+            }})
+        except Exception as e:
+            logger.exception("MongoDB write failed: %s", e)
+    if db is not None:
+        sas.close_mongo_clients()
+    if not args.no_metrics:
+        try:
+            metrics.write_json(os.path.join(metrics_dir, f"metrics_{crawl_id}.json"),
+                               extra={"scrape_stats": scrape_stats, "total_articles": sink.count})
+            metrics.write_prometheus(os.path.join(metrics_dir, args.prom_file))
+        except OSError as e:
+            logger.warning("Could not write run metrics: %s", e)
+    print("Output file:", out_name)
+    return 0
+
+
+def main(argv):
+    parser = sas.build_arg_parser()
+    parser.description = "Scrape the union of all subscriptions' sources once and fan the articles out per user."
+    parser.add_argument("--subscriptions", type=str, default=None,
+                        help="JSON list of {user_id, topic, selected_sources, top_k?, min_score?} (default: MongoDB subscriptions).")
+    parser.add_argument("--min-score", type=float, default=0.0,
+                        help="Topic filter: a user keeps articles scoring above this (per-subscription min_score overrides).")
+    args = parser.parse_args(argv)
+    sas.configure_logging()
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,95 @@
+import pytest
+
+import scrape_and_save as sas
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def _article(n, **meta):
+    return {"session_id": "sess_test", "url": f"https://example.com/{n}", "title": f"Article {n}",
+            "summary": "s", "full_text": "text " * 20, "created_at": sas.iso_now(),
+            "scrape_meta": {"fetch_method": "trafilatura", "success": True, "error": None,
+                            "timings": {"download_ms": 10.0 + n}, "cache": "miss", **meta}}
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()["test_db"]
+
+
+def _write(db, articles, batch_size=2):
+    writer = sas.BulkArticleWriter(db, batch_size=batch_size)
+    for a in articles:
+        writer.add(a)
+    return writer, writer.close()
+
+
+def test_batches_flush_while_adding(db):
+    writer = sas.BulkArticleWriter(db, batch_size=2)
+    for n in range(5):
+        writer.add(_article(n))
+    assert len(writer.batches) == 2 and db[sas.ARTICLES_COLL].count_documents({}) == 4
+    totals = writer.close()
+    assert len(writer.batches) == 3
+    assert totals == {"inserted": 5, "updated": 0, "skipped": 0, "errors": 0}
+    assert len(writer.upserted_ids) == 5
+
+
+def test_rerun_with_new_timings_is_unchanged(db):
+    _write(db, [_article(n) for n in range(3)])
+    first = db[sas.ARTICLES_COLL].find_one({"url": "https://example.com/0"})
+    rerun = [_article(n, timings={"download_ms": 99.0}, cache="hit", language_method="cache") for n in range(3)]
+    writer, totals = _write(db, rerun)
+    assert totals == {"inserted": 0, "updated": 0, "skipped": 3, "errors": 0}
+    assert writer.upserted_ids == []
+    again = db[sas.ARTICLES_COLL].find_one({"url": "https://example.com/0"})
+    assert again["created_at"] == first["created_at"]
+    assert again["scrape_meta"]["timings"] == {"download_ms": 10.0}
+
+
+def test_changed_article_counts_as_updated(db):
+    _write(db, [_article(n, note="fallback_to_rss") for n in range(3)])
+    changed = [_article(n) for n in range(3)]
+    changed[1]["title"] = "Retitled"
+    _, totals = _write(db, changed)
+    assert totals == {"inserted": 0, "updated": 3, "skipped": 0, "errors": 0}  # every doc loses its stale note
+    _, totals = _write(db, changed + [_article(3)])
+    assert totals == {"inserted": 1, "updated": 0, "skipped": 3, "errors": 0}
+    doc = db[sas.ARTICLES_COLL].find_one({"url": "https://example.com/1"})
+    assert doc["title"] == "Retitled" and "note" not in doc["scrape_meta"]
+
+
+def test_cards_page_through_every_article_once(db):
+    articles = [_article(n) for n in range(7)]
+    for n, a in enumerate(articles):
+        a["created_at"] = f"2024-01-0{1 + n % 3}T00:00:00+00:00"  # ties on created_at fall back to _id
+        a["summary"] = "word " * 200
+    _write(db, articles, batch_size=3)
+    seen, cursor = [], None
+    while True:
+        page = sas.article_cards_page(db, limit=3, cursor=cursor)
+        seen.extend(page["cards"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(c["url"] for c in seen) == sorted(a["url"] for a in articles)
+    assert [(c["created_at"], c["_id"]) for c in seen] == sorted(((c["created_at"], c["_id"]) for c in seen), reverse=True)
+    card = seen[0]
+    assert "full_text" not in card and len(card["summary"]) <= sas.CARD_SUMMARY_CHARS + 3
+    assert db[sas.ARTICLES_COLL].find_one({"session_id": card["session_id"], "url": card["url"]})["_id"] == card["article_id"]
+
+
+def test_unchanged_articles_cost_no_card_writes(db):
+    _write(db, [_article(n) for n in range(4)])
+    metrics = sas.RunMetrics()
+    writer = sas.BulkArticleWriter(db, batch_size=2, metrics=metrics)
+    for n in range(4):
+        writer.add(_article(n, cache="hit"))
+    assert writer.close() == {"inserted": 0, "updated": 0, "skipped": 4, "errors": 0}
+    assert [c for c in metrics.summary()["counters"] if c["name"] == "card_docs"] == []
+
+    changed = [_article(n) for n in range(4)] + [_article(4)]
+    changed[0]["title"] = "Retitled"
+    _write(db, changed, batch_size=5)
+    assert db[sas.ARTICLE_CARDS_COLL].find_one({"url": "https://example.com/0"})["title"] == "Retitled"
+    assert db[sas.ARTICLE_CARDS_COLL].count_documents({}) == 5
@@ -0,0 +1,41 @@
+import pytest
+
+import scrape_and_save as sas
+from article_io import ZSTD_AVAILABLE, expand_article, iter_articles, load_bodies, bodies_filename
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def _article():
+    text = " ".join(f"Sentence {i} about compact storage and the dashboard reader." for i in range(200))
+    return {"session_id": "sess_test", "url": "https://example.com/a", "title": "A", "summary": "s",
+            "full_text": text, "content_html": f"<article><p>{text}</p></article>",
+            "text_chunks": sas.chunk_text_by_tokens(text, max_tokens=200, overlap=20),
+            "created_at": sas.iso_now(), "scrape_meta": {"success": True}}
+
+
+def test_compact_session_keeps_mongo_documents_readable_by_the_dashboard(tmp_path):
+    db = mongomock.MongoClient()["test_db"]
+    art = _article()
+    out = str(tmp_path / "articles.ndjson")
+    sink = sas.SessionSink(out, db_writer=sas.BulkArticleWriter(db), compact=True, compact_min_bytes=64)
+    sink.emit(dict(art))
+    sink.commit()
+    sink.close()
+    sink.db_writer.close()
+
+    # what ScrapArticles.jsx renders: full_text / content_html straight off the /api/articles document
+    doc = db[sas.ARTICLES_COLL].find_one({"url": art["url"]})
+    assert doc["full_text"] == art["full_text"]
+    assert doc["content_html"] == art["content_html"]
+    assert all("text" not in c for c in doc["text_chunks"])  # chunks are still offsets
+    assert [c["text"] for c in expand_article(doc)["text_chunks"]] == [c["text"] for c in art["text_chunks"]]
+    assert db[sas.BODIES_COLL].count_documents({}) == 0
+
+    # the output file stays fully compact and expands back to the original
+    stored = next(iter_articles(out))
+    assert stored["content_html"] is None and stored["content_html_ref"]
+    if ZSTD_AVAILABLE:
+        assert stored["full_text"] is None and stored["full_text_z"]
+    expanded = expand_article(stored, load_bodies(bodies_filename(out)))
+    assert expanded["full_text"] == art["full_text"] and expanded["content_html"] == art["content_html"]
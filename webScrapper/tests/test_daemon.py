@@ -0,0 +1,16 @@
+import logging
+
+import scrape_and_save as sas
+from scrape_daemon import DaemonSession
+
+
+def test_unwritable_metrics_dir_does_not_stop_the_daemon(tmp_path, caplog):
+    args = sas.build_arg_parser().parse_args(["--no-db", "--output-dir", str(tmp_path),
+                                              "--metrics-dir", str(tmp_path / "missing" / "dir")])
+    session = DaemonSession(args, [], None, None, None)
+    with caplog.at_level(logging.WARNING, logger="scraper_daemon"):
+        session.after_cycle(0)
+        session.after_cycle(0)
+        session.close()
+    assert session.cycles == 2
+    assert len([r for r in caplog.records if "Could not write run metrics" in r.getMessage()]) == 3
@@ -0,0 +1,23 @@
+import logging
+import sys
+import types
+
+import scrape_and_save as sas
+
+
+def test_get_encoder_call_forms_share_one_cache_entry(monkeypatch, caplog):
+    def unavailable(name):
+        raise KeyError(name)
+
+    monkeypatch.setitem(sys.modules, "tiktoken", types.SimpleNamespace(get_encoding=unavailable, encoding_for_model=unavailable))
+    monkeypatch.setattr(sas, "TIKTOKEN_AVAILABLE", True)
+    sas._load_encoder.cache_clear()
+    try:
+        with caplog.at_level(logging.WARNING, logger="scraper_full"):
+            assert sas.get_encoder() is None
+            assert sas.get_encoder("gpt2") is None
+            assert sas.get_encoder(tokenizer_name="gpt2") is None
+        assert sas._load_encoder.cache_info().misses == 1
+        assert len([r for r in caplog.records if "No tiktoken encoding" in r.getMessage()]) == 1
+    finally:
+        sas._load_encoder.cache_clear()
@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+
+import scrape_and_save as sas
+from fetch_cache import FetchCache
+
+PAGE = ("<html lang='en'><body><article>" + "<p>Offline article body about local feeds and polling.</p>" * 40
+        + "</article></body></html>").encode()
+
+
+def _feed(base):
+    now = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S +0000")
+    items = "".join(
+        f"<item><title>{name}</title><link>{base}/page/{name}</link><guid>{base}/page/{name}</guid>"
+        f"<pubDate>{now}</pubDate><description>summary of {name}</description></item>"
+        for name in ("ok", "blocked"))
+    return f"<?xml version='1.0'?><rss version='2.0'><channel><title>t</title>{items}</channel></rss>".encode()
+
+
+def _scrape(sources, cache):
+    return list(sas.iter_scraped_articles(sources, "sess_test", workers=2, cache=cache, incremental=True,
+                                          limiter=sas.DomainRateLimiter(min_interval=0)))
+
+
+def test_set_feed_state_keeps_validators_on_304(tmp_path):
+    cache = FetchCache(str(tmp_path / "c.sqlite"))
+    cache.set_feed_state("src", '"v1"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    cache.set_feed_state("src", None, None, not_modified=True)
+    assert cache.get_feed_state("src") == {"etag": '"v1"', "last_modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    cache.set_feed_state("src", '"v2"', None)
+    assert cache.get_feed_state("src") == {"etag": '"v2"', "last_modified": None}
+    cache.close()
+
+
+def test_incremental_polling_stays_conditional_and_retries_failed_entries(http_server, tmp_path):
+    base = http_server.base_url
+    feed = _feed(base)
+
+    def feed_route(headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, {}, b""  # no validators repeated, as many servers do
+        return 200, {"ETag": '"v1"', "Content-Type": "application/rss+xml"}, feed
+
+    http_server.routes.update({"/feed.xml": feed_route, "/page/ok": (200, {"Content-Type": "text/html"}, PAGE),
+                               "/page/blocked": (403, {}, b"")})
+    sources = [{"_id": "src_local", "name": "Local", "url": f"{base}/feed.xml", "category": "Test"}]
+    cache = FetchCache(str(tmp_path / "c.sqlite"))
+
+    first = _scrape(sources, cache)
+    assert {a["title"]: sas.fetch_failed(a) for a in first} == {"ok": False, "blocked": True}
+    assert cache.unseen_guids("src_local", [f"{base}/page/ok", f"{base}/page/blocked"]) == {f"{base}/page/blocked"}
+
+    for _ in range(2):  # 304 without an ETag must not clear the stored one
+        stats = {}
+        assert list(sas.iter_scraped_articles(sources, "sess_test", cache=cache, incremental=True, stats=stats,
+                                              limiter=sas.DomainRateLimiter(min_interval=0))) == []
+        assert stats["feeds_not_modified"] == 1
+        assert cache.get_feed_state("src_local")["etag"] == '"v1"'
+    feed_requests = [h for path, h in http_server.requests if path == "/feed.xml"]
+    assert [h.get("If-None-Match") for h in feed_requests] == [None, '"v1"', '"v1"']
+
+    # the feed changes: the entry that failed before is fetched again, the fetched one is not
+    cache.set_feed_state("src_local", None, None)
+    http_server.routes["/page/blocked"] = (200, {"Content-Type": "text/html"}, PAGE)
+    assert [a["title"] for a in _scrape(sources, cache)] == ["blocked"]
+    cache.close()
@@ -0,0 +1,24 @@
+import pytest
+
+from fetch_cache import FetchCache
+
+
+@pytest.mark.parametrize("order", ["alias_first", "page_first"])
+def test_stored_url_is_never_shadowed_by_an_alias(tmp_path, order):
+    cache = FetchCache(str(tmp_path / "c.sqlite"))
+    # page a declares page b's URL as its canonical one (syndicated copy, bad markup...)
+    writes = [("https://example.com/a", {"full_text": "page a", "canonical_url": "https://example.com/b"}),
+              ("https://example.com/b", {"full_text": "page b"})]
+    for url, result in writes if order == "alias_first" else writes[::-1]:
+        cache.store(url, result)
+    assert cache.lookup("https://example.com/b")["full_text"] == "page b"
+    assert cache.lookup("https://example.com/a")["full_text"] == "page a"
+    cache.close()
+
+
+def test_canonical_url_without_own_entry_hits_the_alias(tmp_path):
+    cache = FetchCache(str(tmp_path / "c.sqlite"))
+    cache.store("https://example.com/a?utm_source=rss", {"full_text": "page a", "canonical_url": "https://example.com/story"})
+    assert cache.lookup("https://example.com/story")["full_text"] == "page a"
+    assert cache.lookup("https://example.com/other") is None
+    cache.close()
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import job_queue
+import scrape_and_save as sas
+from test_feed_polling import _feed
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture
+def queue():
+    return job_queue.JobQueue(mongomock.MongoClient()["test_db"])
+
+
+def _args(tmp_path, *extra):
+    return sas.build_arg_parser().parse_args(["--cache-path", str(tmp_path / "c.sqlite"), "--no-adaptive",
+                                              "--no-metrics", "--domain-delay", "0", *extra])
+
+
+def test_coordinator_caps_selected_sources_like_main(queue, monkeypatch, tmp_path):
+    monkeypatch.setattr(job_queue, "make_queue", lambda args: (queue.db, queue))
+    ids = [s["_id"] for s in sas.SOURCES if s.get("active", True)][:6]
+    assert len(ids) == 6
+    assert job_queue.run_coordinator(_args(tmp_path, "--enqueue", "--session-id", "sess_q", "--selected", ",".join(ids))) == 0
+    feeds = {job["payload"]["source"]["_id"] for job in queue.coll.find({"kind": "feed"})}
+    assert feeds == set(ids[:5])
+
+
+def test_idle_counts_jobs_in_backoff_and_leased(queue):
+    assert queue.idle()
+    queue.enqueue([{"_id": "j1", "session_id": "s", "kind": "feed", "payload": {}}])
+    job = queue.claim("w1")
+    assert not queue.idle()
+    queue.fail(job, "w1", "boom")  # back to queued, not due for a while
+    assert queue.claim("w2") is None and not queue.idle()
+    queue.coll.update_one({"_id": "j1"}, {"$set": {"status": "done"}})
+    assert queue.idle()
+
+
+def test_feed_job_keeps_validators_on_304(queue, http_server, tmp_path):
+    base = http_server.base_url
+    feed = _feed(base)
+
+    def feed_route(headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, {}, b""
+        return 200, {"ETag": '"v1"', "Content-Type": "application/rss+xml"}, feed
+
+    http_server.routes["/feed.xml"] = feed_route
+    worker = job_queue.QueueWorker(_args(tmp_path, "--worker"), queue)
+    src = {"_id": "src_local", "name": "Local", "url": f"{base}/feed.xml", "category": "Test"}
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
+    job = {"_id": "feed_job", "session_id": "sess_q", "payload": {"source": src, "cutoff": cutoff, "incremental": True}}
+    try:
+        assert worker.run_feed(job)["enqueued"] == 2
+        for _ in range(2):
+            assert worker.run_feed(job)["not_modified"]
+            assert worker.cache.get_feed_state("src_local")["etag"] == '"v1"'
+    finally:
+        worker.close()
+    assert [h.get("If-None-Match") for path, h in http_server.requests] == [None, '"v1"', '"v1"']
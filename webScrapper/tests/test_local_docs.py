@@ -0,0 +1,46 @@
+import pytest
+
+import scrape_and_save as sas
+from local_docs import DocumentCache
+
+pypdf = pytest.importorskip("pypdf")
+
+
+def test_pdf_without_text_is_cached_as_negative_entry(tmp_path, monkeypatch):
+    pdf = tmp_path / "scanned.pdf"
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(width=200, height=200)
+    with open(pdf, "wb") as f:
+        writer.write(f)
+
+    extracted = []
+    real_extract = sas.extract_document
+    monkeypatch.setattr(sas, "extract_document", lambda path: extracted.append(path) or real_extract(path))
+    cache = DocumentCache(str(tmp_path / "docs.sqlite"))
+
+    first = sas._local_document(str(pdf), cache)
+    assert (first["full_text"], first["cache"]) == (None, "miss")
+    second = sas._local_document(str(pdf), cache)
+    assert (second["full_text"], second["cache"], second["extractor"]) == (None, "hit", "pypdf")
+    assert extracted == [str(pdf)]
+    assert cache.stats() == {"doc_cache_hits": 1, "doc_cache_misses": 1}
+    cache.close()
+
+
+def test_pdf_language_comes_from_the_single_parse(tmp_path, monkeypatch):
+    from pypdf.generic import NameObject, TextStringObject
+    from local_docs import extract_document
+
+    pdf = tmp_path / "lang.pdf"
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(width=200, height=200)
+    writer._root_object[NameObject("/Lang")] = TextStringObject("de-DE")
+    with open(pdf, "wb") as f:
+        writer.write(f)
+
+    opened = []
+    real_reader = pypdf.PdfReader
+    monkeypatch.setattr(pypdf, "PdfReader", lambda stream: opened.append(stream) or real_reader(stream))
+    doc = extract_document(str(pdf))
+    assert (doc["doc_lang"], doc["extractor"]) == ("de-DE", "pypdf")
+    assert len(opened) == 1
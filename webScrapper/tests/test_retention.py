@@ -0,0 +1,40 @@
+import pytest
+
+import scrape_and_save as sas
+from retention_manager_and_wrapper import apply_retention, plan_retention
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()["test_db"]
+
+
+def _session(db, sid, created_at, **fields):
+    db[sas.SESSIONS_COLL].insert_one({"_id": sid, "created_at": created_at, **fields})
+    db[sas.ARTICLES_COLL].insert_one({"session_id": sid, "url": f"https://example.com/{sid}", "title": sid})
+
+
+def test_crawl_sessions_are_kept_while_a_kept_session_references_them(db):
+    _session(db, "crawl_old", "2024-01-01T00:00:00+00:00", mode="crawl")
+    _session(db, "sess_old", "2024-01-01T00:00:01+00:00", mode="shared", crawl_session_id="crawl_old")
+    _session(db, "crawl_new", "2024-02-01T00:00:00+00:00", mode="crawl")
+    _session(db, "sess_u1", "2024-02-01T00:00:01+00:00", mode="shared", crawl_session_id="crawl_new")
+    _session(db, "sess_u2", "2024-02-01T00:00:02+00:00", mode="shared", crawl_session_id="crawl_new")
+    _session(db, "sess_solo", "2024-03-01T00:00:00+00:00")
+    db[sas.SESSION_ARTICLES_COLL].insert_one({"session_id": "sess_u1", "article_session_id": "crawl_new",
+                                              "url": "https://example.com/crawl_new"})
+
+    # the two crawls are not among the 3 newest sessions; only the unreferenced one goes
+    assert plan_retention(db, retain_sessions=3) == (["sess_solo", "sess_u2", "sess_u1", "crawl_new"],
+                                                      ["sess_old", "crawl_old"])
+
+    report = apply_retention(db, retain_sessions=3)
+    assert report["to_delete_sessions"] == ["sess_old", "crawl_old"]
+    ref = db[sas.SESSION_ARTICLES_COLL].find_one({"session_id": "sess_u1"})
+    assert db[sas.ARTICLES_COLL].find_one({"session_id": ref["article_session_id"], "url": ref["url"]}) is not None
+    assert sorted(db[sas.ARTICLES_COLL].distinct("session_id")) == ["crawl_new", "sess_solo", "sess_u1", "sess_u2"]
+
+    # once no kept session references it, the crawl is deleted with them
+    assert plan_retention(db, retain_sessions=1) == (["sess_solo"], ["sess_u2", "sess_u1", "crawl_new"])
@@ -0,0 +1,40 @@
+import glob
+import json
+
+import pytest
+
+import scrape_and_save as sas
+import shared_crawl
+from test_feed_polling import PAGE, _feed
+
+pytest.importorskip("scipy")
+
+
+def test_subscription_without_topic_keeps_every_article(http_server, tmp_path, monkeypatch):
+    base = http_server.base_url
+    http_server.routes.update({"/feed.xml": (200, {"Content-Type": "application/rss+xml"}, _feed(base)),
+                               "/page/ok": (200, {"Content-Type": "text/html"}, PAGE),
+                               "/page/blocked": (200, {"Content-Type": "text/html"}, PAGE)})
+    monkeypatch.setattr(sas, "SOURCES", [{"_id": "src_local", "name": "Local", "url": f"{base}/feed.xml",
+                                          "category": "Test", "active": True}])
+    monkeypatch.setattr(sas, "PROJECT_FILES", [])
+    subs = tmp_path / "subs.json"
+    subs.write_text(json.dumps([{"user_id": "no_topic", "selected_sources": ["src_local"]},
+                                {"user_id": "stopwords", "topic": "the and of", "selected_sources": ["src_local"]},
+                                {"user_id": "on_topic", "topic": "feeds polling", "selected_sources": ["src_local"]},
+                                {"user_id": "off_topic", "topic": "quantum chemistry", "selected_sources": ["src_local"]}]))
+    assert shared_crawl.main(["--subscriptions", str(subs), "--no-db", "--no-metrics", "--no-adaptive",
+                              "--domain-delay", "0", "--output-dir", str(tmp_path),
+                              "--cache-path", str(tmp_path / "c.sqlite"), "--doc-cache", str(tmp_path / "d.sqlite"),
+                              "--relevance-stats", str(tmp_path / "r.sqlite")]) == 0
+
+    refs = {}
+    for path in glob.glob(str(tmp_path / "refs_*.ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                ref = json.loads(line)
+                refs.setdefault(ref["user_id"], []).append(ref)
+    assert len(refs["no_topic"]) == len(refs["stopwords"]) == 2
+    assert all(ref["score"] is None for ref in refs["no_topic"])
+    assert len(refs["on_topic"]) == 2
+    assert "off_topic" not in refs